@@ -0,0 +1,462 @@
+"""
+Lectura por bloques de encuestas CSV muy grandes.
+
+En vez de cargar la Encuesta completa, el archivo se recorre en bloques y se
+actualizan agregados de tamaño acotado:
+  - conteos por (segmento de residencia, motivo normalizado), orden de primera
+    aparición y hasta MAX_VARIANTES valores crudos por (segmento, motivo);
+  - por segmento y columna numérica: N, suma, un sketch de cuantiles
+    fusionable (tipo DDSketch, error relativo acotado) para la mediana y una
+    muestra de reservorio para la prueba de Shapiro.
+
+Con ellos `AgregadoEncuesta.indice()` arma un IndiceEncuesta sin filas que
+`calcular_poblacion` acepta tal cual, y `AgregadoEncuesta.estadisticos()`
+devuelve lo mismo que `evaluar_distribuciones` (N y media exactos; mediana
+exacta mientras la columna quepa en la muestra, si no, desde el sketch).
+
+Uso:
+    agregado = agregar_csv("encuesta_grande.csv")
+    indice = agregado.indice()
+    resultado = calcular_poblacion(None, df_aforo, COLUMNA_RESIDE, COLUMNA_MOTIVO, None, indice=indice)
+    stats = agregado.estadisticos("no_local")
+"""
+import io
+import math
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from backend import (
+    COLUMNA_RESIDE,
+    COLUMNA_MOTIVO,
+    SEG_SIN_RESPUESTA,
+    SEG_LOCAL,
+    SEG_NO_LOCAL,
+    SEGMENTOS_TIPO,
+    IndiceEncuesta,
+    _normalizar_reside,
+    _normalizar_motivo,
+    _shapiro_p,
+    armonizar_motivos,
+    ampliar_motivos_conocidos,
+)
+
+TAM_BLOQUE = 250_000
+TAM_MUESTRA = 5000  # Shapiro-Wilk pierde precisión en el p-valor por encima de 5000 datos
+# Hasta este número de valores distintos se guarda el histograma exacto (días, montos redondos)
+LIMITE_EXACTOS = 4096
+# Variantes crudas (mayúsculas, espacios) que se recuerdan por segmento y motivo normalizado
+MAX_VARIANTES = 64
+
+
+class SketchCuantiles:
+    """
+    Sketch de cuantiles con error relativo `alpha` (esquema de DDSketch).
+
+    Cada valor cae en el cubo ceil(log_gamma(|x|)), con gamma = (1+alpha)/(1-alpha);
+    el cuantil estimado está a menos de alpha·|x| del real. Dos sketches con el
+    mismo alpha se fusionan sumando los conteos de sus cubos.
+    """
+
+    def __init__(self, alpha=0.005):
+        self.alpha = float(alpha)
+        self._log_gamma = math.log((1 + self.alpha) / (1 - self.alpha))
+        self.positivos = {}
+        self.negativos = {}
+        self.ceros = 0
+        self.n = 0
+
+    def _acumular(self, cubos, valores):
+        claves, conteos = np.unique(np.ceil(np.log(valores) / self._log_gamma).astype(np.int64), return_counts=True)
+        for clave, conteo in zip(claves.tolist(), conteos.tolist()):
+            cubos[clave] = cubos.get(clave, 0) + conteo
+
+    def actualizar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[np.isfinite(valores)]
+        if not len(valores):
+            return
+        self._acumular(self.positivos, valores[valores > 0])
+        self._acumular(self.negativos, -valores[valores < 0])
+        self.ceros += int((valores == 0).sum())
+        self.n += len(valores)
+
+    def fusionar(self, otro):
+        if otro.alpha != self.alpha:
+            raise ValueError("Solo se fusionan sketches con el mismo alpha")
+        for propios, ajenos in ((self.positivos, otro.positivos), (self.negativos, otro.negativos)):
+            for clave, conteo in ajenos.items():
+                propios[clave] = propios.get(clave, 0) + conteo
+        self.ceros += otro.ceros
+        self.n += otro.n
+        return self
+
+    def _valor(self, clave):
+        gamma = math.exp(self._log_gamma)
+        return 2 * gamma ** clave / (gamma + 1)
+
+    def cuantil(self, q):
+        if self.n == 0:
+            return np.nan
+        rango = q * (self.n - 1)
+        acumulado = 0
+        for clave in sorted(self.negativos, reverse=True):
+            acumulado += self.negativos[clave]
+            if acumulado > rango:
+                return -self._valor(clave)
+        acumulado += self.ceros
+        if acumulado > rango:
+            return 0.0
+        for clave in sorted(self.positivos):
+            acumulado += self.positivos[clave]
+            if acumulado > rango:
+                return self._valor(clave)
+        return self._valor(max(self.positivos))
+
+
+class MuestraReservorio:
+    """Muestra aleatoria uniforme de tamaño fijo sobre un flujo (algoritmo R, por bloques)."""
+
+    def __init__(self, tamano=TAM_MUESTRA, semilla=None):
+        self.tamano = int(tamano)
+        self.valores = np.empty(0)
+        self.vistos = 0
+        self._rng = np.random.default_rng(semilla)
+
+    def actualizar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        libres = self.tamano - len(self.valores)
+        if libres > 0:
+            self.valores = np.concatenate([self.valores, valores[:libres]])
+            self.vistos += min(libres, len(valores))
+            valores = valores[libres:]
+        if len(valores):
+            # El i-ésimo valor del flujo reemplaza una posición al azar con probabilidad tamano/i
+            posiciones = np.floor(
+                self._rng.random(len(valores)) * (self.vistos + np.arange(1, len(valores) + 1))
+            ).astype(np.int64)
+            reemplazan = posiciones < self.tamano
+            # Con posiciones repetidas gana la última, igual que en el algoritmo secuencial
+            self.valores[posiciones[reemplazan]] = valores[reemplazan]
+            self.vistos += len(valores)
+
+    def fusionar(self, otro):
+        """Combina dos reservorios eligiendo de cada uno en proporción a lo que vio."""
+        total = self.vistos + otro.vistos
+        if otro.vistos == 0:
+            return self
+        if len(self.valores) + len(otro.valores) <= self.tamano:
+            self.valores = np.concatenate([self.valores, otro.valores])
+        else:
+            de_otro = self._rng.binomial(self.tamano, otro.vistos / total)
+            de_otro = min(de_otro, len(otro.valores))
+            de_este = min(self.tamano - de_otro, len(self.valores))
+            self.valores = np.concatenate([
+                self._rng.choice(self.valores, de_este, replace=False),
+                self._rng.choice(otro.valores, de_otro, replace=False),
+            ])
+        self.vistos = total
+        return self
+
+    @property
+    def completa(self):
+        """True si la muestra contiene todos los valores vistos."""
+        return self.vistos == len(self.valores)
+
+
+class ResumenColumna:
+    """
+    N, suma, sketch y muestra de una columna numérica dentro de un segmento.
+
+    Mientras la columna tenga pocos valores distintos (LIMITE_EXACTOS) también
+    se lleva su histograma exacto, y la mediana sale de ahí en vez del sketch.
+    """
+
+    def __init__(self, alpha=0.005, tam_muestra=TAM_MUESTRA, semilla=None):
+        self.n = 0
+        self.suma = 0.0
+        self.sketch = SketchCuantiles(alpha)
+        self.muestra = MuestraReservorio(tam_muestra, semilla)
+        self.exactos = {}  # valor -> conteo; None si se superó LIMITE_EXACTOS
+
+    def _sumar_exactos(self, valores, conteos):
+        if self.exactos is None:
+            return
+        for valor, conteo in zip(valores, conteos):
+            self.exactos[valor] = self.exactos.get(valor, 0) + conteo
+        if len(self.exactos) > LIMITE_EXACTOS:
+            self.exactos = None
+
+    def actualizar(self, valores):
+        self.n += len(valores)
+        self.suma += float(valores.sum())
+        self.sketch.actualizar(valores)
+        self.muestra.actualizar(valores)
+        if self.exactos is not None:
+            distintos, conteos = np.unique(valores, return_counts=True)
+            if len(distintos) > LIMITE_EXACTOS:
+                self.exactos = None
+            else:
+                self._sumar_exactos(distintos.tolist(), conteos.tolist())
+
+    def fusionar(self, otro):
+        self.n += otro.n
+        self.suma += otro.suma
+        self.sketch.fusionar(otro.sketch)
+        self.muestra.fusionar(otro.muestra)
+        if otro.exactos is None:
+            self.exactos = None
+        else:
+            self._sumar_exactos(list(otro.exactos), list(otro.exactos.values()))
+        return self
+
+    def mediana(self):
+        if self.n == 0:
+            return np.nan
+        if self.muestra.completa:
+            return float(np.median(self.muestra.valores))
+        if self.exactos is not None:
+            # Misma convención que np.median: promedio de los dos centrales si N es par
+            centrales = {(self.n - 1) // 2, self.n // 2}
+            encontrados = []
+            acumulado = 0
+            for valor in sorted(self.exactos):
+                acumulado += self.exactos[valor]
+                while centrales and min(centrales) < acumulado:
+                    centrales.discard(min(centrales))
+                    encontrados.append(valor)
+                if not centrales:
+                    break
+            return float(sum(encontrados) / len(encontrados))
+        return float(self.sketch.cuantil(0.5))
+
+
+class AgregadoEncuesta:
+    """
+    Agregados de una Encuesta que se recorre por bloques (`actualizar`).
+
+    Memoria acotada: no depende del número de filas sino de los motivos
+    distintos, de las columnas numéricas y del tamaño de muestra.
+    """
+
+    def __init__(self, columnas=(), columna_reside=COLUMNA_RESIDE, columna_motivo=COLUMNA_MOTIVO,
+                 alpha=0.005, tam_muestra=TAM_MUESTRA, semilla=0):
+        self.columnas = list(columnas)
+        self.columna_reside = columna_reside
+        self.columna_motivo = columna_motivo
+        self.alpha = alpha
+        self.tam_muestra = tam_muestra
+        self._semillas = np.random.SeedSequence(semilla)
+
+        self.filas = 0
+        self._conteos = {}    # (segmento, motivo normalizado) -> filas
+        self._primera = {}    # (segmento, motivo normalizado) -> primera fila en que aparece
+        self._variantes = {}  # (segmento, motivo normalizado no nulo) -> valores crudos (<= MAX_VARIANTES)
+        self._numericas = {}  # (segmento, columna) -> ResumenColumna
+
+    def _resumen(self, segmento, columna):
+        clave = (segmento, columna)
+        if clave not in self._numericas:
+            self._numericas[clave] = ResumenColumna(
+                self.alpha, self.tam_muestra, self._semillas.spawn(1)[0]
+            )
+        return self._numericas[clave]
+
+    def _agregar_variantes(self, clave, valores):
+        # Las variantes de un motivo normalizado solo difieren en mayúsculas y espacios;
+        # pasado el tope se dejan de registrar (num_categorias_crudas queda por debajo)
+        variantes = self._variantes.setdefault(clave, set())
+        for valor in valores:
+            if len(variantes) >= MAX_VARIANTES:
+                break
+            variantes.add(valor)
+
+    # ----------------- ACTUALIZACIÓN -----------------
+    def actualizar(self, bloque: pd.DataFrame):
+        """Incorpora un bloque de filas (mismas columnas en todos los bloques)."""
+        for col in (self.columna_reside, self.columna_motivo):
+            if col not in bloque.columns:
+                raise ValueError(f"No existe columna '{col}'")
+
+        # Segmento de residencia (misma normalización que IndiceEncuesta)
+        cod_res, unicos_res = pd.factorize(bloque[self.columna_reside], use_na_sentinel=False)
+        res_norm = _normalizar_reside(pd.Series(unicos_res))
+        seg_unicos = np.select(
+            [res_norm.eq("no").to_numpy(), res_norm.isin(["sí", "si"]).to_numpy()],
+            [SEG_NO_LOCAL, SEG_LOCAL],
+            default=SEG_SIN_RESPUESTA,
+        ).astype(np.int64)
+        segmento = seg_unicos[cod_res] if len(cod_res) else np.zeros(0, dtype=np.int64)
+
+        # Motivo: conteos y primera aparición por (segmento, motivo normalizado)
+        cod_crudo, unicos_crudos = pd.factorize(bloque[self.columna_motivo], use_na_sentinel=False)
+        es_nulo = pd.isna(pd.Series(unicos_crudos)).to_numpy()
+        mot_norm = _normalizar_motivo(pd.Series(unicos_crudos)).tolist()
+        n_crudos = len(unicos_crudos)
+        combinado = segmento * n_crudos + cod_crudo
+        combos, primeras, conteos = np.unique(combinado, return_index=True, return_counts=True)
+        for combo, primera, conteo in zip(combos.tolist(), primeras.tolist(), conteos.tolist()):
+            seg, crudo = divmod(combo, n_crudos)
+            clave = (seg, mot_norm[crudo])
+            self._conteos[clave] = self._conteos.get(clave, 0) + conteo
+            self._primera[clave] = min(self._primera.get(clave, self.filas + primera), self.filas + primera)
+            if not es_nulo[crudo]:
+                self._agregar_variantes(clave, (unicos_crudos[crudo],))
+
+        # Columnas numéricas por segmento
+        for col in self.columnas:
+            if col not in bloque.columns:
+                continue
+            valores = pd.to_numeric(bloque[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            validos = ~np.isnan(valores)
+            for seg in (SEG_LOCAL, SEG_NO_LOCAL):
+                datos = valores[validos & (segmento == seg)]
+                if len(datos):
+                    self._resumen(seg, col).actualizar(datos)
+
+        self.filas += len(bloque)
+        return self
+
+    def fusionar(self, otro):
+        """Suma los agregados de otro recorrido (p. ej. otro archivo o proceso)."""
+        for clave, conteo in otro._conteos.items():
+            self._conteos[clave] = self._conteos.get(clave, 0) + conteo
+            primera = self.filas + otro._primera[clave]
+            self._primera[clave] = min(self._primera.get(clave, primera), primera)
+        for clave, variantes in otro._variantes.items():
+            self._agregar_variantes(clave, variantes)
+        for (seg, col), resumen in otro._numericas.items():
+            if (seg, col) in self._numericas:
+                self._numericas[(seg, col)].fusionar(resumen)
+            else:
+                self._numericas[(seg, col)] = resumen
+        self.columnas += [c for c in otro.columnas if c not in self.columnas]
+        self.filas += otro.filas
+        return self
+
+    # ----------------- RESULTADOS -----------------
+    def indice(self, armonizar=False, motivos_conocidos=None) -> IndiceEncuesta:
+        """IndiceEncuesta (sin filas) equivalente al de la encuesta completa."""
+        por_primera = sorted(self._primera, key=self._primera.get)
+        mapa = {}
+        if armonizar:
+            frecuencias = {}
+            for (seg, motivo), conteo in self._conteos.items():
+                frecuencias[motivo] = frecuencias.get(motivo, 0) + conteo
+            # "nan" (motivo nulo) no se armoniza, igual que en IndiceEncuesta
+            validos = [m for m in dict.fromkeys(m for _, m in por_primera) if m != "nan"]
+            mapa = armonizar_motivos(validos, frecuencias, motivos_conocidos=motivos_conocidos)
+
+        def _categoria(motivo):
+            return mapa.get(motivo, motivo)
+
+        categorias = list(dict.fromkeys(_categoria(m) for _, m in por_primera))
+        codigo = {c: i for i, c in enumerate(categorias)}
+        conteos = np.zeros((3, len(categorias)), dtype=np.int64)
+        orden = {SEG_LOCAL: [], SEG_NO_LOCAL: []}
+        for seg, motivo in por_primera:
+            cod = codigo[_categoria(motivo)]
+            conteos[seg, cod] += self._conteos[(seg, motivo)]
+            if seg in orden and cod not in orden[seg]:
+                orden[seg].append(cod)
+
+        # Presencia por segmento: valores crudos o, armonizado, categorías con respuestas
+        if armonizar:
+            presencia = np.zeros((3, len(categorias)), dtype=bool)
+            for seg, motivo in self._variantes:
+                presencia[seg, codigo[_categoria(motivo)]] = True
+        else:
+            posicion = {}
+            for variantes in self._variantes.values():
+                for valor in variantes:
+                    posicion.setdefault(valor, len(posicion))
+            presencia = np.zeros((3, len(posicion)), dtype=bool)
+            for (seg, _), variantes in self._variantes.items():
+                presencia[seg, [posicion[v] for v in variantes]] = True
+
+        return IndiceEncuesta.desde_conteos(
+            conteos, categorias, orden, presencia,
+            columna_reside=self.columna_reside, columna_motivo=self.columna_motivo,
+            armonizado=armonizar, mapa_motivos={m: c for m, c in mapa.items() if m != c},
+            motivos_conocidos=ampliar_motivos_conocidos(motivos_conocidos, mapa) if armonizar else None,
+        )
+
+    def resumen_columna(self, columna, tipo_poblacion="no_local"):
+        """ResumenColumna del grupo (une los segmentos si tipo_poblacion='ambos')."""
+        # Semilla fija por (tipo, columna): consultar dos veces da la misma muestra fusionada
+        consulta = zlib.crc32(f"{tipo_poblacion}\0{columna}".encode("utf-8"))
+        semilla = np.random.SeedSequence([self._semillas.entropy, consulta])
+        resumen = ResumenColumna(self.alpha, self.tam_muestra, semilla)
+        for seg in SEGMENTOS_TIPO.get(tipo_poblacion, SEGMENTOS_TIPO["ambos"]):
+            parcial = self._numericas.get((seg, columna))
+            if parcial is not None:
+                # Se fusiona sobre un resumen nuevo: el agregado no cambia
+                resumen.fusionar(parcial)
+        return resumen
+
+    def columnas_con_datos(self, tipo_poblacion="no_local"):
+        """Columnas con al menos un valor numérico en el grupo (como select_dtypes en la app)."""
+        segs = SEGMENTOS_TIPO.get(tipo_poblacion, SEGMENTOS_TIPO["ambos"])
+        return [c for c in self.columnas if any((s, c) in self._numericas for s in segs)]
+
+    def estadisticos(self, tipo_poblacion="no_local", columnas=None, criterio="auto"):
+        """Mismo formato que evaluar_distribuciones, calculado desde los agregados."""
+        columnas = self.columnas if columnas is None else list(columnas)
+        resultados = {}
+        for col in columnas:
+            resumen = self.resumen_columna(col, tipo_poblacion)
+            if resumen.n < 3:
+                resultados[col] = {
+                    "N": resumen.n,
+                    "p_value": np.nan,
+                    "media": np.nan,
+                    "mediana": np.nan,
+                    "sugerencia": "Insuficiente"
+                }
+                continue
+            p_valor = float(_shapiro_p(np.sort(resumen.muestra.valores)))
+            sugerencia = (
+                "Promedio" if (criterio == "auto" and p_valor > 0.05) else "Mediana"
+            ) if criterio == "auto" else criterio
+            resultados[col] = {
+                "N": resumen.n,
+                "p_value": p_valor,
+                "media": resumen.suma / resumen.n,
+                "mediana": resumen.mediana(),
+                "sugerencia": sugerencia
+            }
+        return resultados
+
+
+def columnas_por_defecto(bloque, columna_reside=COLUMNA_RESIDE, columna_motivo=COLUMNA_MOTIVO) -> list:
+    """Columnas numéricas del bloque más las de gasto y días que resuelve extraer_columnas_validas."""
+    from ingesta import columnas_necesarias
+    numericas = bloque.select_dtypes(include="number").columns.tolist()
+    columnas = list(dict.fromkeys(numericas + columnas_necesarias(bloque.columns)))
+    return [c for c in columnas if c not in (columna_reside, columna_motivo)]
+
+
+def agregar_csv(origen, columnas=None, columna_reside=COLUMNA_RESIDE, columna_motivo=COLUMNA_MOTIVO,
+                tam_bloque=TAM_BLOQUE, **kwargs) -> AgregadoEncuesta:
+    """
+    Recorre un CSV (ruta o bytes) por bloques y devuelve sus agregados.
+
+    Si `columnas` es None se agregan las columnas numéricas del primer bloque
+    más las que resuelve `extraer_columnas_validas` (gasto y días).
+    """
+    if isinstance(origen, (bytes, bytearray)):
+        origen = io.BytesIO(origen)
+    lector = pd.read_csv(
+        origen, chunksize=tam_bloque, dtype={columna_reside: str, columna_motivo: str}
+    )
+    agregado = None
+    for bloque in lector:
+        if agregado is None:
+            if columnas is None:
+                columnas = columnas_por_defecto(bloque, columna_reside, columna_motivo)
+            agregado = AgregadoEncuesta(columnas, columna_reside, columna_motivo, **kwargs)
+        agregado.actualizar(bloque)
+    if agregado is None:
+        raise ValueError("El archivo CSV no tiene filas")
+    return agregado
@@ -0,0 +1,364 @@
+"""
+Almacén persistente (SQLite) de resultados de corridas completas.
+
+Cada corrida se identifica por una clave SHA-256 de:
+  - el hash del contenido de la Encuesta, el Aforo y el EED (y de cualquier
+    otra entrada que cambie el resultado, p. ej. el diccionario de motivos
+    armonizados),
+  - una serialización canónica (JSON ordenado, números como float) de todos
+    los parámetros,
+  - la versión del cálculo: VERSION_RESULTADOS (formato guardado) más el hash
+    del código de los módulos que calculan (MODULOS_CALCULO, más app.py o
+    lote.py según quién guarde), así que un cambio en el cálculo invalida las
+    corridas viejas sin tocar nada.
+
+Guarda la población, la tabla de estadísticos, el desglose por rubro, la
+tabla de sectores y lo que se agregue, como JSON comprimido. Las consultas
+repetidas salen de la base sin recalcular. El tamaño está acotado (MB y
+número de corridas): se desalojan las menos usadas recientemente. Las
+corridas se pueden listar y comparar campo a campo.
+
+El archivo se puede copiar entre máquinas: no guarda objetos de Python, solo JSON.
+
+lote.py --almacen consulta el almacén antes de calcular cada evento. La app
+solo guarda, muestra y compara corridas: su cálculo no lee de aquí (tras un
+reinicio lo costoso es leer e indexar los archivos, que no se guardan).
+
+Uso:
+    almacen = AlmacenResultados()                       # .cache/resultados.sqlite
+    entradas = {"encuesta": hash_enc, "aforo": hash_aforo, "eed": hash_eed}
+    resultados = almacen.obtener(entradas, parametros)  # None si no está
+    almacen.guardar(entradas, parametros, {"poblacion": res_pob, "sectores": df_sec})
+    almacen.listar()
+    almacen.diferencias("3f2a", "9c41")                 # claves o prefijos
+
+    python almacen_resultados.py listar
+    python almacen_resultados.py diferencias 3f2a 9c41
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+RUTA_ALMACEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "resultados.sqlite")
+VERSION_RESULTADOS = 2
+# Módulos cuyo código entra en la clave (rutas relativas a este archivo): todos los que
+# leen, calculan o arman algo de lo que se guarda. Quien guarda agrega su propio archivo.
+MODULOS_CALCULO = (
+    "backend.py",
+    "ingesta.py",
+    "agregado_encuesta.py",
+    "catalogo_multiplicadores.py",
+    "insumo_producto.py",
+    "elasticidades.py",
+    "almacen_resultados.py",
+)
+MAX_MB = 256
+MAX_CORRIDAS = 5000
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS corridas (
+    clave      TEXT PRIMARY KEY,
+    etiqueta   TEXT,
+    entradas   TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    datos      BLOB NOT NULL,
+    bytes      INTEGER NOT NULL,
+    creada     REAL NOT NULL,
+    usada      REAL NOT NULL,
+    usos       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS corridas_usada ON corridas (usada);
+"""
+
+
+# ----------------- SERIALIZACIÓN -----------------
+
+def version_calculo(modulos=MODULOS_CALCULO) -> str:
+    """VERSION_RESULTADOS más el hash del código fuente de `modulos`."""
+    h = hashlib.sha256(str(VERSION_RESULTADOS).encode())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for modulo in modulos:
+        with open(os.path.join(base, modulo), "rb") as f:
+            h.update(modulo.encode("utf-8") + b"\0" + f.read())
+    return h.hexdigest()
+
+
+def _canonico(valor):
+    """Valor equivalente hecho solo de dict/list/str/float/bool/None (para la clave)."""
+    if isinstance(valor, dict):
+        return {str(k): _canonico(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [_canonico(v) for v in valor]
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        valor = float(valor)
+        return valor if math.isfinite(valor) else repr(valor)  # NaN/inf como texto
+    if valor is None or isinstance(valor, str):
+        return valor
+    raise TypeError(f"Parámetro no serializable para la clave: {type(valor).__name__}")
+
+
+def serializar_parametros(parametros) -> str:
+    """JSON canónico: claves ordenadas, números como float, sin espacios."""
+    return json.dumps(_canonico(parametros), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _a_json(valor):
+    """Resultados -> estructura JSON. DataFrames como {"__tabla__": ...}."""
+    if isinstance(valor, pd.DataFrame):
+        return {"__tabla__": {
+            "columnas": [str(c) for c in valor.columns],
+            "indice": [_a_json(i) for i in valor.index],
+            "nombre_indice": valor.index.name,
+            "filas": [[_a_json(v) for v in fila] for fila in valor.itertuples(index=False, name=None)],
+        }}
+    if isinstance(valor, dict) or hasattr(valor, "keys"):  # dicts y registros como ResultadoPoblacion
+        return {str(k): _a_json(valor[k]) for k in valor.keys() if k != "grupo"}
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [_a_json(v) for v in valor]
+    if isinstance(valor, (np.bool_, np.integer, np.floating)):
+        return valor.item()
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if valor is pd.NA or valor is pd.NaT:
+        return None
+    return valor
+
+
+def _de_json(valor):
+    if isinstance(valor, dict):
+        if "__tabla__" in valor:
+            t = valor["__tabla__"]
+            df = pd.DataFrame(t["filas"], columns=t["columnas"], index=t["indice"])
+            df.index.name = t["nombre_indice"]
+            return df
+        return {k: _de_json(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_de_json(v) for v in valor]
+    return valor
+
+
+def _aplanar(valor, prefijo, salida):
+    """{campo.subcampo[fila].columna: escalar} de dicts, listas y tablas anidadas."""
+    if isinstance(valor, pd.DataFrame):
+        for etiqueta, fila in zip(valor.index, valor.itertuples(index=False, name=None)):
+            for columna, v in zip(valor.columns, fila):
+                salida[f"{prefijo}[{etiqueta}].{columna}"] = v
+    elif isinstance(valor, dict):
+        for k, v in valor.items():
+            _aplanar(v, f"{prefijo}.{k}" if prefijo else str(k), salida)
+    elif isinstance(valor, list):
+        for i, v in enumerate(valor):
+            _aplanar(v, f"{prefijo}[{i}]", salida)
+    else:
+        salida[prefijo] = valor
+    return salida
+
+
+def _es_numero(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _iguales(a, b):
+    if _es_numero(a) and _es_numero(b):
+        return a == b or (math.isnan(a) and math.isnan(b))
+    return a == b
+
+
+# ----------------- ALMACÉN -----------------
+
+class AlmacenResultados:
+    """
+    Resultados de corridas en SQLite con desalojo LRU por tamaño.
+
+    Cada operación abre su propia conexión, así que puede usarse desde varios
+    procesos (lote.py) o sesiones de la app a la vez.
+    """
+
+    def __init__(self, ruta=RUTA_ALMACEN, max_mb=MAX_MB, max_corridas=MAX_CORRIDAS, modulos=MODULOS_CALCULO):
+        self.ruta = ruta
+        self.version = version_calculo(modulos)
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.max_corridas = max_corridas
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with closing(self._conectar()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_ESQUEMA)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def clave(self, entradas, parametros) -> str:
+        """Clave de la corrida: hashes de las entradas + parámetros canónicos + versión del cálculo."""
+        texto = serializar_parametros({
+            "version": self.version, "entradas": entradas, "parametros": parametros
+        })
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    # ----------------- CONSULTA Y ESCRITURA -----------------
+    def existe(self, clave) -> bool:
+        with closing(self._conectar()) as con:
+            return con.execute("SELECT 1 FROM corridas WHERE clave = ?", (clave,)).fetchone() is not None
+
+    def obtener(self, entradas, parametros):
+        """Resultados guardados para estas entradas y parámetros, o None."""
+        return self.cargar(self.clave(entradas, parametros), faltante=None)
+
+    def cargar(self, clave, faltante=KeyError):
+        """Resultados de una corrida por clave (o prefijo único). Marca la corrida como usada."""
+        with closing(self._conectar()) as con, con:
+            clave = self._resolver(con, clave, faltante)
+            if clave is None:
+                return None
+            datos, = con.execute("SELECT datos FROM corridas WHERE clave = ?", (clave,)).fetchone()
+            con.execute("UPDATE corridas SET usada = ?, usos = usos + 1 WHERE clave = ?", (time.time(), clave))
+        return _de_json(json.loads(zlib.decompress(datos)))
+
+    def guardar(self, entradas, parametros, resultados, etiqueta=None) -> str:
+        """Guarda (o reemplaza) los resultados de la corrida y desaloja si se pasa del límite."""
+        clave = self.clave(entradas, parametros)
+        datos = zlib.compress(json.dumps(_a_json(resultados), ensure_ascii=False).encode("utf-8"), 6)
+        ahora = time.time()
+        with closing(self._conectar()) as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO corridas (clave, etiqueta, entradas, parametros, datos, bytes, creada, usada, usos) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (clave, etiqueta, serializar_parametros(entradas), serializar_parametros(parametros),
+                 datos, len(datos), ahora, ahora),
+            )
+            self._desalojar(con, conservar=clave)
+        return clave
+
+    def _desalojar(self, con, conservar=None) -> int:
+        total, n = con.execute("SELECT COALESCE(SUM(bytes), 0), COUNT(*) FROM corridas").fetchone()
+        borrar = []
+        if total > self.max_bytes or n > self.max_corridas:
+            for clave, tamano in con.execute("SELECT clave, bytes FROM corridas ORDER BY usada"):
+                if total <= self.max_bytes and n <= self.max_corridas:
+                    break
+                if clave == conservar:
+                    continue
+                borrar.append((clave,))
+                total -= tamano
+                n -= 1
+        con.executemany("DELETE FROM corridas WHERE clave = ?", borrar)
+        return len(borrar)
+
+    def _resolver(self, con, clave, faltante=KeyError):
+        """Clave completa a partir de un prefijo (como los hashes de git)."""
+        filas = con.execute(
+            "SELECT clave FROM corridas WHERE clave LIKE ? LIMIT 2", (str(clave).replace("%", "") + "%",)
+        ).fetchall()
+        if len(filas) > 1 and not any(f[0] == clave for f in filas):
+            raise ValueError(f"El prefijo '{clave}' coincide con varias corridas")
+        if not filas:
+            if faltante is None:
+                return None
+            raise faltante(f"No hay corridas con la clave '{clave}'")
+        return filas[0][0]
+
+    # ----------------- LISTADO Y COMPARACIÓN -----------------
+    def listar(self) -> pd.DataFrame:
+        """Corridas guardadas, de la usada más recientemente a la más antigua."""
+        with closing(self._conectar()) as con:
+            filas = con.execute(
+                "SELECT clave, etiqueta, entradas, creada, usada, usos, bytes FROM corridas ORDER BY usada DESC"
+            ).fetchall()
+        df = pd.DataFrame(filas, columns=["clave", "etiqueta", "entradas", "creada", "usada", "usos", "bytes"])
+        entradas = df.pop("entradas").map(json.loads)
+        for nombre in ("encuesta", "aforo", "eed"):
+            df[nombre] = entradas.map(lambda e: (e.get(nombre) or "")[:10])
+        for columna in ("creada", "usada"):
+            df[columna] = pd.to_datetime(df[columna], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+        return df
+
+    def diferencias(self, clave_a, clave_b) -> pd.DataFrame:
+        """
+        Campos de entradas, parámetros y resultados que difieren entre dos
+        corridas: campo, a, b y, si son números, diferencia (b - a) y relativa.
+        """
+        with closing(self._conectar()) as con:
+            campos = []
+            for clave in (clave_a, clave_b):
+                clave = self._resolver(con, clave)
+                entradas, parametros, datos = con.execute(
+                    "SELECT entradas, parametros, datos FROM corridas WHERE clave = ?", (clave,)
+                ).fetchone()
+                campos.append(_aplanar({
+                    "entradas": json.loads(entradas),
+                    "parametros": json.loads(parametros),
+                    "resultados": _de_json(json.loads(zlib.decompress(datos))),
+                }, "", {}))
+        a, b = campos
+        filas = []
+        for campo in list(a) + [c for c in b if c not in a]:
+            va, vb = a.get(campo), b.get(campo)
+            if _iguales(va, vb):
+                continue
+            dif = vb - va if _es_numero(va) and _es_numero(vb) else None
+            rel = dif / abs(va) if dif is not None and va else None
+            filas.append((campo, va, vb, dif, rel))
+        return pd.DataFrame(filas, columns=["campo", "a", "b", "diferencia", "diferencia_rel"])
+
+    def eliminar(self, clave):
+        with closing(self._conectar()) as con, con:
+            con.execute("DELETE FROM corridas WHERE clave = ?", (self._resolver(con, clave),))
+
+    def limpiar(self):
+        with closing(self._conectar()) as con, con:
+            con.execute("DELETE FROM corridas")
+        with closing(self._conectar()) as con:
+            con.execute("VACUUM")
+
+    def resumen(self) -> dict:
+        with closing(self._conectar()) as con:
+            n, total = con.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM corridas").fetchone()
+        return {"corridas": n, "MB": round(total / 1024 ** 2, 2), "máx. MB": round(self.max_bytes / 1024 ** 2)}
+
+
+# ----------------- LÍNEA DE COMANDOS -----------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lista y compara corridas guardadas en el almacén de resultados.")
+    parser.add_argument("--ruta", default=RUTA_ALMACEN, help="Archivo SQLite del almacén")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="Corridas guardadas")
+    dif = sub.add_parser("diferencias", help="Campos que cambian entre dos corridas")
+    dif.add_argument("clave_a")
+    dif.add_argument("clave_b")
+    sub.add_parser("limpiar", help="Borra todas las corridas")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenResultados(args.ruta)
+    with pd.option_context("display.width", 200, "display.max_rows", 500, "display.max_colwidth", 60):
+        if args.comando == "listar":
+            df = almacen.listar()
+            df["clave"] = df["clave"].str[:12]
+            print(df.to_string(index=False) if len(df) else "El almacén está vacío.")
+            print(" | ".join(f"{k}: {v}" for k, v in almacen.resumen().items()))
+        elif args.comando == "diferencias":
+            try:
+                df = almacen.diferencias(args.clave_a, args.clave_b)
+            except (KeyError, ValueError) as e:
+                print(e.args[0], file=sys.stderr)
+                return 1
+            print(df.to_string(index=False) if len(df) else "Las corridas son iguales.")
+        else:
+            almacen.limpiar()
+            print("Almacén vacío.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
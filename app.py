@@ -1,14 +1,27 @@
 import streamlit as st, numpy, pandas, sys
 import importlib
+import time
+import uuid
 import pandas as pd
 import io
+import numpy as np
+import altair as alt
 from backend import (
     calcular_poblacion,
     extraer_columnas_validas,
     evaluar_distribuciones,
     calcular_efecto_economico_indirecto,
-    detectar_categorias_motivo
+    detectar_categorias_motivo,
+    calcular_grilla_sensibilidad,
+    IndiceEncuesta,
+    RUTA_MOTIVOS,
+    leer_motivos_conocidos,
+    guardar_motivos_conocidos,
+    hash_motivos_conocidos,
 )
+from ingesta import ArchivoLocal, CacheIngesta, hash_contenido, leer_tabla, leer_tabla_selectiva
+from grafo_calculo import GrafoCalculo
+import instrumentacion
 
 # --- PRIMERO: configuración de página (debe ser el primer st.*) ---
 st.set_page_config(page_title="Efectos económicos de los festivales y eventos", layout="wide")
@@ -19,6 +32,34 @@ st.caption(f"NumPy: {numpy.__version__} | Pandas: {pandas.__version__}")
 scipy_spec = importlib.util.find_spec("scipy")
 st.caption("SciPy: OK" if scipy_spec else "SciPy: NO ENCONTRADO")
 
+# Diagnóstico de rendimiento (opcional): trazas de las funciones de backend.py.
+# Los controles van aquí para que valgan en este mismo rerun; la tabla se llena al final del script.
+# La instrumentación es global al proceso: solo se cambia cuando esta sesión mueve un control,
+# así los reruns de otras sesiones no la apagan.
+# Cada sesión pide y suelta la instrumentación por su cuenta (es global al proceso)
+sesion_instrumentacion = st.session_state.setdefault("sesion_instrumentacion", uuid.uuid4().hex)
+
+
+def _cambiar_instrumentacion():
+    if st.session_state.get("instrumentar"):
+        instrumentacion.activar(memoria=st.session_state.get("instrumentar_memoria", False),
+                                sesion=sesion_instrumentacion)
+    else:
+        instrumentacion.desactivar(sesion=sesion_instrumentacion)
+
+
+panel_diagnostico = st.expander("Diagnóstico de rendimiento", expanded=False)
+with panel_diagnostico:
+    if st.checkbox("Instrumentar funciones de cálculo", key="instrumentar",
+                   on_change=_cambiar_instrumentacion,
+                   help="Registra tiempo, filas y memoria de cada llamada al backend (para todas las sesiones)."):
+        st.checkbox("Medir memoria (tracemalloc, más lento)", key="instrumentar_memoria",
+                    on_change=_cambiar_instrumentacion)
+    if instrumentacion.activa() and not instrumentacion.activa(sesion_instrumentacion):
+        st.caption("Otra sesión la tiene activada: se registran sus llamadas.")
+    if st.button("Limpiar trazas"):
+        instrumentacion.limpiar()
+
 # Font awesome (también después del set_page_config)
 st.markdown("""
 <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
@@ -34,15 +75,284 @@ st.markdown("""
 
 # Sidebar
 st.sidebar.markdown("### <i class='fas fa-folder-open'></i> Carga los 4 archivos necesarios", unsafe_allow_html=True)
-encuesta_file = st.sidebar.file_uploader(" Encuesta ", type=["xlsx", "csv"])
-aforo_file = st.sidebar.file_uploader(" Potencial de Aforo ", type=["xlsx", "csv"])
-eed_file = st.sidebar.file_uploader(" EED ", type=["xlsx", "csv"])
+encuesta_file = st.sidebar.file_uploader(" Encuesta ", type=["xlsx", "parquet", "csv"])
+aforo_file = st.sidebar.file_uploader(" Potencial de Aforo ", type=["xlsx", "parquet", "csv"])
+eed_file = st.sidebar.file_uploader(" EED ", type=["xlsx", "parquet", "csv"])
+multiplicadores_file = st.sidebar.file_uploader(
+    " Multiplicadores (opcional) ", type=["xlsx", "parquet", "csv"],
+    help="Vector de multiplicadores por C_Sector (como data/Multiplicadores.xlsx) "
+         "o matriz de coeficientes técnicos. Precarga los multiplicadores de rubros y sectores "
+         "y habilita la propagación insumo-producto del desglose sectorial."
+)
+usar_ejemplo = st.sidebar.checkbox(
+    "Usar archivos de ejemplo (data/)",
+    value=False,
+    help="Completa los archivos que no se hayan subido con los de la carpeta data/ del repositorio."
+)
+if usar_ejemplo:
+    import os
+    carpeta_ejemplo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    encuesta_file = encuesta_file or ArchivoLocal(os.path.join(carpeta_ejemplo, "Encuesta.xlsx"))
+    aforo_file = aforo_file or ArchivoLocal(os.path.join(carpeta_ejemplo, "Potencial de aforo.xlsx"))
+    eed_file = eed_file or ArchivoLocal(os.path.join(carpeta_ejemplo, "EED.xlsx"))
+    if multiplicadores_file is None and os.path.exists(os.path.join(carpeta_ejemplo, "Multiplicadores.xlsx")):
+        multiplicadores_file = ArchivoLocal(os.path.join(carpeta_ejemplo, "Multiplicadores.xlsx"))
+lectura_selectiva = st.sidebar.checkbox(
+    "Cargar solo las columnas necesarias de la Encuesta",
+    value=False,
+    help="Lee únicamente residencia, motivo y las columnas de gasto/días detectadas. "
+         "Reduce memoria y tiempo de carga en encuestas anchas; las demás columnas no estarán disponibles."
+)
+lectura_por_bloques = st.sidebar.checkbox(
+    "Leer la Encuesta CSV por bloques (archivos muy grandes)",
+    value=False,
+    help="Recorre el CSV por bloques y guarda solo conteos, sumas y un resumen de cuantiles por columna. "
+         "N y media son exactos; la mediana es aproximada (error relativo < 0,5 %) cuando la columna "
+         "tiene muchos valores distintos. No permite el bootstrap de encuestados."
+)
+
+
+# Caché de ingesta compartida entre reruns y sesiones (clave = hash del contenido)
+@st.cache_resource
+def _cache_ingesta():
+    return CacheIngesta()
+
+
+def _hash_subida(archivo):
+    """Hash del contenido de un archivo subido; se calcula una vez por subida."""
+    hashes = st.session_state.setdefault("hash_subidas", {})
+    clave_subida = getattr(archivo, "file_id", None) or archivo.name
+    if clave_subida not in hashes:
+        hashes[clave_subida] = hash_contenido(archivo.getvalue())
+    return hashes[clave_subida]
+
+
+def _cargar(archivo, lector=leer_tabla):
+    """Lee un archivo subido a través de la caché de ingesta."""
+    return _cache_ingesta().obtener(
+        archivo.getvalue(), archivo.name, hash_archivo=_hash_subida(archivo), lector=lector
+    )
+
+
+# Agregados de una Encuesta CSV leída por bloques (memoria acotada, una vez por contenido)
+@st.cache_resource(max_entries=4)
+def _agregado_encuesta(hash_encuesta, _archivo):
+    from agregado_encuesta import agregar_csv
+    t0 = time.perf_counter()
+    agregado = agregar_csv(_archivo.getvalue())
+    return agregado, time.perf_counter() - t0
+
+
+def _propagar_sectorial(motor, df_eed, desglose):
+    from insumo_producto import propagar_desglose
+    return propagar_desglose(motor, df_eed, desglose[0])
+
+
+def _estadisticos_grupo(indice, tipo_poblacion, columnas):
+    # Solo se copian del grupo las columnas evaluadas
+    return evaluar_distribuciones(indice.filas_grupo(tipo_poblacion, columnas=columnas), columnas)
+
+
+def _fmt_num(x):
+    try:
+        return f"{float(x):,.2f}"
+    except (ValueError, TypeError):
+        return x
+
+
+@st.fragment
+def _seccion_sectores(nodo_eed, pnl, n_eventos, modo_local, dias_defecto, mult_catalogo, multiplicadores_file):
+    """
+    Desglose por sectores del EED. Corre como fragmento: editar los días o la
+    tabla de sectores solo vuelve a ejecutar esta función, y en ella solo se
+    recalcula calcular_desglose_por_sectores. La configuración queda en
+    st.session_state ("dias_sectores", "config_sectores") para el bootstrap.
+    """
+    from backend import calcular_desglose_por_sectores
+    ronda_sectores = _grafo().ronda()
+    df_eed = nodo_eed.valor
+
+    dias_sectores = st.number_input(
+        "Días de estadía a usar para el cálculo sectorial",
+        min_value=0.0,
+        value=dias_defecto,
+        step=0.5,
+        format="%.2f"
+    )
+
+    # Listado de sectores base desde el EED
+    sectores_unicos = sorted(df_eed["Sector_EED"].astype(str).fillna("Sin sector").unique().tolist())
+
+    st.caption("Activa y define el 'gasto (media/mediana)' y el multiplicador para calcular el efecto indirecto por sector.")
+
+    # Configuración de todos los sectores en una sola tabla editable
+    tabla_base = pd.DataFrame({
+        "Sector": sectores_unicos,
+        "Calcular efecto indirecto": False,
+        "Gasto (media/mediana)": 0.0,
+        "Multiplicador": [float(mult_catalogo.get(s, 1.0)) for s in sectores_unicos],
+    })
+    tabla = st.data_editor(
+        tabla_base,
+        key="tabla_sectores",
+        hide_index=True,
+        num_rows="fixed",
+        disabled=["Sector"],
+        use_container_width=True,
+        column_config={
+            "Gasto (media/mediana)": st.column_config.NumberColumn(min_value=0.0, step=1.0, format="%.2f"),
+            "Multiplicador": st.column_config.NumberColumn(min_value=0.0, step=0.01, format="%.4f"),
+        },
+    )
+    config_sectores = [
+        {"sector": s, "activar": bool(a), "gasto": float(g), "multiplicador": float(m)}
+        for s, a, g, m in zip(
+            tabla["Sector"],
+            tabla["Calcular efecto indirecto"].fillna(False),
+            tabla["Gasto (media/mediana)"].fillna(0.0),
+            tabla["Multiplicador"].fillna(1.0),
+        )
+    ]
+
+    # Cálculo
+    nodo_sectorial = ronda_sectores.etapa(
+        "Desglose por sectores", calcular_desglose_por_sectores,
+        df_eed=nodo_eed,
+        pnl=pnl,
+        dias_usado=dias_sectores,
+        col_sector="Sector_EED",
+        col_valor="V_EED",
+        config_sectores=config_sectores,
+        n_eventos=n_eventos,
+        modo_local=modo_local
+    )
+    df_sectorial, trazas_sector = nodo_sectorial.valor
+
+    df_sectorial_fmt = df_sectorial.copy()
+    # Formato numérico para montos
+    for c in ["Efecto directo", "Efecto indirecto", "Total, efecto inducido neto", "Efecto económico total"]:
+        df_sectorial_fmt[c] = df_sectorial_fmt[c].apply(_fmt_num)
+    # Formato porcentaje
+    df_sectorial_fmt["% efecto económico total"] = df_sectorial["% efecto económico total"].apply(
+        lambda v: f"{float(v):.2%}" if pd.notna(v) else v
+    )
+
+    st.subheader("Desglose por sectores")
+    st.dataframe(df_sectorial_fmt, use_container_width=True)
+
+    # Propagación por la matriz insumo-producto (solo si se subió el archivo de multiplicadores)
+    if multiplicadores_file is not None:
+        from insumo_producto import obtener_motor
+        with st.expander("Propagación insumo-producto (Leontief)", expanded=False):
+            try:
+                motor = obtener_motor(
+                    multiplicadores_file.getvalue(), multiplicadores_file.name,
+                    hash_archivo=_hash_subida(multiplicadores_file)
+                )
+                nodo_motor = ronda_sectores.fuente("Multiplicadores", motor, clave=motor.hash_archivo)
+                df_leontief, meta_leontief = ronda_sectores.etapa(
+                    "Propagación Leontief", _propagar_sectorial, nodo_motor, nodo_eed, nodo_sectorial
+                ).valor
+            except ValueError as e:
+                st.warning(f"No se pudo usar el archivo de multiplicadores: {e}")
+            else:
+                st.caption(
+                    f"Producción total = (I − A)⁻¹ · demanda, con {motor.n} sectores "
+                    f"(factorización en caché · {motor.hash_archivo[:10]})."
+                )
+                if meta_leontief["sectores_sin_codigo"] or meta_leontief["codigos_sin_match"]:
+                    st.warning(
+                        "Sectores sin ubicar en la matriz: "
+                        + ", ".join(map(str, meta_leontief["sectores_sin_codigo"] + meta_leontief["codigos_sin_match"]))
+                    )
+                df_leontief = df_leontief[
+                    (df_leontief["Producción total"] != 0) | (df_leontief["Sector"] == "Total")
+                ]
+                st.dataframe(
+                    df_leontief.style.format(
+                        {c: _fmt_num for c in df_leontief.columns[2:]}
+                    ),
+                    use_container_width=True
+                )
+
+    estado = ", ".join(f"{r['etapa']}: {r['estado']} ({r['segundos']:.3f} s)" for r in ronda_sectores.registro)
+    st.caption(estado)
+    st.session_state["dias_sectores"] = dias_sectores
+    st.session_state["config_sectores"] = config_sectores
+    st.session_state["etapas_sectores"] = ronda_sectores.registro
+    st.session_state["tabla_sectorial"] = df_sectorial
+
+
+# Etapas del cálculo memoizadas por sus entradas (compartidas entre reruns y sesiones)
+@st.cache_resource
+def _grafo():
+    return GrafoCalculo()
+
+
+# Almacén de corridas en disco (.cache/resultados.sqlite), compartido entre sesiones
+@st.cache_resource
+def _almacen():
+    from almacen_resultados import MODULOS_CALCULO, AlmacenResultados
+    # app.py arma parte de lo que se guarda (resumen, tabla de sectores): entra en la versión
+    return AlmacenResultados(modulos=MODULOS_CALCULO + ("app.py",))
+
 
 if encuesta_file and aforo_file and eed_file:
+    ronda = _grafo().ronda()
     try:
-        df_encuesta = pd.read_excel(encuesta_file) if encuesta_file.name.endswith(".xlsx") else pd.read_csv(encuesta_file)
-        df_aforo = pd.read_excel(aforo_file) if aforo_file.name.endswith(".xlsx") else pd.read_csv(aforo_file)
-        df_eed = pd.read_excel(eed_file) if eed_file.name.endswith(".xlsx") else pd.read_csv(eed_file)
+        agregado_encuesta = None
+        if lectura_por_bloques and encuesta_file.name.lower().endswith(".csv"):
+            # Sin DataFrame de la Encuesta: población y estadísticos salen de los agregados
+            hash_encuesta = _hash_subida(encuesta_file)
+            vistos = st.session_state.setdefault("agregados_vistos", set())
+            agregado_encuesta, segundos = _agregado_encuesta(hash_encuesta, encuesta_file)
+            df_encuesta = None
+            info_encuesta = {"hash": hash_encuesta, "acierto": hash_encuesta in vistos, "segundos": segundos}
+            vistos.add(hash_encuesta)
+        else:
+            df_encuesta, info_encuesta = _cargar(
+                encuesta_file, lector=leer_tabla_selectiva if lectura_selectiva else leer_tabla
+            )
+        df_aforo, info_aforo = _cargar(aforo_file)
+        df_eed, info_eed = _cargar(eed_file)
+
+        # Estado de la caché de ingesta (permite confirmar que no se re-parsea en cada rerun)
+        with st.sidebar.expander("Caché de ingesta", expanded=False):
+            for etiqueta, info in [("Encuesta", info_encuesta), ("Aforo", info_aforo), ("EED", info_eed)]:
+                estado = "acierto" if info["acierto"] else f"parseado ({info['segundos']:.2f} s)"
+                st.caption(f"{etiqueta}: {estado} · {info['hash'][:10]}")
+            st.caption(" | ".join(f"{k}: {v}" for k, v in _cache_ingesta().resumen().items()))
+
+        # Fuentes del grafo: la clave es el hash del contenido (y el modo de lectura de la Encuesta)
+        nodo_encuesta = ronda.fuente(
+            "Lectura Encuesta", agregado_encuesta if agregado_encuesta is not None else df_encuesta,
+            clave=(info_encuesta["hash"], lectura_selectiva, agregado_encuesta is not None),
+            reutilizada=info_encuesta["acierto"]
+        )
+        nodo_aforo = ronda.fuente("Lectura Aforo", df_aforo, clave=info_aforo["hash"], reutilizada=info_aforo["acierto"])
+        nodo_eed = ronda.fuente("Lectura EED", df_eed, clave=info_eed["hash"], reutilizada=info_eed["acierto"])
+        # Filas de la Encuesta para las etapas que las reciben (no hay en la lectura por bloques)
+        nodo_filas = None if agregado_encuesta is not None else nodo_encuesta
+
+        # Catálogo de multiplicadores (opcional): precarga los multiplicadores de rubros y sectores
+        catalogo = None
+        region_catalogo, anio_catalogo = None, None
+        if multiplicadores_file is not None:
+            from catalogo_multiplicadores import obtener_catalogo
+            try:
+                catalogo = obtener_catalogo(
+                    multiplicadores_file.getvalue(), multiplicadores_file.name,
+                    hash_archivo=_hash_subida(multiplicadores_file)
+                )
+            except ValueError as e:
+                st.sidebar.warning(f"Catálogo de multiplicadores no disponible: {e}")
+            else:
+                if len(catalogo.regiones) > 1:
+                    region_catalogo = st.sidebar.selectbox("Región de los multiplicadores", catalogo.regiones)
+                if catalogo.anios:
+                    anio_catalogo = st.sidebar.selectbox(
+                        "Año de los multiplicadores", catalogo.anios[::-1]
+                    )
 
         # Cálculo del PNL (modo flexible por motivo)
         st.markdown("### <i class='fas fa-users'></i> Potencial de No Locales (PNL)", unsafe_allow_html=True)
@@ -51,13 +361,54 @@ if encuesta_file and aforo_file and eed_file:
         col_reside = "¿Reside en la ciudad donde se desarrolla este evento?"
         col_motivo = "¿Cuál fue el motivo de su viaje a esta ciudad o municipio?"
 
+        armonizar_motivos = st.checkbox(
+            "Armonizar variantes de escritura del motivo",
+            value=False,
+            help="Agrupa respuestas que solo difieren en tildes, mayúsculas, puntuación o errores menores "
+                 "(p. ej. 'Vacaciones/ocio' y 'vacaciones ocio')."
+        )
+        # Diccionario entre eventos: entrada explícita (su contenido forma parte de las claves de caché)
+        motivos_conocidos = None
+        if armonizar_motivos and st.checkbox(
+            "Recordar las agrupaciones entre eventos",
+            value=False, key="recordar_motivos",
+            help="Parte de las agrupaciones guardadas en .cache/motivos_armonizados.json y agrega las de este evento, "
+                 "para que los mismos textos caigan en la misma categoría en todos los eventos."
+        ):
+            motivos_conocidos = leer_motivos_conocidos(RUTA_MOTIVOS)
+
         # Detectar categorías disponibles entre NO residentes
+        indice_encuesta = None
         try:
-            conteos_motivos = detectar_categorias_motivo(
-                df_encuesta,
+            if agregado_encuesta is not None:
+                from agregado_encuesta import AgregadoEncuesta
+                nodo_indice = ronda.etapa(
+                    "Índice de encuesta", AgregadoEncuesta.indice, nodo_encuesta, armonizar=armonizar_motivos,
+                    motivos_conocidos=motivos_conocidos
+                )
+            else:
+                nodo_indice = ronda.etapa(
+                    "Índice de encuesta", IndiceEncuesta, nodo_encuesta, col_reside, col_motivo,
+                    armonizar=armonizar_motivos, motivos_conocidos=motivos_conocidos
+                )
+            indice_encuesta = nodo_indice.valor
+            if motivos_conocidos is not None and indice_encuesta.motivos_conocidos != motivos_conocidos:
+                guardar_motivos_conocidos(RUTA_MOTIVOS, indice_encuesta.motivos_conocidos)
+            if indice_encuesta.mapa_motivos:
+                with st.expander(f"Variantes de motivo agrupadas ({len(indice_encuesta.mapa_motivos)})", expanded=False):
+                    st.dataframe(
+                        pd.DataFrame(
+                            sorted(indice_encuesta.mapa_motivos.items()), columns=["Respuesta", "Categoría"]
+                        ),
+                        use_container_width=True
+                    )
+            conteos_motivos = ronda.etapa(
+                "Categorías de motivo", detectar_categorias_motivo,
+                nodo_filas,
                 columna_reside=col_reside,
-                columna_motivo=col_motivo
-            )
+                columna_motivo=col_motivo,
+                indice=nodo_indice
+            ).valor
             categorias_disponibles = conteos_motivos.index.tolist()
         except Exception as e:
             st.error(f"Error detectando categorías de motivo: {e}")
@@ -149,9 +500,10 @@ if encuesta_file and aforo_file and eed_file:
             tipo_backend = "ambos"
 
 
-        resultado_poblacion = calcular_poblacion(
-            df_encuesta=df_encuesta,
-            df_aforo=df_aforo,
+        nodo_poblacion = ronda.etapa(
+            "Población", calcular_poblacion,
+            df_encuesta=nodo_filas,
+            df_aforo=nodo_aforo,
             columna_reside=col_reside,
             columna_motivo=col_motivo,
             categoria_principal=categoria_principal,
@@ -164,8 +516,10 @@ if encuesta_file and aforo_file and eed_file:
 
             activar_factor_correccion=activar_factor_correccion,
             factor_pt_n_sobre_rho=factor_pt_n_sobre_rho,
-            tipo_poblacion=tipo_backend
+            tipo_poblacion=tipo_backend,
+            indice=nodo_indice
         )
+        resultado_poblacion = nodo_poblacion.valor
 
 
 
@@ -192,20 +546,96 @@ if encuesta_file and aforo_file and eed_file:
             ),
         })
 
+        # Sensibilidad de la población a los ponderadores y al factor n/ρ
+        with st.expander("Análisis de sensibilidad de la población (ponderadores y n/ρ)", expanded=False):
+            if indice_encuesta is None:
+                st.info("No hay índice de encuesta disponible para calcular la sensibilidad.")
+            else:
+                parametros_sens = {
+                    "Peso principal (NO LOCALES)": ("peso_principal_no_local", peso_principal_no_local, 2.0),
+                    "Peso otras (NO LOCALES)": ("peso_otros_no_local", peso_otros_no_local, 2.0),
+                    "Peso principal (LOCALES)": ("peso_principal_local", peso_principal_local, 2.0),
+                    "Peso otras (LOCALES)": ("peso_otros_local", peso_otros_local, 2.0),
+                    "Factor n/ρ": (
+                        "factor_pt_n_sobre_rho",
+                        factor_pt_n_sobre_rho if (activar_factor_correccion and factor_pt_n_sobre_rho is not None) else 1.0,
+                        1.0,
+                    ),
+                }
+                etiquetas_sens = list(parametros_sens)
+                s1, s2, s3, s4 = st.columns(4)
+                eje_x = s1.selectbox("Eje X", etiquetas_sens, index=0, key="sens_x")
+                eje_y = s2.selectbox("Eje Y", etiquetas_sens, index=4, key="sens_y")
+                serie_sens = s3.selectbox("Resultado", ["PNL", "PL", "Total"],
+                                          index={"no_local": 0, "local": 1}.get(tipo_backend, 2), key="sens_serie")
+                pasos_sens = s4.slider("Puntos por eje", min_value=5, max_value=101, value=21, key="sens_pasos")
+
+                if eje_x == eje_y:
+                    st.warning("Selecciona parámetros distintos para los ejes X e Y.")
+                else:
+                    # Los ejes recorren todo su rango; el resto queda fijo en el valor actual
+                    valores_sens = {}
+                    for etiqueta, (nombre, actual, maximo) in parametros_sens.items():
+                        valores_sens[nombre] = (
+                            np.linspace(0.0, maximo, pasos_sens) if etiqueta in (eje_x, eje_y) else [actual]
+                        )
+                    grilla = ronda.etapa(
+                        "Sensibilidad", calcular_grilla_sensibilidad,
+                        nodo_indice, nodo_aforo, categoria_principal,
+                        pesos_principal_no_local=valores_sens["peso_principal_no_local"],
+                        pesos_otros_no_local=valores_sens["peso_otros_no_local"],
+                        pesos_principal_local=valores_sens["peso_principal_local"],
+                        pesos_otros_local=valores_sens["peso_otros_local"],
+                        factores_pt=valores_sens["factor_pt_n_sobre_rho"],
+                    ).valor
+                    mallas = np.meshgrid(*grilla["ejes"].values(), indexing="ij")
+                    df_sens = pd.DataFrame({
+                        eje_x: mallas[list(grilla["ejes"]).index(parametros_sens[eje_x][0])].ravel(),
+                        eje_y: mallas[list(grilla["ejes"]).index(parametros_sens[eje_y][0])].ravel(),
+                        serie_sens: grilla[serie_sens].ravel(),
+                    }).round({eje_x: 4, eje_y: 4})
+                    st.altair_chart(
+                        alt.Chart(df_sens).mark_rect().encode(
+                            x=alt.X(f"{eje_x}:O", axis=alt.Axis(format=".2f")),
+                            y=alt.Y(f"{eje_y}:O", axis=alt.Axis(format=".2f"), sort="descending"),
+                            color=alt.Color(f"{serie_sens}:Q", scale=alt.Scale(scheme="viridis")),
+                            tooltip=[eje_x, eje_y, alt.Tooltip(f"{serie_sens}:Q", format=",.0f")],
+                        ),
+                        use_container_width=True
+                    )
+
         # Pruebas de normalidad de encuestas no residentes.
         st.markdown("### <i class='fas fa-microscope'></i> Evaluación de distribución de variables", unsafe_allow_html=True)
 
-        df_base = resultado_poblacion["grupo"]
-        columnas_numericas = df_base.select_dtypes(include='number').columns.tolist()
+        if agregado_encuesta is not None:
+            opciones_eval = agregado_encuesta.columnas_con_datos(tipo_backend)
+            columnas_numericas = opciones_eval
+            st.caption(
+                f"Encuesta leída por bloques ({agregado_encuesta.filas:,} filas): "
+                "Shapiro-Wilk se aplica sobre una muestra aleatoria de cada columna."
+            )
+        else:
+            # Columnas y tipos de la encuesta (el grupo tiene los mismos), sin copiar filas
+            df_base = nodo_indice.valor.df.iloc[:0]
+            opciones_eval = df_base.columns
+            columnas_numericas = df_base.select_dtypes(include='number').columns.tolist()
         columnas_seleccionadas = st.multiselect(
             "Selecciona columnas para análisis estadístico",
-            options=df_base.columns,
+            options=opciones_eval,
             default=[col for col in columnas_numericas if col not in ['orden', 'secuencia_p']]
         )
 
         if columnas_seleccionadas:
-            from backend import evaluar_distribuciones
-            resultados_stats = evaluar_distribuciones(df_base, columnas_seleccionadas)
+            if agregado_encuesta is not None:
+                nodo_stats = ronda.etapa(
+                    "Estadísticos", AgregadoEncuesta.estadisticos, nodo_encuesta, tipo_backend, columnas_seleccionadas
+                )
+            else:
+                # Depende solo del índice y del tipo de población (no de los pesos)
+                nodo_stats = ronda.etapa(
+                    "Estadísticos", _estadisticos_grupo, nodo_indice, tipo_backend, columnas_seleccionadas
+                )
+            resultados_stats = nodo_stats.valor
             df_resultados = pd.DataFrame(resultados_stats).T
             st.dataframe(df_resultados.style.format({
                 "p_value": "{:.3f}",
@@ -214,6 +644,7 @@ if encuesta_file and aforo_file and eed_file:
             }))
 
         # Calculo de efecto economico indirecto
+        resultado_indirecto = None
         st.markdown("### <i class='fas fa-chart-line'></i> Efectos Económicos ", unsafe_allow_html=True)
 
         # Usar directamente los stats ya calculados
@@ -231,11 +662,16 @@ if encuesta_file and aforo_file and eed_file:
             # --- Multiplicadores: general fijo + por rubro + extras dinámicos ---
             m_general = 1.0
             st.caption("Los multiplicadores se definen individualmente por rubro (general fijo en 1.0).")
+            if catalogo is not None:
+                mult_rubros = catalogo.multiplicadores_rubros(region_catalogo, anio_catalogo, defecto=m_general)
+                st.caption("Valores iniciales tomados del catálogo de multiplicadores (editables).")
+            else:
+                mult_rubros = {}
 
             c5, c6, c7 = st.columns(3)
-            m_aloj = c5.number_input("Multiplicador alojamiento", min_value=0.0, value=m_general, step=0.01, format="%.4f")
-            m_alim = c6.number_input("Multiplicador alimentación", min_value=0.0, value=m_general, step=0.01, format="%.4f")
-            m_trans = c7.number_input("Multiplicador transporte", min_value=0.0, value=m_general, step=0.01, format="%.4f")
+            m_aloj = c5.number_input("Multiplicador alojamiento", min_value=0.0, value=mult_rubros.get("alojamiento", m_general), step=0.01, format="%.4f")
+            m_alim = c6.number_input("Multiplicador alimentación", min_value=0.0, value=mult_rubros.get("alimentacion", m_general), step=0.01, format="%.4f")
+            m_trans = c7.number_input("Multiplicador transporte", min_value=0.0, value=mult_rubros.get("transporte", m_general), step=0.01, format="%.4f")
 
             # --- Sectores extra dinámicos ---
             if "extra_count" not in st.session_state:
@@ -257,15 +693,26 @@ if encuesta_file and aforo_file and eed_file:
                         options=opciones_cols,
                         key=f"extra_col_{i}"
                     )
+                    mult_defecto = m_general
+                    if catalogo is not None:
+                        sector_catalogo = cex1.selectbox(
+                            f"Sector del catálogo (extra {i})",
+                            options=[None] + catalogo.nombres_sectores(),
+                            format_func=lambda v: "(manual)" if v is None else v,
+                            key=f"extra_sector_{i}"
+                        )
+                        if sector_catalogo is not None:
+                            mult_defecto = catalogo.obtener(sector_catalogo, region_catalogo, anio_catalogo, m_general)
                     mult_extra = cex2.number_input(
                         f"Multiplicador sector extra {i}",
-                        min_value=0.0, value=m_general, step=0.01, format="%.4f",
+                        min_value=0.0, value=mult_defecto, step=0.01, format="%.4f",
                         key=f"extra_mult_{i}"
                     )
                     extras_cfg.append({"name": f"Sector extra {i}", "col": col_extra, "mult": mult_extra})
 
-            resultado_indirecto, desglose = calcular_efecto_economico_indirecto(
-                stats=resultados_stats,
+            resultado_indirecto, desglose = ronda.etapa(
+                "Efecto indirecto", calcular_efecto_economico_indirecto,
+                stats=nodo_stats,
                 pnl=resultado_poblacion["Poblacion_estimacion"],
                 multiplicador=m_general,
                 multiplicadores={
@@ -280,7 +727,7 @@ if encuesta_file and aforo_file and eed_file:
                 extras=extras_cfg,
                 n_eventos=n_eventos,              # <<< NUEVO
                 modo_local=(tipo_backend != "no_local")  # <<< NUEVO
-            )
+            ).valor
 
 
             extras_str = " | ".join([f"{ex['name']}: {ex['mult']:.4f}" for ex in extras_cfg]) if extras_cfg else ""
@@ -295,12 +742,6 @@ if encuesta_file and aforo_file and eed_file:
             )
 
             # ---- Tablas de salida ----
-            def _fmt_num(x):
-                try:
-                    return f"{float(x):,.2f}"
-                except (ValueError, TypeError):
-                    return x
-
             # Desglose por rubro, tener en cuenta que el inducido neto en este caso unicamente es el inducido indirecto
             df_desglose = pd.DataFrame(desglose, columns=["Rubro", "Gasto diario usado", "Indirecto", "Inducido neto"])
             for c in ["Gasto diario usado", "Indirecto", "Inducido neto"]:
@@ -317,119 +758,306 @@ if encuesta_file and aforo_file and eed_file:
         if "V_EED" not in df_eed.columns or "Sector_EED" not in df_eed.columns:
             st.warning("El EED no tiene columnas 'Sector_EED' y/o 'V_EED'. No se puede construir el desglose por sectores.")
         else:
-            # Días a usar: por defecto, los que ya usamos en efectos económicos
-            dias_sectores = st.number_input(
-                "Días de estadía a usar para el cálculo sectorial",
-                min_value=0.0,
-                value=float(resultado_indirecto["Días de estadía (valor usado)"]) if "resultado_indirecto" in locals() else 0.0,
-                step=0.5,
-                format="%.2f"
-            )
+            # Multiplicadores iniciales por sector desde el catálogo (si se cargó)
+            mult_catalogo = {}
+            if catalogo is not None:
+                mult_catalogo = {
+                    c["sector"]: c["multiplicador"]
+                    for c in catalogo.config_sectores(df_eed, region=region_catalogo, anio=anio_catalogo)
+                }
 
-            # Listado de sectores base desde el EED
-            sectores_unicos = (
-                df_eed["Sector_EED"].astype(str).fillna("Sin sector").unique().tolist()
-            )
-            sectores_unicos = sorted(sectores_unicos)
-
-            st.caption("Activa y define el 'gasto (media/mediana)' y el multiplicador para calcular el efecto indirecto por sector.")
-
-            # Construcción dinámica de config por sector
-            config_sectores = []
-            for s in sectores_unicos:
-                with st.expander(f"Sector: {s}", expanded=False):
-                    c1, c2, c3 = st.columns([1,1,1])
-                    activar = c1.checkbox("Calcular efecto indirecto", key=f"sec_act_{s}")
-                    gasto_sector = c2.number_input(
-                        "Gasto (media/mediana) del sector",
-                        min_value=0.0, value=0.0, step=1.0, format="%.2f",
-                        key=f"sec_gasto_{s}"
-                    )
-                    mult_sector = c3.number_input(
-                        "Multiplicador del sector",
-                        min_value=0.0, value=1.0, step=0.01, format="%.4f",
-                        key=f"sec_mult_{s}"
-                    )
-                    config_sectores.append({
-                        "sector": s,
-                        "activar": activar,
-                        "gasto": gasto_sector,
-                        "multiplicador": mult_sector
-                    })
-
-            # Cálculo
-            from backend import calcular_desglose_por_sectores
-            df_sectorial, trazas_sector = calcular_desglose_por_sectores(
-                df_eed=df_eed,
+            # Tabla de sectores y desglose en un fragmento: editarla no vuelve a correr el resto del script
+            _seccion_sectores(
+                nodo_eed,
                 pnl=resultado_poblacion["Poblacion_estimacion"],
-                dias_usado=dias_sectores,
-                col_sector="Sector_EED",
-                col_valor="V_EED",
-                config_sectores=config_sectores,
-                n_eventos=n_eventos,            # <<< NUEVO
-                modo_local=(tipo_backend != "no_local")  # <<< NUEVO
+                n_eventos=n_eventos,
+                modo_local=(tipo_backend != "no_local"),
+                # Días a usar: por defecto, los que ya usamos en efectos económicos
+                dias_defecto=(
+                    float(resultado_indirecto["Días de estadía (valor usado)"])
+                    if resultado_indirecto is not None else 0.0
+                ),
+                mult_catalogo=mult_catalogo,
+                multiplicadores_file=multiplicadores_file,
             )
+            ronda.registro.extend(st.session_state.get("etapas_sectores", []))
+            dias_sectores = st.session_state["dias_sectores"]
+            config_sectores = st.session_state["config_sectores"]
 
 
-            def _fmt_num(x):
-                try:
-                    return f"{float(x):,.2f}"
-                except (ValueError, TypeError):
-                    return x
+            # Sin efecto indirecto (no hay columnas evaluadas) no hay resumen ni lo que depende de él
+            if resultado_indirecto is None:
+                st.info("Selecciona columnas en la 'Evaluación de distribución' para ver el resumen, "
+                        "las elasticidades, los intervalos y los resultados guardados.")
+            else:
+                # Resumen total
+                if "V_EED" in df_eed.columns:
+                    efecto_directo_total = pd.to_numeric(df_eed["V_EED"], errors="coerce").sum()
+                else:
+                    st.warning("La columna 'V_EED' no existe en el archivo EED. No se puede calcular el efecto directo total.")
+                    efecto_directo_total = float("nan")
 
-            df_sectorial_fmt = df_sectorial.copy()
-            # Formato numérico para montos
-            for c in ["Efecto directo", "Efecto indirecto", "Total, efecto inducido neto", "Efecto económico total"]:
-                df_sectorial_fmt[c] = df_sectorial_fmt[c].apply(_fmt_num)
-            # Formato porcentaje
-            df_sectorial_fmt["% efecto económico total"] = df_sectorial["% efecto económico total"].apply(
-                lambda v: f"{float(v):.2%}" if pd.notna(v) else v
-            )
+                efecto_economico_total = (
+                    (resultado_indirecto["Efecto Indirecto Total"] or 0.0) +
+                    (resultado_indirecto["Efecto Inducido Neto Total"] or 0.0) +
+                    (efecto_directo_total if pd.notna(efecto_directo_total) else 0.0)
+                )
 
-            st.subheader("Desglose por sectores")
-            st.dataframe(df_sectorial_fmt, use_container_width=True)
+                # Parámetros de la corrida (los usan elasticidades, bootstrap y el almacén de resultados)
+                params_poblacion = dict(
+                    columna_reside=col_reside,
+                    columna_motivo=col_motivo,
+                    categoria_principal=categoria_principal,
+                    peso_principal_no_local=peso_principal_no_local,
+                    peso_otros_no_local=peso_otros_no_local,
+                    peso_principal_local=peso_principal_local,
+                    peso_otros_local=peso_otros_local,
+                    activar_factor_correccion=activar_factor_correccion,
+                    factor_pt_n_sobre_rho=factor_pt_n_sobre_rho,
+                    tipo_poblacion=tipo_backend,
+                    armonizar_motivos=armonizar_motivos,
+                    motivos_conocidos=motivos_conocidos,
+                )
+                params_efecto = dict(
+                    multiplicador=m_general,
+                    multiplicadores={"alojamiento": m_aloj, "alimentacion": m_alim, "transporte": m_trans},
+                    col_aloj=col_aloj,
+                    col_alim=col_alim,
+                    col_trans=col_trans,
+                    col_dias=col_dias,
+                    extras=extras_cfg,
+                    n_eventos=n_eventos,
+                    modo_local=(tipo_backend != "no_local"),
+                )
 
+                resumen = {
+                    "Población base usada": resultado_poblacion["Poblacion_estimacion"],
+                    "Días de estadía (valor usado)": resultado_indirecto["Días de estadía (valor usado)"],
+                    "Multiplicador general": resultado_indirecto["Multiplicador general"],
+                    "Multiplicador alojamiento": resultado_indirecto["Multiplicador alojamiento"],
+                    "Multiplicador alimentación": resultado_indirecto["Multiplicador alimentación"],
+                    "Multiplicador transporte": resultado_indirecto["Multiplicador transporte"],
+                }
+                # Extras al resumen
+                for name, mult in (resultado_indirecto.get("Multiplicadores extras") or {}).items():
+                    resumen[f"Multiplicador {name}"] = mult
 
-            # Resumen total
-            if "V_EED" in df_eed.columns:
-                efecto_directo_total = pd.to_numeric(df_eed["V_EED"], errors="coerce").sum()
-            else:
-                st.warning("La columna 'V_EED' no existe en el archivo EED. No se puede calcular el efecto directo total.")
-                efecto_directo_total = float("nan")
+                df_resumen = pd.DataFrame(resumen, index=["Valor"]).T
 
-            efecto_economico_total = (
-                (resultado_indirecto["Efecto Indirecto Total"] or 0.0) +
-                (resultado_indirecto["Efecto Inducido Neto Total"] or 0.0) +
-                (efecto_directo_total if pd.notna(efecto_directo_total) else 0.0)
-            )
+                # Formatear sólo numéricos
+                df_resumen["Valor"] = df_resumen["Valor"].apply(_fmt_num)
+
+                st.subheader("Resumen datos clave")
+                st.dataframe(df_resumen, use_container_width=True)
+
+                # Qué parámetros mueven más el resultado (derivadas exactas, sin recalcular la app)
+                with st.expander("Elasticidades y gráfico tornado", expanded=False):
+                    # Bajo demanda: el contenido de un expander corre en cada rerun aunque esté cerrado
+                    mostrar_elasticidades = st.checkbox("Mostrar elasticidades", key="mostrar_elasticidades")
+                    if indice_encuesta is None:
+                        st.info("Se necesita el índice de la encuesta para calcular elasticidades.")
+                    elif mostrar_elasticidades:
+                        from elasticidades import OBJETIVOS, calcular_elasticidades, tornado
+                        tabla_elasticidades = ronda.etapa(
+                            "Elasticidades", calcular_elasticidades,
+                            nodo_indice, nodo_aforo, nodo_stats,
+                            params_poblacion=params_poblacion,
+                            params_efecto=params_efecto,
+                            efecto_directo=float(efecto_directo_total) if pd.notna(efecto_directo_total) else 0.0,
+                        ).valor
 
-            resumen = {
-                "Población base usada": resultado_poblacion["Poblacion_estimacion"],
-                "Días de estadía (valor usado)": resultado_indirecto["Días de estadía (valor usado)"],
-                "Multiplicador general": resultado_indirecto["Multiplicador general"],
-                "Multiplicador alojamiento": resultado_indirecto["Multiplicador alojamiento"],
-                "Multiplicador alimentación": resultado_indirecto["Multiplicador alimentación"],
-                "Multiplicador transporte": resultado_indirecto["Multiplicador transporte"],
-            }
-            # Extras al resumen
-            for name, mult in (resultado_indirecto.get("Multiplicadores extras") or {}).items():
-                resumen[f"Multiplicador {name}"] = mult
+                        t1, t2 = st.columns(2)
+                        objetivo = t1.selectbox("Resultado", OBJETIVOS, index=len(OBJETIVOS) - 1, key="tornado_objetivo")
+                        variacion = t2.slider("Variación de cada parámetro (±%)", min_value=1, max_value=50, value=10,
+                                              key="tornado_variacion")
+                        df_tornado = tornado(tabla_elasticidades, objetivo, variacion / 100)
+                        if df_tornado.empty:
+                            st.info("Ningún parámetro mueve este resultado.")
+                        else:
+                            base_tornado = float(df_tornado["resultado"].iloc[0])
+                            barras = alt.Chart(df_tornado).mark_bar().encode(
+                                y=alt.Y("parametro:N", sort=None, title=None),
+                                x=alt.X("bajo:Q", title=f"{objetivo} (−{variacion}% … +{variacion}%)",
+                                        scale=alt.Scale(zero=False)),
+                                x2="alto:Q",
+                                color=alt.Color("grupo:N", title="Grupo"),
+                                tooltip=[
+                                    "parametro", alt.Tooltip("elasticidad:Q", format=".3f"),
+                                    alt.Tooltip("bajo:Q", format=",.0f"), alt.Tooltip("alto:Q", format=",.0f"),
+                                ],
+                            )
+                            linea_base = alt.Chart(pd.DataFrame({"base": [base_tornado]})).mark_rule(color="black").encode(
+                                x="base:Q"
+                            )
+                            st.altair_chart(barras + linea_base, use_container_width=True)
+                            st.caption(
+                                f"{objetivo} actual: {base_tornado:,.0f}. Cada resultado es lineal en cada parámetro, "
+                                "así que las barras son exactas (elasticidad × variación)."
+                            )
 
-            df_resumen = pd.DataFrame(resumen, index=["Valor"]).T
+                        st.dataframe(
+                            tabla_elasticidades.pivot(index="parametro", columns="objetivo", values="elasticidad")
+                            .reindex(index=tabla_elasticidades["parametro"].unique(), columns=list(OBJETIVOS))
+                            .style.format("{:.4f}", na_rep="—"),
+                            use_container_width=True
+                        )
 
-            # Formatear sólo numéricos
-            def _fmt_num(x):
-                try:
-                    return f"{float(x):,.2f}"
-                except (ValueError, TypeError):
-                    return x
+                # Intervalos de confianza (bajo demanda: es el cálculo más costoso de la app)
+                with st.expander("Intervalos de confianza (bootstrap de encuestados)", expanded=False):
+                    bc1, bc2, bc3 = st.columns(3)
+                    n_replicas = bc1.number_input("Réplicas", min_value=100, max_value=50000, value=2000, step=500)
+                    nivel_conf = bc2.slider("Nivel de confianza", min_value=0.80, max_value=0.99, value=0.95, step=0.01)
+                    semilla_boot = bc3.number_input("Semilla", min_value=0, value=0, step=1)
 
-            df_resumen["Valor"] = df_resumen["Valor"].apply(_fmt_num)
+                    if agregado_encuesta is not None:
+                        st.info("El bootstrap necesita las respuestas individuales: desactiva la lectura por bloques.")
+                    elif st.button("Calcular intervalos"):
+                        from remuestreo import bootstrap_efecto_economico
+                        with st.spinner("Remuestreando encuestados..."):
+                            boot = bootstrap_efecto_economico(
+                                df_encuesta=df_encuesta,
+                                df_aforo=df_aforo,
+                                params_poblacion=params_poblacion,
+                                params_efecto=params_efecto,
+                                df_eed=df_eed,
+                                params_sectores=dict(
+                                    dias_usado=dias_sectores,
+                                    config_sectores=config_sectores,
+                                    n_eventos=n_eventos,
+                                    modo_local=(tipo_backend != "no_local"),
+                                ),
+                                n_replicas=int(n_replicas),
+                                nivel=float(nivel_conf),
+                                semilla=int(semilla_boot),
+                            )
+                        pob = boot["poblacion"]
+                        st.write(
+                            f"Población base: **{pob['estimacion']:,.0f}** "
+                            f"(IC {boot['nivel']:.0%}: {pob['inferior']:,.0f} – {pob['superior']:,.0f})"
+                        )
+                        st.dataframe(boot["rubros"].style.format(precision=2, thousands=","), use_container_width=True)
+                        st.dataframe(boot["sectores"].style.format(precision=2, thousands=","), use_container_width=True)
 
-            st.subheader("Resumen datos clave")
-            st.dataframe(df_resumen, use_container_width=True)
+                # Corridas guardadas en disco: sobreviven a reinicios y se pueden ver y comparar entre sí.
+                # El cálculo de arriba no lee del almacén: tras reiniciar, lo costoso es leer e indexar los
+                # archivos, y eso no se guarda; lote.py --almacen sí sirve los resultados sin recalcular.
+                with st.expander("Resultados guardados (SQLite)", expanded=False):
+                    almacen = _almacen()
+                    entradas_corrida = {
+                        "encuesta": info_encuesta["hash"], "aforo": info_aforo["hash"], "eed": info_eed["hash"],
+                        "motivos": hash_motivos_conocidos(motivos_conocidos),
+                    }
+                    parametros_corrida = {
+                        "poblacion": {k: v for k, v in params_poblacion.items() if k != "motivos_conocidos"},
+                        "efecto": params_efecto,
+                        "sectores": {"dias_usado": dias_sectores, "config_sectores": config_sectores},
+                        "lectura_por_bloques": agregado_encuesta is not None,
+                    }
+                    clave_corrida = almacen.clave(entradas_corrida, parametros_corrida)
+                    g1, g2 = st.columns([3, 1])
+                    etiqueta_corrida = g1.text_input("Etiqueta de la corrida (opcional)", key="etiqueta_corrida")
+                    if g2.button("Guardar corrida actual"):
+                        almacen.guardar(entradas_corrida, parametros_corrida, {
+                            "poblacion": resultado_poblacion,
+                            "estadisticos": df_resultados,
+                            "desglose": desglose,
+                            "sectores": st.session_state.get("tabla_sectorial"),
+                            "resumen": {
+                                **resumen,
+                                "Efecto Indirecto Total": resultado_indirecto["Efecto Indirecto Total"],
+                                "Efecto Inducido Neto Total": resultado_indirecto["Efecto Inducido Neto Total"],
+                                "Efecto directo total": float(efecto_directo_total),
+                                "Efecto económico total": float(efecto_economico_total),
+                            },
+                        }, etiqueta=etiqueta_corrida or None)
+                    if almacen.existe(clave_corrida):
+                        st.caption(f"Esta corrida (mismos archivos y parámetros) está guardada · {clave_corrida[:12]}")
+                    else:
+                        st.caption("Esta corrida no está guardada.")
+                    st.caption(
+                        "Guardar no acelera el cálculo de esta página: sirve para ver y comparar corridas después "
+                        "(también tras reiniciar). Para reutilizar resultados sin recalcular, usa lote.py --almacen."
+                    )
+
+                    # Bajo demanda: listar, ver y comparar lee la base en cada rerun
+                    if st.checkbox("Mostrar corridas guardadas", key="mostrar_corridas"):
+                        df_corridas = almacen.listar()
+                        st.caption(" | ".join(f"{k}: {v}" for k, v in almacen.resumen().items()))
+                        st.dataframe(
+                            df_corridas.assign(clave=df_corridas["clave"].str[:12]),
+                            use_container_width=True, hide_index=True
+                        )
+                        # Opciones en orden de creación (el de uso cambia al ver una corrida)
+                        por_creacion = df_corridas.sort_values(["creada", "clave"], ascending=False)
+                        nombres_corridas = {
+                            c: f"{c[:12]} · {e or 'sin etiqueta'} · {f}"
+                            for c, e, f in zip(por_creacion["clave"], por_creacion["etiqueta"], por_creacion["creada"])
+                        }
+                        if nombres_corridas:
+                            # Resultados guardados, sin recalcular nada
+                            corrida_ver = st.selectbox("Ver corrida", list(nombres_corridas),
+                                                       format_func=nombres_corridas.get, key="corrida_ver")
+                            guardada = almacen.cargar(corrida_ver)
+                            if guardada.get("resumen"):
+                                st.dataframe(
+                                    pd.DataFrame(guardada["resumen"], index=["Valor"]).T.map(_fmt_num),
+                                    use_container_width=True
+                                )
+                            for titulo, clave_tabla in (("Estadísticos", "estadisticos"), ("Desglose por sectores", "sectores")):
+                                if isinstance(guardada.get(clave_tabla), pd.DataFrame):
+                                    st.caption(titulo)
+                                    st.dataframe(guardada[clave_tabla], use_container_width=True)
+                        if len(nombres_corridas) >= 2:
+                            d1, d2 = st.columns(2)
+                            corrida_a = d1.selectbox("Corrida A", list(nombres_corridas), index=1,
+                                                     format_func=nombres_corridas.get, key="corrida_a")
+                            corrida_b = d2.selectbox("Corrida B", list(nombres_corridas), index=0,
+                                                     format_func=nombres_corridas.get, key="corrida_b")
+                            df_diferencias = almacen.diferencias(corrida_a, corrida_b)
+                            if df_diferencias.empty:
+                                st.info("Las corridas son iguales.")
+                            else:
+                                st.dataframe(
+                                    df_diferencias.astype({"a": str, "b": str})
+                                    .style.format({"diferencia": "{:,.2f}", "diferencia_rel": "{:.2%}"}, na_rep="—"),
+                                    use_container_width=True, hide_index=True
+                                )
 
     except Exception as e:
         st.error(f"Ocurrió un error al procesar los datos: {e}")
+
+    # Qué etapas se reutilizaron en este rerun y cuáles se recalcularon
+    with st.sidebar.expander("Etapas del cálculo", expanded=False):
+        df_etapas = ronda.tabla()
+        st.caption(
+            f"Reutilizadas: {(df_etapas['estado'] == 'reutilizada').sum()} · "
+            f"calculadas: {(df_etapas['estado'] == 'calculada').sum()} · "
+            + " | ".join(f"{k}: {v}" for k, v in _grafo().resumen().items())
+        )
+        st.dataframe(df_etapas.style.format({"segundos": "{:.3f}"}), use_container_width=True, hide_index=True)
 else:
     st.warning("Por favor sube los 3 archivos: Encuesta, Aforo y EED. (El archivo de multiplicadores es opcional y puedes descargar una plantilla en la barra lateral).")
+
+# Trazas de las funciones instrumentadas (incluye las llamadas de este rerun)
+with panel_diagnostico:
+    registros_traza = instrumentacion.trazas()
+    if registros_traza:
+        df_trazas = pd.DataFrame(registros_traza)
+        resumen_trazas = df_trazas.groupby("funcion", sort=False).agg(
+            llamadas=("segundos", "size"),
+            segundos_total=("segundos", "sum"),
+            segundos_max=("segundos", "max"),
+            filas_max=("filas", "max"),
+            pico_mb_max=("pico_mb", "max"),
+        )
+        st.dataframe(resumen_trazas.style.format(precision=3, na_rep="—"), use_container_width=True)
+        st.dataframe(
+            df_trazas.iloc[::-1].head(50).style.format({"segundos": "{:.4f}", "pico_mb": "{:.2f}"}, na_rep="—"),
+            use_container_width=True, hide_index=True
+        )
+        st.download_button(
+            "Descargar trazas (JSONL)", instrumentacion.a_jsonl(registros_traza),
+            file_name="trazas_calculo.jsonl", mime="application/jsonl"
+        )
+    elif instrumentacion.activa():
+        st.caption("Sin llamadas registradas todavía: las etapas reutilizadas no llaman al backend.")
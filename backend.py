@@ -1,76 +1,519 @@
 import pandas as pd
-import streamlit as st
-from scipy import stats as sci_stats
 import numpy as np
-from difflib import get_close_matches
+from difflib import SequenceMatcher
 import unicodedata
+import hashlib
+import json
+import os
+import threading
+import atexit
+import multiprocessing
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentacion import instrumentar
+
+
+# Columnas de la encuesta usadas para segmentar la población
+COLUMNA_RESIDE = "¿Reside en la ciudad donde se desarrolla este evento?"
+COLUMNA_MOTIVO = "¿Cuál fue el motivo de su viaje a esta ciudad o municipio?"
+
+# Alias -> texto de la pregunta esperada en la Encuesta
+COLUMNAS_ESPERADAS = {
+    "gasto_evento": "¿Cuánto ha gastado aproximadamente en actividades relacionadas con LOS EVENTOS RELIGIOSOS DE SEMANA SANTA EN CARTAGENA (souvenirs, artesanías, libros, etc.)?",
+    "dias_estadia": "¿Cuántos días estará en la ciudad donde se desarrolla este evento?",
+    "gasto_alojamiento": "¿Cuánto está gastando gasto diariamente en alojamiento? (Por persona):",
+    "gasto_alimentacion": "En promedio ¿Cuánto ha sido su gasto diario en alimentación y bebidas durante su estadía en la ciudad?",
+    "gasto_transporte": "En promedio ¿Cuánto ha sido su gasto diario en transporte durante su estadía en la ciudad?"
+}
+
+# Mapeos ya resueltos por plantilla de encuesta: en memoria (LRU) y, si se pide, en disco
+RUTA_PLANTILLAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "plantillas_columnas.json")
+MAX_PLANTILLAS = 256
+_PLANTILLAS = OrderedDict()
+_PLANTILLAS_LOCK = threading.Lock()
+
+
+def plegar_texto(texto) -> str:
+    """Texto sin tildes, en minúsculas y con la puntuación reducida a espacios."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+    return " ".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+def codigo_sector(valor):
+    """Código de sector comparable: 3, 3.0 y "3" dan 3; lo no numérico queda como texto."""
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return str(valor).strip()
+    return int(numero) if numero.is_integer() else numero
+
+
+class IndiceColumnas:
+    """
+    Índice de encabezados plegados (sin tildes ni mayúsculas) para ubicar
+    preguntas por nombre aproximado.
+
+    `resolver` busca primero una coincidencia exacta del texto plegado y, si
+    no la hay, la columna con mayor similitud (SequenceMatcher, como
+    difflib.get_close_matches) recorriendo los candidatos de más a menos
+    tokens compartidos y descartando por cotas baratas (largo y conteo de
+    caracteres) los que no pueden superar al mejor encontrado.
+    """
 
-
-def extraer_columnas_validas(df_encuesta):
+    def __init__(self, columnas):
+        self.columnas = list(columnas)
+        self.plegadas = [plegar_texto(c) for c in self.columnas]
+        self._exactas = {}
+        self._por_token = {}
+        for i, texto in enumerate(self.plegadas):
+            self._exactas.setdefault(texto, i)
+            for token in set(texto.split()):
+                self._por_token.setdefault(token, []).append(i)
+
+    def resolver(self, texto, cutoff=0.7):
+        objetivo = plegar_texto(texto)
+        i = self._exactas.get(objetivo)
+        if i is not None:
+            return self.columnas[i]
+
+        # Orden de evaluación: más tokens en común primero (el mejor aparece pronto)
+        compartidos = np.zeros(len(self.columnas), dtype=np.int64)
+        for token in set(objetivo.split()):
+            for i in self._por_token.get(token, ()):
+                compartidos[i] += 1
+        orden = np.argsort(-compartidos, kind="stable")
+
+        comparador = SequenceMatcher()
+        comparador.set_seq2(objetivo)
+        mejor, mejor_puntaje = None, cutoff
+        for i in orden:
+            comparador.set_seq1(self.plegadas[i])
+            if (comparador.real_quick_ratio() >= mejor_puntaje
+                    and comparador.quick_ratio() >= mejor_puntaje):
+                puntaje = comparador.ratio()
+                if puntaje > mejor_puntaje or (
+                    puntaje == mejor_puntaje and (mejor is None or str(self.columnas[i]) > str(mejor))
+                ):
+                    mejor, mejor_puntaje = self.columnas[i], puntaje
+        return mejor
+
+
+def _clave_plantilla(columnas) -> str:
+    # La plantilla es la lista de encabezados; los alias esperados también entran en la clave
+    contenido = json.dumps([COLUMNAS_ESPERADAS, [str(c) for c in columnas]], ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _leer_plantillas(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _recordar_plantilla(clave, mapeo):
+    _PLANTILLAS[clave] = mapeo
+    _PLANTILLAS.move_to_end(clave)
+    while len(_PLANTILLAS) > MAX_PLANTILLAS:
+        _PLANTILLAS.popitem(last=False)
+
+
+def _guardar_plantilla(ruta, clave, mapeo):
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        plantillas = _leer_plantillas(ruta)
+        plantillas.pop(clave, None)
+        plantillas[clave] = mapeo
+        # Solo las MAX_PLANTILLAS más recientes: el archivo no crece sin límite
+        plantillas = dict(list(plantillas.items())[-MAX_PLANTILLAS:])
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(plantillas, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, ruta)
+    except (OSError, TypeError, ValueError):
+        pass  # Sin permisos de escritura: el mapeo queda solo en memoria
+
+
+@instrumentar(filas="df_encuesta")
+def extraer_columnas_validas(df_encuesta, ruta_plantillas=None):
     """
     Busca las columnas más parecidas a las esperadas en el DataFrame recibido.
     Devuelve un diccionario con alias y nombres reales.
+
+    La comparación ignora tildes, mayúsculas y puntuación. El mapeo se guarda
+    por plantilla (hash de los encabezados) en memoria, hasta MAX_PLANTILLAS,
+    así que una encuesta con los mismos encabezados no se vuelve a comparar.
+    Con `ruta_plantillas` (p. ej. RUTA_PLANTILLAS) se guarda además en disco.
     """
-    columnas_esperadas = {
-        "gasto_evento": "¿Cuánto ha gastado aproximadamente en actividades relacionadas con LOS EVENTOS RELIGIOSOS DE SEMANA SANTA EN CARTAGENA (souvenirs, artesanías, libros, etc.)?",
-        "dias_estadia": "¿Cuántos días estará en la ciudad donde se desarrolla este evento?",
-        "gasto_alojamiento": "¿Cuánto está gastando gasto diariamente en alojamiento? (Por persona):",
-        "gasto_alimentacion": "En promedio ¿Cuánto ha sido su gasto diario en alimentación y bebidas durante su estadía en la ciudad?",
-        "gasto_transporte": "En promedio ¿Cuánto ha sido su gasto diario en transporte durante su estadía en la ciudad?"
+    columnas_disponibles = df_encuesta.columns.tolist()
+    clave = _clave_plantilla(columnas_disponibles)
+
+    with _PLANTILLAS_LOCK:
+        if clave not in _PLANTILLAS and ruta_plantillas:
+            guardado = _leer_plantillas(ruta_plantillas).get(clave)
+            # Solo se acepta si todas las columnas guardadas siguen existiendo
+            if guardado is not None and all(c is None or c in columnas_disponibles for c in guardado.values()):
+                _recordar_plantilla(clave, guardado)
+        if clave in _PLANTILLAS:
+            _PLANTILLAS.move_to_end(clave)
+            return dict(_PLANTILLAS[clave])
+
+    indice = IndiceColumnas(columnas_disponibles)
+    mapeo_resultante = {
+        alias: indice.resolver(col_esperada.strip(), cutoff=0.7)  # None si no se encuentra
+        for alias, col_esperada in COLUMNAS_ESPERADAS.items()
     }
 
-    mapeo_resultante = {}
-    columnas_disponibles = df_encuesta.columns.tolist()
+    with _PLANTILLAS_LOCK:
+        _recordar_plantilla(clave, mapeo_resultante)
+        if ruta_plantillas:
+            _guardar_plantilla(ruta_plantillas, clave, mapeo_resultante)
+    return dict(mapeo_resultante)
+
+
+# =============================================================================
+# ÍNDICE DE ENCUESTA: residencia y motivo normalizados una sola vez
+# =============================================================================
+
+# Segmentos de residencia
+SEG_SIN_RESPUESTA = 0
+SEG_LOCAL = 1
+SEG_NO_LOCAL = 2
+# Segmentos que forman el grupo de cada tipo de población
+SEGMENTOS_TIPO = {
+    "no_local": (SEG_NO_LOCAL,),
+    "local": (SEG_LOCAL,),
+    "ambos": (SEG_NO_LOCAL, SEG_LOCAL),
+}
+
+
+def _normalizar_reside(serie: pd.Series) -> pd.Series:
+    return serie.astype(str).str.strip().str.lower()
+
+
+def _normalizar_motivo(serie: pd.Series) -> pd.Series:
+    return serie.astype(str).str.strip().replace({"": "sin respuesta"}).str.lower()
+
+
+# ---- Armonización de motivos escritos a mano (variantes de una misma respuesta)
+# Ubicación sugerida del diccionario compartido entre eventos (solo si la app o lote.py lo piden)
+RUTA_MOTIVOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "motivos_armonizados.json")
+UMBRAL_ARMONIZACION = 0.85
+# Valores que nunca se agrupan con otros
+_MOTIVOS_RESERVADOS = {"sin respuesta", "nan", "none"}
+
+
+def leer_motivos_conocidos(ruta) -> dict:
+    """Diccionario {motivo plegado: categoría} guardado en `ruta` ({} si no existe)."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
-    for alias, col_esperada in columnas_esperadas.items():
-        coincidencias = get_close_matches(col_esperada.strip(), columnas_disponibles, n=1, cutoff=0.7)
-        if coincidencias:
-            mapeo_resultante[alias] = coincidencias[0]
+def guardar_motivos_conocidos(ruta, motivos_conocidos):
+    """Escribe el diccionario de motivos en `ruta` (reemplazo atómico)."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(motivos_conocidos, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+
+
+def hash_motivos_conocidos(motivos_conocidos) -> Optional[str]:
+    """Hash del diccionario de motivos (None si está vacío), para claves de caché."""
+    if not motivos_conocidos:
+        return None
+    texto = json.dumps(motivos_conocidos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def armonizar_motivos(motivos, frecuencias=None, umbral=UMBRAL_ARMONIZACION, motivos_conocidos=None) -> dict:
+    """
+    Agrupa variantes de escritura de los motivos (tildes, mayúsculas,
+    puntuación y errores menores) y devuelve {motivo: categoría armonizada}.
+
+    Trabaja solo sobre los valores únicos: primero los pliega (como
+    `plegar_texto`), luego recorre las formas plegadas de mayor a menor frecuencia
+    y une cada una al primer grupo con similitud >= `umbral`. La categoría de
+    un grupo nuevo es su variante más frecuente.
+
+    `motivos_conocidos` ({motivo plegado: categoría}, de otros eventos) fija
+    de antemano las categorías: los mismos textos caen en la misma categoría
+    en todos los eventos. No se modifica; el resultado depende solo de los
+    argumentos.
+    """
+    motivos = list(dict.fromkeys(motivos))
+    frecuencias = frecuencias or {}
+
+    # Formas plegadas, con su frecuencia total y su variante más frecuente
+    plegados = {m: plegar_texto(m) for m in motivos}
+    total_plegado, variante = {}, {}
+    for m in motivos:
+        clave = plegados[m]
+        total_plegado[clave] = total_plegado.get(clave, 0) + frecuencias.get(m, 0)
+        if clave not in variante or frecuencias.get(m, 0) > frecuencias.get(variante[clave], 0):
+            variante[clave] = m
+
+    conocidos = dict(motivos_conocidos or {})
+    # Representantes de los grupos ya existentes: forma plegada de cada categoría
+    lideres = {plegar_texto(c): c for c in conocidos.values()}
+
+    comparador = SequenceMatcher()
+    for clave in sorted(total_plegado, key=total_plegado.get, reverse=True):
+        if clave in conocidos:
+            continue
+        categoria = None
+        if variante[clave] not in _MOTIVOS_RESERVADOS and clave in lideres:
+            categoria = lideres[clave]
+        elif variante[clave] not in _MOTIVOS_RESERVADOS:
+            comparador.set_seq2(clave)
+            mejor_puntaje = umbral
+            for lider, categoria_lider in lideres.items():
+                if categoria_lider in _MOTIVOS_RESERVADOS:
+                    continue
+                comparador.set_seq1(lider)
+                if (comparador.real_quick_ratio() >= mejor_puntaje
+                        and comparador.quick_ratio() >= mejor_puntaje):
+                    puntaje = comparador.ratio()
+                    if puntaje >= mejor_puntaje:
+                        categoria, mejor_puntaje = categoria_lider, puntaje
+        if categoria is None:
+            categoria = variante[clave]
+            lideres[clave] = categoria
+        conocidos[clave] = categoria
+
+    return {m: conocidos[plegados[m]] for m in motivos}
+
+
+def ampliar_motivos_conocidos(motivos_conocidos, mapa) -> dict:
+    """Diccionario de motivos con las asignaciones de `mapa` (salida de armonizar_motivos) agregadas."""
+    return {**(motivos_conocidos or {}), **{plegar_texto(m): c for m, c in mapa.items()}}
+
+
+class IndiceEncuesta:
+    """
+    Índice de la encuesta (SurveyIndex) con residencia y motivo ya normalizados.
+
+    La limpieza de texto (.astype(str).str.strip().str.lower()) se hace solo
+    sobre los valores únicos de cada columna y se proyecta a las filas como
+    códigos enteros:
+        segmento[i]      -> SEG_SIN_RESPUESTA / SEG_LOCAL / SEG_NO_LOCAL
+        motivo_codigo[i] -> posición en `categorias` (motivos normalizados)
+
+    Con ello se precalcula la tabla `conteos[segmento, categoria]`, de modo que
+    `calcular_poblacion` y `detectar_categorias_motivo` cuestan O(categorías)
+    en cada llamada, sin importar los pesos usados.
+
+    Con `armonizar=True` los motivos normalizados pasan además por
+    `armonizar_motivos` (variantes de escritura -> una categoría), partiendo
+    de `motivos_conocidos` si se da; `mapa_motivos` guarda las variantes que
+    cambiaron de nombre y `motivos_conocidos` el diccionario ampliado con
+    las de esta encuesta (para guardarlo con guardar_motivos_conocidos).
+    """
+
+    def __init__(self, df_encuesta, columna_reside=COLUMNA_RESIDE, columna_motivo=COLUMNA_MOTIVO,
+                 armonizar=False, motivos_conocidos=None):
+        if columna_reside not in df_encuesta.columns:
+            raise ValueError(f"No existe columna '{columna_reside}'")
+        if columna_motivo not in df_encuesta.columns:
+            raise ValueError(f"No existe columna '{columna_motivo}'")
+
+        self.df = df_encuesta
+        self.columna_reside = columna_reside
+        self.columna_motivo = columna_motivo
+
+        # ---- Residencia: normalizar únicos y proyectar a filas
+        cod_res, unicos_res = pd.factorize(df_encuesta[columna_reside], use_na_sentinel=False)
+        res_norm = _normalizar_reside(pd.Series(unicos_res))
+        seg_unicos = np.select(
+            [res_norm.eq("no").to_numpy(), res_norm.isin(["sí", "si"]).to_numpy()],
+            [SEG_NO_LOCAL, SEG_LOCAL],
+            default=SEG_SIN_RESPUESTA,
+        ).astype(np.int8)
+        self.segmento = seg_unicos[cod_res] if len(cod_res) else np.zeros(0, dtype=np.int8)
+
+        # ---- Motivo: códigos crudos (para nunique) y normalizados
+        cod_crudo, unicos_crudos = pd.factorize(df_encuesta[columna_motivo], use_na_sentinel=False)
+        es_nulo_crudo = pd.isna(pd.Series(unicos_crudos)).to_numpy()
+        mot_norm = _normalizar_motivo(pd.Series(unicos_crudos))
+        self.armonizado = bool(armonizar)
+        self.mapa_motivos = {}
+        self.motivos_conocidos = {}
+        if armonizar:
+            # Solo los valores únicos (no nulos) pasan por la armonización
+            frec_crudos = np.bincount(cod_crudo, minlength=len(unicos_crudos))
+            validos_norm = mot_norm[~es_nulo_crudo]
+            frecuencias = pd.Series(frec_crudos[~es_nulo_crudo]).groupby(validos_norm.to_numpy()).sum()
+            mapa = armonizar_motivos(validos_norm.unique(), frecuencias.to_dict(), motivos_conocidos=motivos_conocidos)
+            self.mapa_motivos = {m: c for m, c in mapa.items() if m != c}
+            self.motivos_conocidos = ampliar_motivos_conocidos(motivos_conocidos, mapa)
+            mot_norm = mot_norm.where(es_nulo_crudo, mot_norm.map(mapa))
+        cod_norm_unicos, categorias = pd.factorize(mot_norm)
+        self.categorias = pd.Index(categorias)
+        self.motivo_codigo = cod_norm_unicos[cod_crudo].astype(np.int32)
+        self._codigo_categoria = {c: i for i, c in enumerate(self.categorias)}
+
+        # ---- Tablas de conteo
+        k = len(self.categorias)
+        self.conteos = np.bincount(
+            self.segmento.astype(np.int64) * k + self.motivo_codigo, minlength=3 * k
+        ).reshape(3, k) if k else np.zeros((3, 0), dtype=np.int64)
+        self.total_segmento = np.bincount(self.segmento, minlength=3)
+
+        # nunique de los valores crudos (sin nulos) por segmento, como Series.nunique();
+        # armonizado, cuenta las categorías armonizadas
+        n_crudos = len(unicos_crudos)
+        crudos_validos = ~es_nulo_crudo[cod_crudo] if len(cod_crudo) else np.zeros(0, dtype=bool)
+        if armonizar:
+            grupos, n_grupos = cod_norm_unicos[cod_crudo[crudos_validos]], k
         else:
-            mapeo_resultante[alias] = None  # No encontrada
+            grupos, n_grupos = cod_crudo[crudos_validos], n_crudos
+        presencia = np.zeros((3, n_grupos), dtype=bool)
+        presencia[self.segmento[crudos_validos], grupos] = True
+        self._presencia_cruda = presencia
+
+        # Orden de primera aparición de cada categoría dentro del segmento
+        # (el mismo que usa value_counts para ordenar los empates)
+        self._orden_aparicion = {
+            seg: pd.unique(self.motivo_codigo[self.segmento == seg])
+            for seg in (SEG_LOCAL, SEG_NO_LOCAL)
+        }
+
+    @classmethod
+    def desde_conteos(cls, conteos, categorias, orden_aparicion, presencia_cruda,
+                      columna_reside=COLUMNA_RESIDE, columna_motivo=COLUMNA_MOTIVO,
+                      armonizado=False, mapa_motivos=None, motivos_conocidos=None):
+        """
+        Índice sin filas (df=None) armado desde conteos ya agregados, p. ej. por
+        la lectura por bloques de agregado_encuesta.py.
+
+        conteos:          matriz 3 x k (segmento x categoría).
+        categorias:       k motivos normalizados.
+        orden_aparicion:  {segmento: códigos de categoría en orden de primera aparición}.
+        presencia_cruda:  matriz booleana 3 x m (segmento x valor crudo/categoría con respuestas).
+        """
+        indice = cls.__new__(cls)
+        indice.df = None
+        indice.columna_reside = columna_reside
+        indice.columna_motivo = columna_motivo
+        indice.segmento = None
+        indice.motivo_codigo = None
+        indice.armonizado = bool(armonizado)
+        indice.mapa_motivos = dict(mapa_motivos or {})
+        indice.motivos_conocidos = dict(motivos_conocidos or {})
+        indice.categorias = pd.Index(categorias)
+        indice._codigo_categoria = {c: i for i, c in enumerate(indice.categorias)}
+        indice.conteos = np.asarray(conteos, dtype=np.int64).reshape(3, len(indice.categorias))
+        indice.total_segmento = indice.conteos.sum(axis=1)
+        indice._presencia_cruda = np.asarray(presencia_cruda, dtype=bool)
+        indice._orden_aparicion = {
+            seg: np.asarray(orden_aparicion.get(seg, ()), dtype=np.int64) for seg in (SEG_LOCAL, SEG_NO_LOCAL)
+        }
+        return indice
+
+    # ----------------- CONSULTAS -----------------
+    @property
+    def total_encuestados(self) -> int:
+        return int(self.total_segmento[SEG_LOCAL] + self.total_segmento[SEG_NO_LOCAL])
+
+    def mascara(self, segmento) -> np.ndarray:
+        if self.segmento is None:
+            raise ValueError("El índice fue armado desde conteos agregados y no tiene filas")
+        return self.segmento == segmento
+
+    def seleccion(self, *segmentos) -> np.ndarray:
+        """Máscara booleana (una posición por fila) de los segmentos dados."""
+        if self.segmento is None:
+            raise ValueError("El índice fue armado desde conteos agregados y no tiene filas")
+        return np.isin(self.segmento, segmentos)
+
+    def filas(self, *segmentos, columnas=None):
+        """
+        Filas de la encuesta en los segmentos dados (en el orden original), solo
+        con `columnas` si se indican. None si el índice se armó desde conteos agregados.
+        """
+        if self.df is None:
+            return None
+        seleccion = self.mascara(segmentos[0]) if len(segmentos) == 1 else self.seleccion(*segmentos)
+        if columnas is None:
+            return self.df[seleccion]
+        return self.df.loc[seleccion, list(dict.fromkeys(columnas))]
+
+    def filas_grupo(self, tipo_poblacion="no_local", columnas=None):
+        """Filas del grupo de `calcular_poblacion` ('grupo') para el tipo de población."""
+        segmentos = SEGMENTOS_TIPO.get(tipo_poblacion, SEGMENTOS_TIPO["ambos"])
+        return self.filas(*segmentos, columnas=columnas)
+
+    def conteos_motivo(self, segmento) -> pd.Series:
+        """Equivalente a motivos_normalizados[segmento].value_counts(dropna=False)."""
+        orden = self._orden_aparicion[segmento]
+        conteos = pd.Series(
+            self.conteos[segmento, orden],
+            index=pd.Index(self.categorias[orden], name=self.columna_motivo),
+            name="count",
+        )
+        return conteos.sort_values(ascending=False)
+
+    def total_motivo(self, segmento, categoria) -> int:
+        codigo = self._codigo_categoria.get(categoria)
+        return 0 if codigo is None else int(self.conteos[segmento, codigo])
+
+    def conteo_principal(self, segmento, categoria_principal=None):
+        """
+        (total del segmento, total con el motivo principal) para el segmento.
+        Si categoria_principal es None se usa la categoría más frecuente.
+        """
+        total_seg = int(self.total_segmento[segmento])
+        if total_seg == 0:
+            return 0, 0
+        if categoria_principal is None:
+            vc = self.conteos_motivo(segmento)
+            categoria_principal = vc.idxmax() if not vc.empty else "sin respuesta"
+        return total_seg, self.total_motivo(segmento, categoria_principal)
 
-    return mapeo_resultante
+    def num_categorias_crudas(self, *segmentos) -> int:
+        """
+        nunique() de la columna de motivo sin normalizar, sobre los segmentos dados
+        (con armonización: número de categorías armonizadas con respuestas).
+        """
+        return int(self._presencia_cruda[list(segmentos)].any(axis=0).sum())
 
 
 def detectar_categorias_motivo(
     df_encuesta: pd.DataFrame,
-    columna_reside: str = "¿Reside en la ciudad donde se desarrolla este evento?",
-    columna_motivo: str = "¿Cuál fue el motivo de su viaje a esta ciudad o municipio?"
+    columna_reside: str = COLUMNA_RESIDE,
+    columna_motivo: str = COLUMNA_MOTIVO,
+    indice: IndiceEncuesta = None,
+    armonizar_motivos: bool = False,
+    motivos_conocidos: dict = None
 ) -> pd.Series:
     """
     Devuelve un Series con el conteo de categorías de motivo entre NO residentes.
     Sirve para poblar el selectbox en la UI.
+    Si se pasa `indice` (IndiceEncuesta ya construido) se reutiliza y no se recorre el DataFrame;
+    `armonizar_motivos` y `motivos_conocidos` solo aplican cuando el índice se construye aquí.
     """
-    if columna_reside not in df_encuesta.columns:
-        raise ValueError(f"No se encontró la columna de residencia: '{columna_reside}'")
+    if indice is None:
+        if columna_reside not in df_encuesta.columns:
+            raise ValueError(f"No se encontró la columna de residencia: '{columna_reside}'")
 
-    if columna_motivo not in df_encuesta.columns:
-        raise ValueError(f"No se encontró la columna de motivo: '{columna_motivo}'")
+        if columna_motivo not in df_encuesta.columns:
+            raise ValueError(f"No se encontró la columna de motivo: '{columna_motivo}'")
 
-    # Filtrar respuestas válidas y NO residentes
-    df_responde = df_encuesta[
-        df_encuesta[columna_reside]
-        .astype(str).str.strip().str.lower()
-        .isin(["sí", "si", "no"])
-    ]
-    no_reside = df_responde[
-        df_responde[columna_reside]
-        .astype(str).str.strip().str.lower()
-        .eq("no")
-    ]
+        indice = IndiceEncuesta(df_encuesta, columna_reside, columna_motivo, armonizar=armonizar_motivos,
+                                motivos_conocidos=motivos_conocidos)
 
-    if no_reside.empty:
+    if indice.total_segmento[SEG_NO_LOCAL] == 0:
         return pd.Series(dtype="int64")
 
-    motivos = (
-        no_reside[columna_motivo]
-        .astype(str)
-        .str.strip()
-        .replace({"": "sin respuesta"})
-        .str.lower()
-    )
-
-    return motivos.value_counts(dropna=False)
+    return indice.conteos_motivo(SEG_NO_LOCAL)
 
 
 # =============================================================================
@@ -83,6 +526,81 @@ def detectar_categorias_motivo(
 # Compatible 100% con tu app.py
 # =============================================================================
 
+@dataclass(slots=True)
+class ResultadoPoblacion:
+    """
+    Resultado de `calcular_poblacion`.
+
+    No guarda una copia de las filas del grupo: `grupo` las toma de la
+    encuesta del índice cada vez que se pide (mejor `filas_grupo(columnas)`
+    para traer solo las columnas necesarias). Admite el acceso de diccionario
+    de antes (res["Poblacion_estimacion"], res.get("PNL"), "grupo" in res);
+    PNL y PL solo existen con tipo "ambos".
+    """
+    Poblacion_estimacion: float
+    tipo: str
+    total_encuestados: int
+    total_grupo: int
+    categoria_principal: Optional[str]
+    total_motivo_seleccionado: int
+    proporcion_grupo: float
+    peso_principal: float
+    peso_otros: float
+    num_categorias_motivo: int
+    factor_correccion_aplicado: float
+    correccion_activada: bool
+    factor_pt_n_sobre_rho: Optional[float]
+    indice: Optional["IndiceEncuesta"] = None
+    PNL: Optional[float] = None
+    PL: Optional[float] = None
+
+    # ----------------- FILAS DEL GRUPO -----------------
+    @property
+    def seleccion(self) -> Optional[np.ndarray]:
+        """Máscara booleana del grupo sobre las filas de la encuesta (None sin filas)."""
+        if self.indice is None or self.indice.df is None:
+            return None
+        return self.indice.seleccion(*SEGMENTOS_TIPO.get(self.tipo, SEGMENTOS_TIPO["ambos"]))
+
+    def filas_grupo(self, columnas=None):
+        """Filas del grupo (solo `columnas` si se indican); None si no hay filas."""
+        if self.indice is None:
+            return None
+        return self.indice.filas_grupo(self.tipo, columnas=columnas)
+
+    @property
+    def grupo(self):
+        return self.filas_grupo()
+
+    # ----------------- ACCESO COMO DICCIONARIO -----------------
+    def keys(self):
+        claves = [
+            f.name for f in fields(self)
+            if f.name != "indice" and not (f.name in ("PNL", "PL") and getattr(self, f.name) is None)
+        ]
+        if self.indice is not None and self.indice.df is not None:
+            claves.append("grupo")
+        return claves
+
+    def __contains__(self, clave):
+        return clave in self.keys()
+
+    def __getitem__(self, clave):
+        if clave not in self:
+            raise KeyError(clave)
+        return getattr(self, clave)
+
+    def get(self, clave, defecto=None):
+        return self[clave] if clave in self else defecto
+
+
+def _filas_encuesta(argumentos):
+    """Encuestados procesados por calcular_poblacion (con índice, df_encuesta puede ser None)."""
+    indice = argumentos.get("indice")
+    return indice.total_encuestados if indice is not None else len(argumentos["df_encuesta"])
+
+
+@instrumentar(filas=_filas_encuesta)
 def calcular_poblacion(
     df_encuesta,
     df_aforo,
@@ -98,56 +616,58 @@ def calcular_poblacion(
 
     activar_factor_correccion=False,
     factor_pt_n_sobre_rho=None,
-    tipo_poblacion="no_local"
+    tipo_poblacion="no_local",
+    indice=None,
+    armonizar_motivos=None,
+    motivos_conocidos=None
 ):
+    """
+    Estima la población (no local, local o ambas) a partir del aforo y de la
+    composición de la encuesta por residencia y motivo.
+
+    `indice` (IndiceEncuesta) permite reutilizar la normalización entre
+    llamadas con distintos pesos; si no se pasa se construye desde df_encuesta.
+    `armonizar_motivos` agrupa variantes de escritura del motivo (None = lo
+    que diga el índice recibido; sin índice, no se armoniza), partiendo del
+    diccionario `motivos_conocidos` si se construye el índice aquí.
+    """
 
     # ----------------- VALIDACIONES -----------------
-    if columna_reside not in df_encuesta.columns:
-        raise ValueError(f"No existe columna '{columna_reside}'")
-    if columna_motivo not in df_encuesta.columns:
-        raise ValueError(f"No existe columna '{columna_motivo}'")
+    if indice is None:
+        if columna_reside not in df_encuesta.columns:
+            raise ValueError(f"No existe columna '{columna_reside}'")
+        if columna_motivo not in df_encuesta.columns:
+            raise ValueError(f"No existe columna '{columna_motivo}'")
+    elif (indice.columna_reside, indice.columna_motivo) != (columna_reside, columna_motivo):
+        raise ValueError("El índice de encuesta fue construido con otras columnas de residencia/motivo")
+    elif armonizar_motivos is not None and bool(armonizar_motivos) != indice.armonizado:
+        raise ValueError("El índice de encuesta fue construido con otra opción de armonización de motivos")
     if "Potencial de aforo" not in df_aforo.columns:
         raise ValueError("El archivo de Aforo necesita la columna 'Potencial de aforo'")
 
     # ----------------- LIMPIEZA -----------------
-    df_responde = df_encuesta[
-        df_encuesta[columna_reside]
-        .astype(str).str.strip().str.lower()
-        .isin(["sí", "si", "no"])
-    ]
+    if indice is None:
+        indice = IndiceEncuesta(df_encuesta, columna_reside, columna_motivo, armonizar=bool(armonizar_motivos),
+                                motivos_conocidos=motivos_conocidos)
 
-    total_encuestados = df_responde.shape[0]
+    total_encuestados = indice.total_encuestados
     if total_encuestados == 0:
-        return {"Poblacion_estimacion": 0}
+        return ResultadoPoblacion(
+            Poblacion_estimacion=0.0, tipo=tipo_poblacion, total_encuestados=0, total_grupo=0,
+            categoria_principal=categoria_principal, total_motivo_seleccionado=0, proporcion_grupo=0.0,
+            peso_principal=0.0, peso_otros=0.0, num_categorias_motivo=0, factor_correccion_aplicado=0.0,
+            correccion_activada=activar_factor_correccion, factor_pt_n_sobre_rho=factor_pt_n_sobre_rho,
+        )
 
-    res = df_responde[columna_reside].astype(str).str.strip().str.lower()
     potencial_aforo = pd.to_numeric(df_aforo["Potencial de aforo"], errors="coerce").fillna(0).sum()
 
-    df_no_local = df_responde[res.eq("no")]
-    df_local = df_responde[res.isin(["sí", "si"])]
-
 
     # ----------------- AUXILIAR: CALCULO INDIVIDUAL -----------------
-    def _segmento(df_seg, peso_principal, peso_otros):
-        if df_seg.empty:
+    def _segmento(segmento, peso_principal, peso_otros):
+        total_seg, total_motivo = indice.conteo_principal(segmento, categoria_principal)
+        if total_seg == 0:
             return 0, 0, 0, 0, 0, 0, 0
 
-        motivos = (
-            df_seg[columna_motivo]
-            .astype(str).str.strip()
-            .replace({"": "sin respuesta"})
-            .str.lower()
-        )
-
-        if categoria_principal is None:
-            vc = motivos.value_counts(dropna=False)
-            categoria = vc.idxmax() if not vc.empty else "sin respuesta"
-        else:
-            categoria = categoria_principal
-
-        total_seg = df_seg.shape[0]
-        total_motivo = (motivos == categoria).sum()
-
         frac_principal = total_motivo / total_seg
         frac_otras = 1 - frac_principal
 
@@ -174,94 +694,200 @@ def calcular_poblacion(
     (
         PNL, total_nl, motivo_nl,
         fracP_nl, fracO_nl, ponder_nl, prop_nl
-    ) = _segmento(df_no_local, peso_principal_no_local, peso_otros_no_local)
+    ) = _segmento(SEG_NO_LOCAL, peso_principal_no_local, peso_otros_no_local)
 
     # LOCALES
     (
         PL, total_l, motivo_l,
         fracP_l, fracO_l, ponder_l, prop_l
-    ) = _segmento(df_local, peso_principal_local, peso_otros_local)
+    ) = _segmento(SEG_LOCAL, peso_principal_local, peso_otros_local)
 
     # ----------------- RESULTADO UNIFICADO (FORMATO COMPATIBLE) -----------------
+    comunes = dict(
+        total_encuestados=total_encuestados,
+        categoria_principal=categoria_principal,
+        correccion_activada=activar_factor_correccion,
+        factor_pt_n_sobre_rho=factor_pt_n_sobre_rho,
+        indice=indice,
+    )
 
     if tipo_poblacion == "no_local":
-        return {
-            "Poblacion_estimacion": float(PNL),
-            "tipo": "no_local",
+        return ResultadoPoblacion(
+            Poblacion_estimacion=float(PNL),
+            tipo="no_local",
+            total_grupo=total_nl,
+            total_motivo_seleccionado=motivo_nl,
+            proporcion_grupo=float(prop_nl),
+            peso_principal=peso_principal_no_local,
+            peso_otros=peso_otros_no_local,
+            num_categorias_motivo=indice.num_categorias_crudas(SEG_NO_LOCAL),
+            factor_correccion_aplicado=float(fracO_nl),
+            **comunes,
+        )
 
-            "total_encuestados": total_encuestados,
-            "total_grupo": total_nl,
-            "categoria_principal": categoria_principal,
-            "total_motivo_seleccionado": motivo_nl,
+    elif tipo_poblacion == "local":
+        return ResultadoPoblacion(
+            Poblacion_estimacion=float(PL),
+            tipo="local",
+            total_grupo=total_l,
+            total_motivo_seleccionado=motivo_l,
+            proporcion_grupo=float(prop_l),
+            peso_principal=peso_principal_local,
+            peso_otros=peso_otros_local,
+            num_categorias_motivo=indice.num_categorias_crudas(SEG_LOCAL),
+            factor_correccion_aplicado=float(fracO_l),
+            **comunes,
+        )
 
-            "proporcion_grupo": float(prop_nl),
-            "peso_principal": peso_principal_no_local,
-            "peso_otros": peso_otros_no_local,
+    else:  # AMBOS
+        TOTAL = PNL + PL
+        return ResultadoPoblacion(
+            Poblacion_estimacion=float(TOTAL),
+            tipo="ambos",
+            total_grupo=total_nl + total_l,
+            total_motivo_seleccionado=motivo_nl + motivo_l,
+            proporcion_grupo=float((total_nl + total_l) / total_encuestados),
 
-            "num_categorias_motivo": df_no_local[columna_motivo].nunique(),
-            "factor_correccion_aplicado": float(fracO_nl),
-            "correccion_activada": activar_factor_correccion,
-            "factor_pt_n_sobre_rho": factor_pt_n_sobre_rho,
+            # Para UI (requerido)
+            peso_principal=0.0,
+            peso_otros=0.0,
 
-            "grupo": df_no_local,
-        }
+            num_categorias_motivo=indice.num_categorias_crudas(SEG_NO_LOCAL, SEG_LOCAL),
+            factor_correccion_aplicado=0.0,
 
-    elif tipo_poblacion == "local":
-        return {
-            "Poblacion_estimacion": float(PL),
-            "tipo": "local",
+            # Valores adicionales útiles
+            PNL=float(PNL),
+            PL=float(PL),
+            **comunes,
+        )
 
-            "total_encuestados": total_encuestados,
-            "total_grupo": total_l,
-            "categoria_principal": categoria_principal,
-            "total_motivo_seleccionado": motivo_l,
+def calcular_grilla_sensibilidad(
+    indice,
+    df_aforo,
+    categoria_principal=None,
+    pesos_principal_no_local=(1.0,),
+    pesos_otros_no_local=(0.5,),
+    pesos_principal_local=(1.0,),
+    pesos_otros_local=(0.5,),
+    factores_pt=(1.0,)
+):
+    """
+    Evalúa PNL, PL y PNL + PL para todas las combinaciones de pesos y factor n/ρ
+    en una sola pasada con broadcasting de NumPy.
+
+    Usa los conteos precalculados del IndiceEncuesta, así que el costo no depende
+    del número de filas de la encuesta. Un factor de 1.0 equivale a no aplicar
+    la corrección (PT̃ = PT).
+
+    Retorna dict con:
+        "ejes":  {nombre_parametro: array de valores} en el orden de los ejes
+        "PNL", "PL", "Total": arrays de forma
+            (len(pesos_principal_no_local), len(pesos_otros_no_local),
+             len(pesos_principal_local), len(pesos_otros_local), len(factores_pt))
+    """
+    if "Potencial de aforo" not in df_aforo.columns:
+        raise ValueError("El archivo de Aforo necesita la columna 'Potencial de aforo'")
 
-            "proporcion_grupo": float(prop_l),
-            "peso_principal": peso_principal_local,
-            "peso_otros": peso_otros_local,
+    ejes = {
+        "peso_principal_no_local": np.asarray(pesos_principal_no_local, dtype=float).ravel(),
+        "peso_otros_no_local": np.asarray(pesos_otros_no_local, dtype=float).ravel(),
+        "peso_principal_local": np.asarray(pesos_principal_local, dtype=float).ravel(),
+        "peso_otros_local": np.asarray(pesos_otros_local, dtype=float).ravel(),
+        "factor_pt_n_sobre_rho": np.asarray(factores_pt, dtype=float).ravel(),
+    }
+    forma = tuple(len(v) for v in ejes.values())
 
-            "num_categorias_motivo": df_local[columna_motivo].nunique(),
-            "factor_correccion_aplicado": float(fracO_l),
-            "correccion_activada": activar_factor_correccion,
-            "factor_pt_n_sobre_rho": factor_pt_n_sobre_rho,
+    total_encuestados = indice.total_encuestados
+    if total_encuestados == 0:
+        ceros = np.zeros(forma)
+        return {"ejes": ejes, "PNL": ceros, "PL": ceros.copy(), "Total": ceros.copy()}
 
-            "grupo": df_local,
-        }
+    potencial_aforo = pd.to_numeric(df_aforo["Potencial de aforo"], errors="coerce").fillna(0).sum()
 
-    else:  # AMBOS
-        TOTAL = PNL + PL
+    def _pt_y_fraccion(segmento):
+        total_seg, total_motivo = indice.conteo_principal(segmento, categoria_principal)
+        frac_principal = total_motivo / total_seg if total_seg else 0.0
+        return potencial_aforo * total_seg / total_encuestados, frac_principal
 
-        # Para UI, usamos df_no_local como "grupo" por defecto
-        df_union = pd.concat([df_no_local, df_local], ignore_index=True)
+    # Ejes: [pp_nl, po_nl, pp_l, po_l, factor]
+    def _eje(nombre, posicion):
+        dims = [1] * 5
+        dims[posicion] = -1
+        return ejes[nombre].reshape(dims)
 
-        return {
-            "Poblacion_estimacion": float(TOTAL),
-            "tipo": "ambos",
+    factor = _eje("factor_pt_n_sobre_rho", 4)
 
-            "total_encuestados": total_encuestados,
-            "total_grupo": total_nl + total_l,
-            "categoria_principal": categoria_principal,
-            "total_motivo_seleccionado": motivo_nl + motivo_l,
+    pt_nl, fp_nl = _pt_y_fraccion(SEG_NO_LOCAL)
+    pnl = pt_nl * factor * (
+        _eje("peso_principal_no_local", 0) * fp_nl + _eje("peso_otros_no_local", 1) * (1 - fp_nl)
+    )
+    pt_l, fp_l = _pt_y_fraccion(SEG_LOCAL)
+    pl = pt_l * factor * (
+        _eje("peso_principal_local", 2) * fp_l + _eje("peso_otros_local", 3) * (1 - fp_l)
+    )
 
-            "proporcion_grupo": float((total_nl + total_l) / total_encuestados),
+    pnl = np.broadcast_to(pnl, forma)
+    pl = np.broadcast_to(pl, forma)
+    return {"ejes": ejes, "PNL": pnl, "PL": pl, "Total": pnl + pl}
 
-            # Para UI (requerido)
-            "peso_principal": 0.0,
-            "peso_otros": 0.0,
 
-            "num_categorias_motivo": df_union[columna_motivo].nunique(),
-            "factor_correccion_aplicado": 0.0,
-            "correccion_activada": activar_factor_correccion,
-            "factor_pt_n_sobre_rho": factor_pt_n_sobre_rho,
+# =============================================================================
+# ESTADÍSTICOS POR COLUMNA (memo por contenido + Shapiro en paralelo)
+# =============================================================================
 
-            "grupo": df_union,
+# hash del contenido de la columna -> (N, p_value, media, mediana)
+_MEMO_ESTADISTICOS = OrderedDict()
+_MEMO_MAX_ENTRADAS = 4096
+_MEMO_LOCK = threading.Lock()
+
+# Con menos valores a probar que esto, Shapiro se corre en el proceso actual
+UMBRAL_POOL_SHAPIRO = 200_000
+_POOLS_SHAPIRO = {}  # número de procesos -> ProcessPoolExecutor
+_POOLS_LOCK = threading.Lock()
 
-            # Valores adicionales útiles
-            "PNL": float(PNL),
-            "PL": float(PL),
-        }
 
-def evaluar_distribuciones(df, columnas, criterio="auto"):
+def _shapiro_p(datos):
+    # scipy se importa solo cuando alguna columna llega a la prueba de Shapiro
+    from scipy import stats as sci_stats
+    return sci_stats.shapiro(datos)[1]
+
+
+def _cerrar_pools_shapiro():
+    with _POOLS_LOCK:
+        for pool in _POOLS_SHAPIRO.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _POOLS_SHAPIRO.clear()
+
+
+def _pool_shapiro(n_procesos):
+    """
+    Pool de procesos por número de procesos, creado una vez y cerrado al salir.
+    Usa "spawn": el servidor de Streamlit tiene hilos y fork los copiaría a medias.
+    """
+    n_procesos = n_procesos or os.cpu_count() or 1
+    with _POOLS_LOCK:
+        if n_procesos not in _POOLS_SHAPIRO:
+            if not _POOLS_SHAPIRO:
+                atexit.register(_cerrar_pools_shapiro)
+            _POOLS_SHAPIRO[n_procesos] = ProcessPoolExecutor(
+                max_workers=n_procesos, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _POOLS_SHAPIRO[n_procesos]
+
+
+def _mediana_ordenada(ordenados):
+    """Mediana de un array ya ordenado y sin NaN."""
+    n = len(ordenados)
+    if n == 0:
+        return np.nan
+    mitad = n // 2
+    if n % 2:
+        return float(ordenados[mitad])
+    return float((ordenados[mitad - 1] + ordenados[mitad]) / 2)
+
+
+@instrumentar(filas="df")
+def evaluar_distribuciones(df, columnas, criterio="auto", n_procesos=None):
     """
     Evalúa si las columnas seleccionadas tienen distribución normal.
 
@@ -269,16 +895,82 @@ def evaluar_distribuciones(df, columnas, criterio="auto"):
         df: DataFrame
         columnas: Lista de nombres de columnas numéricas
         criterio: 'auto', 'Mediana' o 'Promedio'
+        n_procesos: procesos para las pruebas de Shapiro (None = núcleos disponibles);
+                    solo se usan si hay suficientes datos a probar.
 
     Retorna:
         dict con estadísticas (p-value, media, mediana, sugerencia)
+
+    La coerción, N y media se calculan para todas las columnas en una sola
+    pasada sobre una matriz 2-D. Los resultados se memorizan por contenido de
+    columna (hash de sus valores), así que una columna que no cambió no se
+    vuelve a probar; las pruebas pendientes se reparten en un pool de procesos
+    cuando el volumen lo justifica.
     """
+    columnas = list(columnas)
+    if not columnas:
+        return {}
+
+    # ---- Coerción a una matriz (filas x columnas) con NaN para lo no numérico.
+    # Orden Fortran: cada columna queda contigua para los ordenamientos y filtros por columna.
+    X = np.empty((len(df), len(columnas)), dtype=float, order="F")
+    for j, col in enumerate(columnas):
+        X[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    validos = ~np.isnan(X)
+    n_validos = validos.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        medias = np.where(n_validos > 0, np.sum(X, axis=0, where=validos) / n_validos, np.nan)
+
+    # ---- Memo por contenido de la columna ya coercionada (incluye posiciones NaN)
+    claves = []
+    pendientes = {}  # j -> valores válidos de la columna
+    por_clave = {}
+    with _MEMO_LOCK:
+        for j in range(len(columnas)):
+            clave = hashlib.sha256(X[:, j].tobytes()).hexdigest()
+            claves.append(clave)
+            if clave in por_clave:
+                continue
+            if clave in _MEMO_ESTADISTICOS:
+                _MEMO_ESTADISTICOS.move_to_end(clave)
+                por_clave[clave] = _MEMO_ESTADISTICOS[clave]
+            else:
+                por_clave[clave] = None
+                pendientes[j] = X[validos[:, j], j]
+
+    if pendientes:
+        # Shapiro solo para columnas con al menos 3 datos. Se le pasan los datos
+        # ordenados (la prueba no depende del orden) y de ahí sale la mediana.
+        a_probar = [j for j in pendientes if n_validos[j] >= 3]
+        muestras = [np.sort(pendientes[j]) for j in a_probar]
+        total_valores = int(sum(len(m) for m in muestras))
+        if len(muestras) > 1 and total_valores >= UMBRAL_POOL_SHAPIRO and n_procesos != 1:
+            p_valores = list(_pool_shapiro(n_procesos).map(_shapiro_p, muestras, chunksize=4))
+        else:
+            p_valores = [_shapiro_p(m) for m in muestras]
+        p_por_columna = dict(zip(a_probar, p_valores))
+        mediana_por_columna = {j: _mediana_ordenada(m) for j, m in zip(a_probar, muestras)}
+
+        with _MEMO_LOCK:
+            for j in pendientes:
+                n = int(n_validos[j])
+                if n < 3:
+                    valor = (n, np.nan, np.nan, np.nan)
+                else:
+                    valor = (n, float(p_por_columna[j]), float(medias[j]), mediana_por_columna[j])
+                por_clave[claves[j]] = valor
+                _MEMO_ESTADISTICOS[claves[j]] = valor
+            while len(_MEMO_ESTADISTICOS) > _MEMO_MAX_ENTRADAS:
+                _MEMO_ESTADISTICOS.popitem(last=False)
+
+    # ---- Armado del resultado (columnas repetidas en contenido comparten el memo)
     resultados = {}
-    for col in columnas:
-        datos = pd.to_numeric(df[col], errors='coerce').dropna()
-        if len(datos) < 3:
+    for j, col in enumerate(columnas):
+        n, p_valor, media, mediana = por_clave[claves[j]]
+        if n < 3:
             resultados[col] = {
-                "N": len(datos),
+                "N": n,
                 "p_value": np.nan,
                 "media": np.nan,
                 "mediana": np.nan,
@@ -286,22 +978,182 @@ def evaluar_distribuciones(df, columnas, criterio="auto"):
             }
             continue
 
-        p_valor = sci_stats.shapiro(datos)[1]
         sugerencia = (
             "Promedio" if (criterio == "auto" and p_valor > 0.05) else "Mediana"
         ) if criterio == "auto" else criterio
 
         resultados[col] = {
-            "N": len(datos),
+            "N": n,
             "p_value": p_valor,
-            "media": datos.mean(),
-            "mediana": datos.median(),
+            "media": media,
+            "mediana": mediana,
             "sugerencia": sugerencia
         }
 
     return resultados
 
 
+RUBROS_BASE = ("Alojamiento", "Alimentación", "Transporte")
+
+
+def _num(x):
+    try: return float(x)
+    except (TypeError, ValueError): return float("nan")
+
+
+def _valor_sugerido(stats, col) -> float:
+    """
+    Media o mediana de `col` según la sugerencia de evaluar_distribuciones.
+    NaN (el rubro queda en 0) si col es None: quien llama ya sabe que la
+    encuesta no trae esa columna. Una columna con nombre que no está en
+    `stats` (p. ej. mal escrita) es un error.
+    """
+    if col is None:
+        return float("nan")
+    if col not in stats:
+        raise KeyError(f"La columna '{col}' no está entre los estadísticos evaluados.")
+    sug = stats[col]["sugerencia"]
+    return _num(stats[col]["media"] if sug == "Promedio" else stats[col]["mediana"])
+
+
+@dataclass(slots=True)
+class EfectosEscenarios:
+    """
+    Efectos por escenario (filas) y rubro (columnas) de `calcular_efectos_escenarios`.
+
+    Los rubros son Alojamiento, Alimentación, Transporte y luego los extras,
+    en el orden recibido. `escenario(i)` arma el (resultado, desglose) de
+    `calcular_efecto_economico_indirecto` para el escenario i.
+    """
+    rubros: list
+    gasto: np.ndarray               # (R,) gasto diario usado por rubro
+    pnl: np.ndarray                 # (S,)
+    dias: np.ndarray                # (S,) días (o eventos) usados
+    multiplicador_general: np.ndarray  # (S,)
+    multiplicadores: np.ndarray     # (S, R)
+    indirecto: np.ndarray           # (S, R)
+    inducido: np.ndarray            # (S, R) inducido neto
+    extras_validos: np.ndarray      # (R,) rubro extra con columna presente en stats
+
+    @property
+    def n_escenarios(self) -> int:
+        return len(self.pnl)
+
+    @property
+    def indirecto_total(self) -> np.ndarray:
+        # Suma acumulada: mismo orden de sumas que el cálculo escalar
+        return np.cumsum(self.indirecto, axis=1)[:, -1]
+
+    @property
+    def inducido_total(self) -> np.ndarray:
+        return np.cumsum(self.inducido, axis=1)[:, -1]
+
+    def escenario(self, i):
+        """(resultado, desglose) del escenario i, con el formato de calcular_efecto_economico_indirecto."""
+        ind, inc, mult = self.indirecto[i].tolist(), self.inducido[i].tolist(), self.multiplicadores[i].tolist()
+        gasto = self.gasto.tolist()
+        desglose = [
+            {"Rubro": r, "Gasto diario usado": g, "Indirecto": a, "Inducido neto": b}
+            for r, g, a, b in zip(self.rubros, gasto, ind, inc)
+        ]
+        extras_validos = self.extras_validos.tolist()
+        desglose.append({
+            "Rubro": "Total",
+            "Gasto diario usado": sum(gasto[:3]) + sum(g for g, v in zip(gasto[3:], extras_validos[3:]) if v),
+            "Indirecto": float(self.indirecto_total[i]),
+            "Inducido neto": float(self.inducido_total[i]),
+        })
+        resultado = {
+            "PNL": float(self.pnl[i]),
+            "Días de estadía (valor usado)": float(self.dias[i]),
+            "Multiplicador general": float(self.multiplicador_general[i]),
+            "Multiplicador alojamiento": mult[0],
+            "Multiplicador alimentación": mult[1],
+            "Multiplicador transporte": mult[2],
+            "Multiplicadores extras": dict(zip(self.rubros[3:], mult[3:])),
+            "Efecto Indirecto Total": desglose[-1]["Indirecto"],
+            "Efecto Inducido Neto Total": desglose[-1]["Inducido neto"],
+        }
+        return resultado, desglose
+
+    def tabla(self, valor="indirecto") -> pd.DataFrame:
+        """Escenarios x rubros de 'indirecto' o 'inducido' como DataFrame."""
+        return pd.DataFrame(getattr(self, valor), columns=self.rubros).rename_axis("escenario")
+
+
+@instrumentar(filas=lambda a: int(np.size(a["pnl"])))  # escenarios
+def calcular_efectos_escenarios(
+    stats,
+    pnl,
+    multiplicador,
+    col_aloj,
+    col_alim,
+    col_trans,
+    col_dias,
+    multiplicadores=None,
+    extras=None,
+    n_eventos=None,
+    modo_local=False,
+    dias=None
+):
+    """
+    Versión por lotes de calcular_efecto_economico_indirecto: evalúa S
+    escenarios a la vez.
+
+    `pnl`, `multiplicador`, `dias`, `n_eventos`, los valores de
+    `multiplicadores` y el "mult" de cada extra pueden ser escalares o arreglos
+    de largo S (se combinan por broadcasting). `dias` reemplaza los días
+    sugeridos por `stats` (o n_eventos en modo local). Los gastos por rubro
+    salen de `stats` y son los mismos en todos los escenarios.
+
+    Para cada escenario s y rubro r:
+        Indirecto[s, r]    = PNL[s] * gasto[r] * dias[s]
+        InducidoNeto[s, r] = Indirecto[s, r] * m[s, r] - Indirecto[s, r]
+    """
+    extras = extras or []
+    multiplicadores = multiplicadores or {}
+
+    # ---- Gasto por rubro (una sola vez por columna)
+    gasto = [_valor_sugerido(stats, c) for c in (col_aloj, col_alim, col_trans)]
+    dias_sugerido = _valor_sugerido(stats, col_dias)
+    rubros = list(RUBROS_BASE)
+    extras_validos = [True, True, True]
+    for ex in extras:
+        col = ex.get("col")
+        rubros.append(str(ex.get("name", "Sector extra")).strip())
+        # Columna inválida: el rubro queda en 0 para no romper el cálculo
+        extras_validos.append(bool(col) and col in stats)
+        gasto.append(_valor_sugerido(stats, col) if extras_validos[-1] else 0.0)
+    gasto = np.array([g if g == g else 0.0 for g in gasto], dtype=float)  # NaN -> 0
+
+    # ---- Días por escenario: explícitos, número de eventos (local/ambos) o sugeridos
+    if dias is None:
+        if modo_local and n_eventos is not None:
+            dias = n_eventos
+        else:
+            dias = 0.0 if pd.isna(dias_sugerido) else dias_sugerido
+
+    # ---- Escenarios: todo se lleva a largo S
+    m_general = np.asarray(multiplicador, dtype=float)
+    m_rubros = [multiplicadores.get(k, m_general) for k in ("alojamiento", "alimentacion", "transporte")]
+    m_rubros += [ex.get("mult", m_general) for ex in extras]
+    # Una fila por parámetro (pnl, dias, m_general, m_rubro...) y una columna por escenario
+    parametros = np.array(np.broadcast_arrays(pnl, dias, m_general, *m_rubros), dtype=float)
+    parametros = parametros.reshape(len(parametros), -1)
+    pnl, dias, m_general = parametros[0], parametros[1], parametros[2]
+    mult = parametros[3:].T
+
+    indirecto = pnl[:, None] * gasto[None, :] * dias[:, None]
+    inducido = (indirecto * mult) - indirecto
+
+    return EfectosEscenarios(
+        rubros=rubros, gasto=gasto, pnl=pnl, dias=dias, multiplicador_general=m_general,
+        multiplicadores=mult, indirecto=indirecto, inducido=inducido,
+        extras_validos=np.asarray(extras_validos, dtype=bool),
+    )
+
+
+@instrumentar(filas=lambda a: 3 + len(a.get("extras") or []))  # rubros calculados
 def calcular_efecto_economico_indirecto(
     stats,
     pnl,
@@ -323,100 +1175,46 @@ def calcular_efecto_economico_indirecto(
     Para cada rubro r:
         Indirecto_r    = PNL * (valor_sugerido_r) * (dias_sugerido)
         InducidoNeto_r = (Indirecto_r * m_r) - Indirecto_r
-    """
-    def _num(x):
-        try: return float(x)
-        except (TypeError, ValueError): return float("nan")
-
-    def _valor(col):
-        sug = stats[col]["sugerencia"]
-        return _num(stats[col]["media"] if sug == "Promedio" else stats[col]["mediana"])
 
-    # Valores sugeridos desde stats
-    v_aloj = _valor(col_aloj); v_alim = _valor(col_alim); v_trans = _valor(col_trans); dias = _valor(col_dias)
-    v_aloj0 = 0.0 if pd.isna(v_aloj) else v_aloj
-    v_alim0 = 0.0 if pd.isna(v_alim) else v_alim
-    v_trans0 = 0.0 if pd.isna(v_trans) else v_trans
-    # Si es población local o ambos: usar número de eventos, no días
-    if modo_local and n_eventos is not None:
-        dias0 = float(n_eventos)
-    else:
-        dias = _valor(col_dias)
-        dias0 = 0.0 if pd.isna(dias) else dias
-
-
-    # Multiplicadores
-    m_general = float(multiplicador)
-    multiplicadores = multiplicadores or {}
-    m_aloj = float(multiplicadores.get("alojamiento", m_general))
-    m_alim = float(multiplicadores.get("alimentacion", m_general))
-    m_trans = float(multiplicadores.get("transporte", m_general))
-
-    pnl_f = float(pnl)
-
-    # ---- Base: 3 rubros
-    ind_aloj = pnl_f * v_aloj0 * dias0
-    ind_alim = pnl_f * v_alim0 * dias0
-    ind_trans = pnl_f * v_trans0 * dias0
-
-    indirecto_total = ind_aloj + ind_alim + ind_trans
-    inc_aloj = (ind_aloj * m_aloj) - ind_aloj
-    inc_alim = (ind_alim * m_alim) - ind_alim
-    inc_trans = (ind_trans * m_trans) - ind_trans
-    inducido_neto_total = inc_aloj + inc_alim + inc_trans
-
-    desglose = [
-        {"Rubro": "Alojamiento", "Gasto diario usado": v_aloj0, "Indirecto": ind_aloj, "Inducido neto": inc_aloj},
-        {"Rubro": "Alimentación", "Gasto diario usado": v_alim0, "Indirecto": ind_alim, "Inducido neto": inc_alim},
-        {"Rubro": "Transporte",  "Gasto diario usado": v_trans0, "Indirecto": ind_trans, "Inducido neto": inc_trans},
-    ]
-
-    # ---- Extras dinámicos
-    extras = extras or []
-    mult_extras_dict = {}  # para devolver trazabilidad de multiplicadores de extras
-    for ex in extras:
-        name = str(ex.get("name", "Sector extra")).strip()
-        col  = ex.get("col")
-        m_ex = float(ex.get("mult", m_general))
-        if not col or col not in stats:
-            # columna inválida: registra en 0 para no romper cálculo
-            v_ex0 = 0.0
-        else:
-            v_ex = _valor(col)
-            v_ex0 = 0.0 if pd.isna(v_ex) else v_ex
-
-        ind_ex = pnl_f * v_ex0 * dias0
-        inc_ex = (ind_ex * m_ex) - ind_ex
+    Es un escenario de `calcular_efectos_escenarios`.
+    """
+    efectos = calcular_efectos_escenarios.__wrapped__(
+        stats, pnl, multiplicador, col_aloj, col_alim, col_trans, col_dias,
+        multiplicadores=multiplicadores, extras=extras, n_eventos=n_eventos, modo_local=modo_local
+    )
+    return efectos.escenario(0)
 
-        indirecto_total += ind_ex
-        inducido_neto_total += inc_ex
-        desglose.append({"Rubro": name, "Gasto diario usado": v_ex0, "Indirecto": ind_ex, "Inducido neto": inc_ex})
-        mult_extras_dict[name] = m_ex
+def _config_por_sector(nombres, config_sectores):
+    """
+    Alinea la configuración de la UI con la lista de sectores.
 
-    # Fila total
-    total_gasto_diario_usado = v_aloj0 + v_alim0 + v_trans0 + sum(
-        0.0 if pd.isna(_valor(ex["col"])) else (_valor(ex["col"])) for ex in extras if ex.get("col") in (stats or {})
-    )
-    desglose.append({
-        "Rubro": "Total",
-        "Gasto diario usado": total_gasto_diario_usado,
-        "Indirecto": indirecto_total,
-        "Inducido neto": inducido_neto_total
+    Retorna tres arrays (activar, gasto, multiplicador) en el orden de `nombres`.
+    Sectores sin configuración quedan con (False, 0.0, 1.0); si un sector aparece
+    varias veces en `config_sectores`, gana la última entrada. Las entradas de
+    sectores que no están en `nombres` se ignoran.
+    """
+    n = len(nombres)
+    if not config_sectores:
+        return np.zeros(n, dtype=bool), np.zeros(n), np.ones(n)
+
+    config_sectores = list(config_sectores)
+    cfg = pd.DataFrame({
+        "sector": [str(c.get("sector", "")) for c in config_sectores],
+        "activar": [c.get("activar", np.nan) for c in config_sectores],
+        "gasto": [c.get("gasto", np.nan) for c in config_sectores],
+        "multiplicador": [c.get("multiplicador", np.nan) for c in config_sectores],
     })
+    cfg = cfg.drop_duplicates("sector", keep="last").set_index("sector")
+    cfg = cfg.reindex(pd.Index(nombres))
+
+    # Los sectores sin entrada quedan en NaN tras el reindex -> valores por defecto
+    activar = cfg["activar"].notna().to_numpy() & cfg["activar"].astype(bool).to_numpy()
+    gasto = cfg["gasto"].astype(float).fillna(0.0).to_numpy()
+    mult = cfg["multiplicador"].astype(float).fillna(1.0).to_numpy()
+    return activar, gasto, mult
 
-    resultado = {
-        "PNL": pnl_f,
-        "Días de estadía (valor usado)": dias0,
-        "Multiplicador general": m_general,
-        "Multiplicador alojamiento": m_aloj,
-        "Multiplicador alimentación": m_alim,
-        "Multiplicador transporte": m_trans,
-        "Multiplicadores extras": mult_extras_dict,  # <<< NUEVO
-        "Efecto Indirecto Total": indirecto_total,
-        "Efecto Inducido Neto Total": inducido_neto_total
-    }
-    return resultado, desglose
 
+@instrumentar(filas="df_eed")
 def calcular_desglose_por_sectores(
     df_eed,
     pnl,
@@ -452,24 +1250,9 @@ def calcular_desglose_por_sectores(
         .rename(columns={col_sector: "Sector", col_valor: "Efecto directo"})
     )
 
-    # Config default por sector
-    cfg_map = {}
-    for _, row in df_base.iterrows():
-        nombre = str(row["Sector"])
-        cfg_map[nombre] = {"activar": False, "gasto": 0.0, "multiplicador": 1.0}
-
-    # Sobrescribir con configuración provista por la UI
-    if config_sectores:
-        for c in config_sectores:
-            nombre = str(c.get("sector", ""))
-            if nombre in cfg_map:
-                cfg_map[nombre]["activar"] = bool(c.get("activar", False))
-                cfg_map[nombre]["gasto"] = float(c.get("gasto", 0.0))
-                cfg_map[nombre]["multiplicador"] = float(c.get("multiplicador", 1.0))
-
-    efectos_indirecto = []
-    efectos_inducido = []
-    trazas = {}
+    # Configuración alineada con las filas de df_base (una entrada por sector)
+    nombres = df_base["Sector"].astype(str)
+    activar, gasto, mult = _config_por_sector(nombres, config_sectores)
 
     # === DÍAS PARA LOCALES VS NO LOCALES ===
     if modo_local and n_eventos is not None:
@@ -477,40 +1260,21 @@ def calcular_desglose_por_sectores(
     else:
         dias_usado_f = float(dias_usado)
 
-    # Cálculos por sector
-    for _, row in df_base.iterrows():
-        nombre = str(row["Sector"])
-        directo = float(row["Efecto directo"]) if pd.notna(row["Efecto directo"]) else 0.0
-        cfg = cfg_map[nombre]
-        m = float(cfg["multiplicador"])
-
-        # Indirecto (opcional)
-        if cfg["activar"]:
-            indirecto = float(pnl) * float(cfg["gasto"]) * dias_usado_f
-        else:
-            indirecto = 0.0
+    # Cálculos por sector, todos a la vez
+    directo = df_base["Efecto directo"].fillna(0.0).to_numpy(dtype=float)
 
+    # Indirecto (opcional)
+    indirecto = np.where(activar, float(pnl) * gasto * dias_usado_f, 0.0)
 
-        # NUEVA FÓRMULA: inducido neto = inducido(directo) + inducido(indirecto)
-        inc_directo = (directo * m) - directo
-        inc_indirecto = (indirecto * m) - indirecto
-        inducido_neto = inc_directo + inc_indirecto
-
-        efectos_indirecto.append(indirecto)
-        efectos_inducido.append(inducido_neto)
-
-        trazas[nombre] = {
-            "usar_indirecto": cfg["activar"],
-            "gasto_sector": float(cfg["gasto"]),
-            "multiplicador_sector": m,
-            "inducido_directo": inc_directo,
-            "inducido_indirecto": inc_indirecto,
-        }
+    # NUEVA FÓRMULA: inducido neto = inducido(directo) + inducido(indirecto)
+    inc_directo = (directo * mult) - directo
+    inc_indirecto = (indirecto * mult) - indirecto
+    inducido_neto = inc_directo + inc_indirecto
 
     # Construcción de la tabla
     df_res = df_base.copy()
-    df_res["Efecto indirecto"] = efectos_indirecto
-    df_res["Total, efecto inducido neto"] = efectos_inducido
+    df_res["Efecto indirecto"] = indirecto
+    df_res["Total, efecto inducido neto"] = inducido_neto
 
     # Efecto económico total y participación
     df_res["Efecto económico total"] = (
@@ -524,6 +1288,21 @@ def calcular_desglose_por_sectores(
     else:
         df_res["% efecto económico total"] = 0.0
 
+    # Trazabilidad por sector (mismo formato que antes)
+    trazas = {
+        nombre: {
+            "usar_indirecto": a,
+            "gasto_sector": g,
+            "multiplicador_sector": m,
+            "inducido_directo": i_d,
+            "inducido_indirecto": i_i,
+        }
+        for nombre, a, g, m, i_d, i_i in zip(
+            nombres.tolist(), activar.tolist(), gasto.tolist(), mult.tolist(),
+            inc_directo.tolist(), inc_indirecto.tolist(),
+        )
+    }
+
     # Fila Total
     fila_total = pd.DataFrame({
         "Sector": ["Total"],
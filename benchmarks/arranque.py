@@ -0,0 +1,85 @@
+"""
+Benchmark de arranque: tiempo de `import backend` en un intérprete nuevo.
+
+Mide el árbol actual y, opcionalmente, una revisión de git de referencia
+(se extrae su árbol completo a una carpeta temporal), para registrar el antes y
+el después de un cambio. Los resultados se agregan a
+benchmarks/resultados/arranque.jsonl (una línea JSON por medición).
+
+Uso:
+    python benchmarks/arranque.py
+    python benchmarks/arranque.py --referencia b9b746a --repeticiones 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from funciones import _extraer_revision
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SALIDA = os.path.join(RAIZ, "benchmarks", "resultados", "arranque.jsonl")
+
+# Se imprime el tiempo del import y qué módulos pesados quedaron cargados
+_CODIGO = (
+    "import sys, time; t0 = time.perf_counter(); import backend; "
+    "t = time.perf_counter() - t0; "
+    "print(t, int('streamlit' in sys.modules), int('scipy.stats' in sys.modules))"
+)
+
+
+def medir(carpeta, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", _CODIGO], cwd=carpeta, capture_output=True, text=True, check=True
+        ).stdout.split()
+        tiempos.append(float(salida[0]))
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "min_s": min(tiempos),
+        "importa_streamlit": bool(int(salida[1])),
+        "importa_scipy_stats": bool(int(salida[2])),
+    }
+
+
+def _revision_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de import de backend.py.")
+    parser.add_argument("--referencia", help="Revisión de git a comparar (p. ej. la anterior al cambio)")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    registros = []
+    if args.referencia:
+        # Árbol completo: backend.py importa otros módulos del repositorio (instrumentacion.py)
+        with _extraer_revision(args.referencia) as tmp:
+            registros.append({"revision": args.referencia, **medir(tmp, args.repeticiones)})
+    registros.append({"revision": _revision_actual() or "árbol actual", "arbol_actual": True, **medir(RAIZ, args.repeticiones)})
+
+    os.makedirs(os.path.dirname(SALIDA), exist_ok=True)
+    fecha = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(SALIDA, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps({"fecha": fecha, "python": sys.version.split()[0], **registro}, ensure_ascii=False) + "\n")
+
+    for registro in registros:
+        print(
+            f"{registro['revision']:>12}: mediana {registro['mediana_s'] * 1000:8.1f} ms | "
+            f"streamlit={registro['importa_streamlit']} scipy.stats={registro['importa_scipy_stats']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmark de las funciones de cálculo de backend.py con datos sintéticos.
+
+Mide extraer_columnas_validas, detectar_categorias_motivo, calcular_poblacion,
+evaluar_distribuciones, calcular_efecto_economico_indirecto (y su versión por escenarios),
+calcular_desglose_por_sectores sobre Encuesta/EED/Aforo de generador.py
+(misma semilla = mismos datos) para cada tamaño pedido. Antes de cada
+repetición se vacían las cachés en memoria de backend.py (plantillas de
+columnas y estadísticos), así que los tiempos son de cálculo en frío.
+
+Cada medición se agrega como una línea JSON a
+benchmarks/resultados/funciones.jsonl con la revisión de git, y --comparar
+imprime la razón de tiempos entre dos revisiones ya medidas.
+
+Uso:
+    python benchmarks/funciones.py                              # 10^3 a 10^6 filas
+    python benchmarks/funciones.py --tamanos 1000 10000000      # hasta 10^7 (~3 GB de RAM)
+    python benchmarks/funciones.py --referencia 2d927a4         # mide además esa revisión
+    python benchmarks/funciones.py --comparar 2d927a4 e4ce788
+"""
+import argparse
+import inspect
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import warnings
+from io import BytesIO
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SALIDA = os.path.join(RAIZ, "benchmarks", "resultados", "funciones.jsonl")
+
+# Tiempo mínimo de una muestra: las funciones de microsegundos se repiten en bucle
+MUESTRA_MIN_S = 0.005
+
+
+def _revision(raiz=RAIZ, referencia="HEAD"):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", referencia], cwd=raiz, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _casos(backend, n, semilla):
+    """(nombre, función sin argumentos) de cada medición para `n` filas."""
+    from generador import COL_MOTIVO, COL_RESIDE, generar_aforo, generar_eed, generar_encuesta
+
+    df_encuesta = generar_encuesta(n, semilla=semilla)
+    df_aforo = generar_aforo(semilla=semilla)
+    df_eed = generar_eed(n, semilla=semilla)
+    reside, motivo = COL_RESIDE, COL_MOTIVO
+
+    # Sin escribir plantillas en disco: el benchmark no debe depender de .cache/
+    extraer_kwargs = {}
+    if "ruta_plantillas" in inspect.signature(backend.extraer_columnas_validas).parameters:
+        extraer_kwargs["ruta_plantillas"] = None
+    mapeo = backend.extraer_columnas_validas(df_encuesta, **extraer_kwargs)
+    cols = [mapeo[c] for c in ("gasto_alojamiento", "gasto_alimentacion", "gasto_transporte", "dias_estadia")]
+
+    resultado = backend.calcular_poblacion(df_encuesta, df_aforo, reside, motivo, None)
+    grupo = resultado["grupo"]
+    pnl = resultado["Poblacion_estimacion"]
+    stats = backend.evaluar_distribuciones(grupo, cols)
+
+    sectores = df_eed["Sector_EED"].unique()
+    config = [
+        {"sector": s, "activar": i % 2 == 0, "gasto": 50_000.0, "multiplicador": 1.3}
+        for i, s in enumerate(sectores)
+    ]
+
+    casos = [
+        ("extraer_columnas_validas", lambda: backend.extraer_columnas_validas(df_encuesta, **extraer_kwargs)),
+        ("detectar_categorias_motivo", lambda: backend.detectar_categorias_motivo(df_encuesta, reside, motivo)),
+        ("calcular_poblacion", lambda: backend.calcular_poblacion(df_encuesta, df_aforo, reside, motivo, None)),
+        ("evaluar_distribuciones", lambda: backend.evaluar_distribuciones(grupo, cols)),
+        ("calcular_efecto_economico_indirecto", lambda: backend.calcular_efecto_economico_indirecto(
+            stats, pnl, 1.0, *cols, multiplicadores={"alojamiento": 1.2, "alimentacion": 1.3, "transporte": 1.1}
+        )),
+        ("calcular_desglose_por_sectores", lambda: backend.calcular_desglose_por_sectores(
+            df_eed, pnl=pnl, dias_usado=3.5, config_sectores=config
+        )),
+    ]
+    if hasattr(backend, "calcular_efectos_escenarios"):
+        # 1000 escenarios: multiplicadores x población x días
+        escenarios = np.arange(1000)
+        casos.append(("calcular_efectos_escenarios[1000]", lambda: backend.calcular_efectos_escenarios(
+            stats, pnl * (1 + escenarios % 10 / 10), 1.0, *cols,
+            multiplicadores={"alojamiento": 1.0 + escenarios // 100 / 10}, dias=1 + escenarios % 7
+        )))
+    if hasattr(backend, "IndiceEncuesta"):
+        indice = backend.IndiceEncuesta(df_encuesta, reside, motivo)
+        casos.append(("calcular_poblacion[indice]", lambda: backend.calcular_poblacion(
+            df_encuesta, df_aforo, reside, motivo, None, indice=indice
+        )))
+    return casos, {"filas_grupo": len(grupo), "filas_eed": len(df_eed), "sectores": len(sectores)}
+
+
+def _vaciar_caches(backend):
+    for nombre in ("_PLANTILLAS", "_MEMO_ESTADISTICOS"):
+        cache = getattr(backend, nombre, None)
+        if cache is not None:
+            cache.clear()
+
+
+def medir(backend, funcion, repeticiones):
+    """Mediana y mínimo del tiempo por llamada, en frío (cachés vaciadas)."""
+    _vaciar_caches(backend)
+    t0 = time.perf_counter()
+    funcion()
+    primera = time.perf_counter() - t0
+    numero = max(1, int(MUESTRA_MIN_S / primera)) if primera > 0 else 1000
+
+    tiempos = []
+    for _ in range(repeticiones):
+        t = 0.0
+        for _ in range(numero):
+            _vaciar_caches(backend)
+            t0 = time.perf_counter()
+            funcion()
+            t += time.perf_counter() - t0
+        tiempos.append(t / numero)
+    return {"mediana_s": statistics.median(tiempos), "min_s": min(tiempos), "llamadas": numero * repeticiones}
+
+
+def ejecutar(raiz, tamanos, repeticiones, semilla, revision, arbol_actual):
+    """Corre la suite importando backend.py desde `raiz`. Retorna los registros."""
+    sys.path.insert(0, raiz)
+    import backend
+
+    registros = []
+    fecha = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for n in tamanos:
+        with warnings.catch_warnings():
+            # Shapiro avisa que el p-valor es aproximado con N > 5000
+            warnings.simplefilter("ignore", UserWarning)
+            casos, datos = _casos(backend, n, semilla)
+            for nombre, funcion in casos:
+                registro = {
+                    "fecha": fecha, "python": sys.version.split()[0], "revision": revision,
+                    "funcion": nombre, "filas": n, "semilla": semilla, **datos,
+                }
+                if arbol_actual:
+                    registro["arbol_actual"] = True
+                try:
+                    registro.update(medir(backend, funcion, repeticiones))
+                except Exception as e:  # una revisión antigua puede no soportar el caso
+                    registro["error"] = f"{type(e).__name__}: {e}"
+                registros.append(registro)
+                tiempo = f"{registro['mediana_s'] * 1000:12.3f} ms" if "mediana_s" in registro else registro["error"]
+                print(f"{revision or 'actual':>9} | {n:>10,} filas | {nombre:<37} {tiempo}", flush=True)
+    return registros
+
+
+def _extraer_revision(referencia):
+    """Copia de los archivos de una revisión de git en una carpeta temporal."""
+    tmp = tempfile.TemporaryDirectory()
+    contenido = subprocess.run(
+        ["git", "archive", "--format=tar", referencia], cwd=RAIZ, capture_output=True, check=True
+    ).stdout
+    with tarfile.open(fileobj=BytesIO(contenido)) as tar:
+        tar.extractall(tmp.name, filter="data")
+    return tmp
+
+
+def comparar(base, nueva, ruta=SALIDA):
+    """Imprime nueva/base por función y tamaño (última medición de cada revisión)."""
+    ultimos = {}
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            r = json.loads(linea)
+            if r.get("revision") in (base, nueva) and "mediana_s" in r:
+                ultimos[(r["revision"], r["funcion"], r["filas"])] = r["mediana_s"]
+    claves = sorted({(f, n) for (_, f, n) in ultimos})
+    print(f"{'función':<37} {'filas':>10} {base:>12} {nueva:>12}  razón")
+    for funcion, n in claves:
+        a, b = ultimos.get((base, funcion, n)), ultimos.get((nueva, funcion, n))
+        razon = f"{b / a:6.2f}x" if a and b else "     —"
+        fmt = lambda v: f"{v * 1000:10.3f}ms" if v is not None else f"{'—':>12}"
+        print(f"{funcion:<37} {n:>10,} {fmt(a)} {fmt(b)}  {razon}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide las funciones de backend.py con datos sintéticos.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--referencia", help="Revisión de git que se mide además del árbol actual")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVA"),
+                        help="Solo compara dos revisiones ya registradas en funciones.jsonl")
+    parser.add_argument("--raiz", default=RAIZ, help=argparse.SUPPRESS)
+    parser.add_argument("--revision", help=argparse.SUPPRESS)
+    parser.add_argument("--salida", default=SALIDA, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        comparar(*args.comparar, ruta=args.salida)
+        return 0
+
+    if args.referencia:
+        # La referencia corre en otro proceso para importar su propio backend.py
+        tmp = _extraer_revision(args.referencia)
+        try:
+            resultado = subprocess.run([
+                sys.executable, os.path.abspath(__file__), "--raiz", tmp.name,
+                "--revision", _revision(referencia=args.referencia) or args.referencia,
+                "--salida", args.salida, "--semilla", str(args.semilla),
+                "--repeticiones", str(args.repeticiones), "--tamanos", *map(str, args.tamanos),
+            ])
+        finally:
+            tmp.cleanup()
+        if resultado.returncode:
+            print(f"La referencia {args.referencia} falló; se mide solo el árbol actual.", file=sys.stderr)
+
+    arbol_actual = os.path.abspath(args.raiz) == RAIZ
+    revision = args.revision or (_revision() if arbol_actual else None)
+    registros = ejecutar(args.raiz, args.tamanos, args.repeticiones, args.semilla, revision, arbol_actual)
+
+    os.makedirs(os.path.dirname(args.salida), exist_ok=True)
+    with open(args.salida, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
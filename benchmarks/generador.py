@@ -0,0 +1,144 @@
+"""
+Generador sintético (con semilla) de Encuesta, EED y Potencial de aforo.
+
+Los DataFrames tienen los mismos encabezados y tipos que los archivos de
+data/: las preguntas de la encuesta con su texto completo, residencia
+"Sí"/"No"/vacío, motivo solo para no residentes, gastos y días numéricos, y
+el EED con C_Sector, Sector_EED y V_EED. Incluye variantes de escritura
+("si", "NO ", "vacaciones / ocio") para que la normalización trabaje como con
+datos reales. La misma semilla produce siempre los mismos datos.
+
+Con completa=True la Encuesta trae además el resto de columnas del
+formulario (texto y fechas); por defecto solo las que usa el cálculo, para
+que 10^7 filas quepan en memoria.
+
+Uso:
+    from benchmarks.generador import generar_encuesta, generar_eed, generar_aforo
+    df_encuesta = generar_encuesta(100_000, semilla=1)
+"""
+import numpy as np
+import pandas as pd
+
+COL_RESIDE = "¿Reside en la ciudad donde se desarrolla este evento?"
+COL_MOTIVO = "¿Cuál fue el motivo de su viaje a esta ciudad o municipio?"
+COL_DIAS = "¿Cuántos días estará en la ciudad donde se desarrolla este evento"
+COL_TRANSPORTE_VIAJE = (
+    "¿Cuánto esta gastando en transporte de su ciudad de residencia a Cartagena, y viceversa? (Por persona):"
+)
+COL_ALOJAMIENTO = "¿Cuánto está gastando gasto diariamente en alojamiento? (Por persona):"
+COL_ACOMPANANTES = "¿Cuántas personas lo acompañan durante este viaje?:"
+COL_ALIMENTACION = (
+    "En promedio ¿Cuánto ha sido su gasto diario en alimentación y bebidas durante su estadía en la ciudad?"
+)
+COL_TRANSPORTE = "En promedio ¿Cuánto ha sido su gasto diario en transporte durante su estadía en la ciudad?"
+COL_ACTIVIDADES = (
+    "¿Cuánto ha gastado aproximadamente en actividades relacionadas con LOS EVENTOS RELIGIOSOS "
+    "DE SEMANA SANTA EN CARTAGENA (souvenirs, artesanías, libros, etc.)?:"
+)
+
+# Distribución observada en data/Encuesta.xlsx, con variantes de escritura
+RESIDE = np.array(["Sí", "No", None, "si", "NO "], dtype=object)
+P_RESIDE = [0.76, 0.12, 0.10, 0.01, 0.01]
+MOTIVOS = np.array([
+    "Vacaciones/ocio", "Venir a los eventos religiosos", "other", "Negocios",
+    "vacaciones / ocio", "Venir a los eventos religiosos ", "Visitar familiares",
+], dtype=object)
+P_MOTIVOS = [0.55, 0.27, 0.05, 0.04, 0.03, 0.02, 0.04]
+
+# Columnas de texto del formulario (solo con completa=True): opciones de respuesta
+_TEXTO = {
+    "Encuestador": ["Encuestador 1", "Encuestador 2", "Encuestador 3", "Encuestador 4"],
+    "¿Cuál es su ocupación actualmente?:": ["Empleado", "Independiente", "Estudiante", "Pensionado", "Hogar"],
+    "Género:": ["Femenino", "Masculino", "Otro"],
+    "¿Cuál es su nivel educativo?": ["Primaria", "Bachillerato", "Técnico", "Universitario", "Posgrado"],
+    "¿En qué evento se encuentra al momento de diligenciar la encuesta?": [
+        "Lucernario", "Carrera de la resurrección", "Peregrinación a las iglesias"
+    ],
+    "¿Reside en Colombia?": ["Sí", "No"],
+    "¿Cuál es su ciudad de residencia?": ["Cartagena", "Barranquilla", "Bogotá", "Medellín", "Sincelejo"],
+    "¿Por cuál medio de transporte llegó a la ciudad de Cartagena?": ["Terrestre", "Aéreo", "Marítimo"],
+    "Durante su estadía en la ciudad se aloja en:": ["Hotel", "Casa de familiares", "Apartamento turístico", "Hostal"],
+    "¿Es la primera vez que asiste a LOS EVENTOS RELIGIOSOS DE SEMANA SANTA EN CARTAGENA?:": ["Sí", "No"],
+    "¿Le gustaría regresar a la ciudad en próximos eventos?:": ["Sí", "No"],
+}
+
+SECTORES_EED = [
+    (53, "Actividades artísticas, de entretenimiento y recreación y otras actividades de servicios"),
+    (45, "Alojamiento y servicios de comida"),
+    (38, "Comercio al por mayor y en comisión o por contrata; comercio al por menor"),
+    (32, "Otras industrias manufactureras"),
+    (22, "Fabricación de papel, cartón y productos de papel y de cartón"),
+    (14, "Preparación, hilatura, tejeduría y acabado de productos textiles"),
+    (42, "Transporte terrestre y transporte por tuberías"),
+]
+
+
+def _montos(rng, n, mediana, dispersion, redondeo):
+    """Montos log-normales redondeados (como los gastos declarados en la encuesta)."""
+    return np.round(rng.lognormal(np.log(mediana), dispersion, n) / redondeo) * redondeo
+
+
+def generar_encuesta(n, semilla=0, completa=False) -> pd.DataFrame:
+    """Encuesta sintética de `n` filas con los encabezados de data/Encuesta.xlsx."""
+    rng = np.random.default_rng(semilla)
+    reside = RESIDE[rng.choice(len(RESIDE), n, p=P_RESIDE)]
+    no_local = np.isin(reside, ["No", "NO "])
+
+    # Motivo, días y gastos de viaje: solo los responde quien no reside en la ciudad
+    motivo = np.full(n, None, dtype=object)
+    motivo[no_local] = MOTIVOS[rng.choice(len(MOTIVOS), int(no_local.sum()), p=P_MOTIVOS)]
+    dias = np.where(no_local, 1.0 + rng.poisson(3.0, n), np.nan)
+    transporte_viaje = np.where(no_local, _montos(rng, n, 250_000, 0.8, 1000), np.nan)
+    alojamiento = np.where(no_local, _montos(rng, n, 90_000, 0.7, 5000), np.nan)
+    acompanantes = np.where(no_local, rng.poisson(2.0, n).astype(float), np.nan)
+
+    columnas = {
+        "ObjectID": np.arange(1, n + 1, dtype=np.int64),
+        "Edad:": rng.integers(18, 80, n, dtype=np.int64),
+        COL_RESIDE: reside,
+        COL_DIAS: dias,
+        COL_MOTIVO: motivo,
+        COL_TRANSPORTE_VIAJE: transporte_viaje,
+        COL_ALOJAMIENTO: alojamiento,
+        COL_ACOMPANANTES: acompanantes,
+        COL_ALIMENTACION: _montos(rng, n, 40_000, 0.6, 1000).astype(np.int64),
+        COL_TRANSPORTE: _montos(rng, n, 15_000, 0.7, 1000).astype(np.int64),
+        COL_ACTIVIDADES: np.where(rng.random(n) < 0.6, _montos(rng, n, 30_000, 0.9, 1000), np.nan),
+        "¿Cómo le ha parecido la organización del evento o los eventos religiosos a los que asistió?:":
+            rng.integers(1, 6, n, dtype=np.int64),
+    }
+    if completa:
+        columnas["GlobalID"] = np.array([f"{{{i:08x}-0000-4000-8000-000000000000}}" for i in range(n)], dtype=object)
+        columnas["CreationDate"] = pd.Timestamp("2026-03-29") + pd.to_timedelta(rng.integers(0, 7 * 86400, n), unit="s")
+        columnas["y:"] = 10.42 + rng.normal(0, 0.01, n)
+        columnas["x:"] = -75.54 + rng.normal(0, 0.01, n)
+        for col, opciones in _TEXTO.items():
+            columnas[col] = np.array(opciones, dtype=object)[rng.integers(0, len(opciones), n)]
+    return pd.DataFrame(columnas)
+
+
+def generar_eed(n_filas, semilla=0) -> pd.DataFrame:
+    """
+    EED sintético de `n_filas` filas. Con n_filas <= 7 son los sectores de
+    data/EED.xlsx; con más se agregan sectores numerados (unas 20 filas por sector).
+    """
+    rng = np.random.default_rng(semilla)
+    base = SECTORES_EED[:max(1, n_filas)]
+    n_sectores = max(len(base), n_filas // 20)
+    codigos = [c for c, _ in base] + list(range(100, 100 + n_sectores - len(base)))
+    nombres = [s for _, s in base] + [f"Sector sintético {i}" for i in range(n_sectores - len(base))]
+    elegido = np.concatenate([np.arange(n_sectores), rng.integers(0, n_sectores, max(0, n_filas - n_sectores))])
+    return pd.DataFrame({
+        "C_Sector": np.asarray(codigos, dtype=np.int64)[elegido],
+        "Sector_EED": np.asarray(nombres, dtype=object)[elegido],
+        "V_EED": np.round(rng.lognormal(np.log(2_000_000), 1.5, n_filas), -3).astype(np.int64),
+    })
+
+
+def generar_aforo(n_eventos=3, semilla=0) -> pd.DataFrame:
+    """Potencial de aforo por evento (mismo formato que data/Potencial de aforo.xlsx)."""
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        "Evento": [f"Evento {i + 1}" for i in range(n_eventos)],
+        "Potencial de aforo": rng.integers(500, 15_000, n_eventos, dtype=np.int64),
+    })
@@ -0,0 +1,195 @@
+"""
+Latencia de reruns de app.py de punta a punta (sin navegador).
+
+Maneja la app con streamlit.testing (AppTest) usando los archivos de ejemplo
+de data/ (opción "Usar archivos de ejemplo") y ejecuta una secuencia fija de
+interacciones: cambiar ponderadores y multiplicadores, añadir sectores extra,
+activar sectores en la tabla del EED, etc. Para cada paso registra el tiempo
+de pared del rerun y el pico de memoria asignada durante el rerun
+(tracemalloc).
+
+Cada repetición corre en un proceso nuevo (cachés frías) y el tiempo y la
+memoria se miden en pasadas separadas, porque tracemalloc hace más lento el
+código. Los resultados se agregan a benchmarks/resultados/latencia_app.jsonl
+y se comparan con benchmarks/presupuesto_latencia.json: si algún paso
+supera su presupuesto el script termina con código 1.
+
+Nota: AppTest vuelve a ejecutar el script completo también cuando el cambio
+ocurre dentro de un fragmento (tabla de sectores), así que esos pasos son una
+cota superior de lo que se ve en el navegador.
+
+Uso:
+    python benchmarks/latencia_app.py
+    python benchmarks/latencia_app.py --repeticiones 5 --presupuesto mi_presupuesto.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SALIDA = os.path.join(RAIZ, "benchmarks", "resultados", "latencia_app.jsonl")
+PRESUPUESTO = os.path.join(RAIZ, "benchmarks", "presupuesto_latencia.json")
+APP = os.path.join(RAIZ, "app.py")
+sys.path.insert(0, RAIZ)  # app.py importa backend, ingesta, ... desde la raíz
+
+
+# ----------------- INTERACCIONES -----------------
+
+def _widget(coleccion, etiqueta):
+    """Primer widget cuya etiqueta empieza por `etiqueta`."""
+    for w in coleccion:
+        if w.label.startswith(etiqueta):
+            return w
+    raise LookupError(f"No se encontró el widget '{etiqueta}'")
+
+
+def _activar_sectores(at, filas):
+    at.session_state["tabla_sectores"] = {
+        "edited_rows": {i: {"Calcular efecto indirecto": True, "Gasto (media/mediana)": 50_000.0} for i in filas},
+        "added_rows": [],
+        "deleted_rows": [],
+    }
+
+
+# (nombre del paso, acción sobre el AppTest antes del rerun)
+PASOS = [
+    ("carga inicial", lambda at: _widget(at.sidebar.checkbox, "Usar archivos de ejemplo").check()),
+    ("rerun sin cambios", lambda at: None),
+    ("peso otras categorías (no locales)",
+     lambda at: _widget(at.number_input, "Peso otras categorías (NO LOCALES)").set_value(0.7)),
+    ("peso principal (locales)",
+     lambda at: _widget(at.number_input, "Peso categoría principal (LOCALES)").set_value(1.2)),
+    ("multiplicador alojamiento", lambda at: _widget(at.number_input, "Multiplicador alojamiento").set_value(1.5)),
+    ("añadir sector extra", lambda at: _widget(at.button, "➕ Añadir sector extra").click()),
+    ("multiplicador sector extra", lambda at: _widget(at.number_input, "Multiplicador sector extra 1").set_value(1.3)),
+    ("activar sectores", lambda at: _activar_sectores(at, [0, 1, 2])),
+    ("días sectoriales", lambda at: _widget(at.number_input, "Días de estadía a usar").set_value(3.0)),
+    ("población ambos", lambda at: _widget(at.radio, "Selecciona la población base").set_value("Ambos (PNL + PL)")),
+    ("quitar extras", lambda at: _widget(at.button, "🧹 Quitar todos los extras").click()),
+]
+
+
+def pasada(medir_memoria, timeout):
+    """Ejecuta la secuencia de pasos una vez. Retorna {paso: {"segundos" | "pico_mb", "errores"}}."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.run()  # primera pantalla, sin archivos
+    if at.exception:
+        raise RuntimeError(f"app.py falló al iniciar: {at.exception[0].value}")
+    resultados = {}
+    for nombre, accion in PASOS:
+        accion(at)
+        if medir_memoria:
+            tracemalloc.start()
+            at.run()
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            medida = {"pico_mb": pico / 1024 ** 2}
+        else:
+            t0 = time.perf_counter()
+            at.run()
+            medida = {"segundos": time.perf_counter() - t0}
+        medida["errores"] = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+        resultados[nombre] = medida
+    return resultados
+
+
+def _pasada_en_proceso(medir_memoria, timeout):
+    """Corre una pasada en un intérprete nuevo (cachés de Streamlit vacías)."""
+    proceso = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--_pasada", "memoria" if medir_memoria else "tiempo",
+         "--timeout", str(timeout)],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if proceso.returncode:
+        raise RuntimeError(f"La pasada falló:\n{proceso.stderr[-2000:]}")
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+# ----------------- PRESUPUESTO Y REGISTRO -----------------
+
+def cargar_presupuesto(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        presupuesto = json.load(f)
+    desconocidos = set(presupuesto.get("pasos", {})) - {n for n, _ in PASOS}
+    if desconocidos:
+        raise ValueError(f"Pasos desconocidos en el presupuesto: {sorted(desconocidos)}")
+    return presupuesto
+
+
+def _revision_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide la latencia de reruns de app.py con interacciones guionadas.")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Pasadas de tiempo (cada una en un proceso nuevo)")
+    parser.add_argument("--presupuesto", default=PRESUPUESTO, help="JSON con el presupuesto por paso")
+    parser.add_argument("--timeout", type=float, default=120, help="Segundos máximos por rerun en AppTest")
+    parser.add_argument("--salida", default=SALIDA)
+    parser.add_argument("--_pasada", choices=["tiempo", "memoria"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._pasada:
+        print(json.dumps(pasada(args._pasada == "memoria", args.timeout), ensure_ascii=False))
+        return 0
+
+    presupuesto = cargar_presupuesto(args.presupuesto)
+    tiempos = [_pasada_en_proceso(False, args.timeout) for _ in range(args.repeticiones)]
+    memoria = _pasada_en_proceso(True, args.timeout)
+
+    fecha = time.strftime("%Y-%m-%dT%H:%M:%S")
+    revision = _revision_actual()
+    registros, fallas = [], []
+    print(f"{'paso':<36} {'mediana':>9} {'máximo':>9} {'presup.':>9} {'pico MB':>9}")
+    for nombre, _ in PASOS:
+        segundos = [t[nombre]["segundos"] for t in tiempos]
+        limite_s = presupuesto.get("pasos", {}).get(nombre, presupuesto.get("defecto_s"))
+        errores = sorted({e for t in tiempos + [memoria] for e in t[nombre]["errores"]})
+        registro = {
+            "fecha": fecha, "python": sys.version.split()[0], "revision": revision, "paso": nombre,
+            "mediana_s": statistics.median(segundos), "max_s": max(segundos),
+            "pico_mb": memoria[nombre]["pico_mb"], "presupuesto_s": limite_s,
+        }
+        registro["dentro_presupuesto"] = not errores and (limite_s is None or registro["mediana_s"] <= limite_s)
+        if errores:
+            registro["errores"] = errores
+        if not registro["dentro_presupuesto"]:
+            fallas.append(nombre)
+        registros.append(registro)
+        marca = "" if registro["dentro_presupuesto"] else "  <-- " + ("error" if errores else "excede")
+        print(
+            f"{nombre:<36} {registro['mediana_s']:8.3f}s {registro['max_s']:8.3f}s "
+            f"{(f'{limite_s:.2f}s' if limite_s is not None else '—'):>9} {registro['pico_mb']:9.1f}{marca}"
+        )
+
+    limite_mb = presupuesto.get("memoria_mb")
+    pico_total = max(r["pico_mb"] for r in registros)
+    if limite_mb is not None and pico_total > limite_mb:
+        fallas.append(f"memoria ({pico_total:.0f} MB > {limite_mb} MB)")
+
+    os.makedirs(os.path.dirname(args.salida), exist_ok=True)
+    with open(args.salida, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    if fallas:
+        print(f"Fuera de presupuesto: {', '.join(fallas)}", file=sys.stderr)
+        return 1
+    print("Todos los pasos dentro del presupuesto.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark del desglose por sectores (`calcular_desglose_por_sectores`).
+
+Genera EED sintéticos con 10^4, 10^5 y 10^6 sectores (dos filas por sector,
+configuración completa desde la "UI") y mide el tiempo de la función del árbol
+actual. Con --referencia también mide el backend.py de otra revisión de git,
+solo hasta --max-referencia sectores (la versión con iterrows tarda minutos
+en 10^6). Los resultados se agregan a benchmarks/resultados/sectores.jsonl.
+
+Uso:
+    python benchmarks/sectores.py
+    python benchmarks/sectores.py --referencia a2d9087 --tamanos 10000 100000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from funciones import _extraer_revision
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SALIDA = os.path.join(RAIZ, "benchmarks", "resultados", "sectores.jsonl")
+sys.path.insert(0, RAIZ)
+
+
+def generar_eed(n_sectores, semilla=0):
+    """EED sintético + config_sectores con la mitad de los sectores activos."""
+    rng = np.random.default_rng(semilla)
+    nombres = np.array([f"Sector {i:07d}" for i in range(n_sectores)], dtype=object)
+    df_eed = pd.DataFrame({
+        "C_Sector": np.tile(np.arange(n_sectores), 2),
+        "Sector_EED": np.tile(nombres, 2),
+        "V_EED": rng.gamma(2.0, 5e6, 2 * n_sectores),
+    })
+    activar = rng.random(n_sectores) < 0.5
+    gasto = rng.uniform(0, 200_000, n_sectores)
+    mult = rng.uniform(1.0, 2.5, n_sectores)
+    config = [
+        {"sector": s, "activar": bool(a), "gasto": float(g), "multiplicador": float(m)}
+        for s, a, g, m in zip(nombres, activar, gasto, mult)
+    ]
+    return df_eed, config
+
+
+def _cargar_backend(ruta, nombre):
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def medir(funcion, df_eed, config, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion(df_eed, pnl=12_345.0, dias_usado=3.5, config_sectores=config)
+        tiempos.append(time.perf_counter() - t0)
+    return {"mediana_s": statistics.median(tiempos), "min_s": min(tiempos)}
+
+
+def _revision_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide calcular_desglose_por_sectores con EED grandes.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--referencia", help="Revisión de git a comparar (p. ej. la anterior al cambio)")
+    parser.add_argument("--max-referencia", type=int, default=100_000,
+                        help="Tamaño máximo en que se mide la referencia")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    import backend
+
+    versiones = [(_revision_actual() or "árbol actual", backend.calcular_desglose_por_sectores, True)]
+    tmp = None
+    if args.referencia:
+        # Árbol completo: su backend.py puede importar otros módulos del repositorio
+        tmp = _extraer_revision(args.referencia)
+        sys.path.insert(0, tmp.name)
+        try:
+            referencia = _cargar_backend(os.path.join(tmp.name, "backend.py"), "backend_referencia")
+        finally:
+            sys.path.remove(tmp.name)
+        versiones.insert(0, (args.referencia, referencia.calcular_desglose_por_sectores, False))
+
+    registros = []
+    fecha = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for n in args.tamanos:
+        df_eed, config = generar_eed(n)
+        for revision, funcion, actual in versiones:
+            if not actual and n > args.max_referencia:
+                continue
+            registro = {"fecha": fecha, "python": sys.version.split()[0], "revision": revision, "sectores": n}
+            if actual:
+                registro["arbol_actual"] = True
+            registro.update(medir(funcion, df_eed, config, args.repeticiones))
+            registros.append(registro)
+            etiqueta = "actual" if actual else revision
+            print(f"{etiqueta:>12} | {n:>9,} sectores: mediana {registro['mediana_s'] * 1000:10.1f} ms")
+    if tmp is not None:
+        tmp.cleanup()
+
+    os.makedirs(os.path.dirname(SALIDA), exist_ok=True)
+    with open(SALIDA, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
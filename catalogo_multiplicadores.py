@@ -0,0 +1,223 @@
+"""
+Catálogo de multiplicadores indexado por (sector, región, año).
+
+Carga Multiplicadores.xlsx (y versiones futuras) en un diccionario en memoria
+para resolver cada consulta en O(1) y precargar los multiplicadores de la app
+(rubros y sectores del EED). Formatos aceptados:
+  - Ancho (el archivo actual): C_Sector, Sectores y una o más columnas
+    "Multiplicador ... para <Región> [<año>]".
+  - Largo: C_Sector, Sectores, Región, Año y Multiplicador (una fila por combinación).
+
+El catálogo se reconstruye solo cuando cambia el hash del archivo.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend import codigo_sector, plegar_texto
+from ingesta import hash_contenido, leer_tabla
+
+COLUMNA_CODIGO = "C_Sector"
+
+# Sector del catálogo que corresponde a cada rubro de gasto de la encuesta
+SECTOR_RUBRO = {
+    "alojamiento": "Alojamiento y servicios de comida",
+    "alimentacion": "Alojamiento y servicios de comida",
+    "transporte": "Transporte terrestre y transporte por tuberías",
+}
+
+_CATALOGOS = OrderedDict()  # hash -> CatalogoMultiplicadores
+_CATALOGOS_MAX = 8
+_ARCHIVOS = {}              # ruta -> (mtime_ns, tamaño, hash)
+_LOCK = threading.Lock()
+
+
+def _entero(valor):
+    # Código o año entero (mismo criterio que insumo_producto); None si no lo es
+    codigo = codigo_sector(valor)
+    return codigo if isinstance(codigo, int) else None
+
+
+class CatalogoMultiplicadores:
+    """
+    Índice en memoria de multiplicadores.
+
+    Atributos:
+        regiones: regiones disponibles (texto original; "" si el archivo no la indica).
+        anios:    años disponibles, ascendentes (vacío si el archivo no los indica).
+        region_defecto: primera región del archivo.
+        hash_archivo: hash del archivo de origen.
+    """
+
+    def __init__(self, df, hash_archivo=None):
+        self.hash_archivo = hash_archivo
+        largo = self._a_formato_largo(df)
+
+        self.regiones = list(dict.fromkeys(largo["region"]))
+        self.anios = sorted({a for a in largo["anio"] if a is not None})
+        self.region_defecto = self.regiones[0] if self.regiones else ""
+
+        # Claves (codigo, region normalizada, año). Con año=None se guarda el año más reciente.
+        self._valores = {}
+        self._nombres = {}
+        self._codigo_por_nombre = {}
+        ultimo_anio = {}
+        for codigo, nombre, region, anio, valor in largo.itertuples(index=False, name=None):
+            clave_region = plegar_texto(region)
+            self._valores[(codigo, clave_region, anio)] = valor
+            orden = -1 if anio is None else anio
+            if orden >= ultimo_anio.get((codigo, clave_region), -1):
+                ultimo_anio[(codigo, clave_region)] = orden
+                self._valores[(codigo, clave_region, None)] = valor
+            self._nombres.setdefault(codigo, nombre)
+            self._codigo_por_nombre.setdefault(plegar_texto(nombre), codigo)
+
+    def __len__(self):
+        return len(self._nombres)
+
+    # ----------------- LECTURA -----------------
+    @staticmethod
+    def _a_formato_largo(df) -> pd.DataFrame:
+        """Lleva cualquiera de los dos formatos a (codigo, nombre, region, anio, valor)."""
+        if COLUMNA_CODIGO not in df.columns:
+            raise ValueError(f"El archivo de multiplicadores debe tener la columna '{COLUMNA_CODIGO}'.")
+        por_nombre = {plegar_texto(c): c for c in df.columns}
+        col_nombre = por_nombre.get("sectores") or por_nombre.get("sector")
+        col_region = por_nombre.get("region")
+        col_anio = por_nombre.get("ano") or por_nombre.get("anio") or por_nombre.get("year")
+        cols_mult = [c for c in df.columns if "multiplicador" in plegar_texto(c)]
+        if not cols_mult:
+            raise ValueError("El archivo de multiplicadores no tiene columnas 'Multiplicador ...'.")
+
+        df = df[df[COLUMNA_CODIGO].notna()]
+        codigos = [_entero(c) for c in df[COLUMNA_CODIGO]]
+        if any(c is None for c in codigos):
+            raise ValueError(f"'{COLUMNA_CODIGO}' debe contener códigos enteros.")
+        nombres = df[col_nombre].astype(str).tolist() if col_nombre else [str(c) for c in codigos]
+
+        partes = []
+        if col_region is not None or col_anio is not None:
+            # Formato largo: una sola columna de multiplicador
+            partes.append(pd.DataFrame({
+                "codigo": codigos,
+                "nombre": nombres,
+                "region": df[col_region].fillna("").astype(str).tolist() if col_region else "",
+                "anio": [_entero(a) for a in df[col_anio]] if col_anio else None,
+                "valor": pd.to_numeric(df[cols_mult[0]], errors="coerce").to_numpy(),
+            }))
+        else:
+            # Formato ancho: región y año salen del encabezado de cada columna
+            for col in cols_mult:
+                texto = str(col)
+                anio = re.search(r"\b(19|20)\d{2}\b", texto)
+                region = re.split(r"\bpara\b", texto, maxsplit=1)
+                region = region[1] if len(region) > 1 else ""
+                if anio:
+                    region = region.replace(anio.group(0), "")
+                partes.append(pd.DataFrame({
+                    "codigo": codigos,
+                    "nombre": nombres,
+                    "region": region.strip(" -_()"),
+                    "anio": int(anio.group(0)) if anio else None,
+                    "valor": pd.to_numeric(df[col], errors="coerce").to_numpy(),
+                }))
+        largo = pd.concat(partes, ignore_index=True).dropna(subset=["valor"])
+        largo["anio"] = largo["anio"].astype(object).where(largo["anio"].notna(), None)
+        return largo[["codigo", "nombre", "region", "anio", "valor"]]
+
+    # ----------------- CONSULTAS -----------------
+    def nombres_sectores(self) -> list:
+        """Nombres de los sectores, en el orden del archivo."""
+        return list(self._nombres.values())
+
+    def codigo_sector(self, sector):
+        """Código de un sector dado por código o por nombre (sin importar tildes/mayúsculas)."""
+        codigo = _entero(sector)
+        if codigo is not None and codigo in self._nombres:
+            return codigo
+        return self._codigo_por_nombre.get(plegar_texto(sector))
+
+    def obtener(self, sector, region=None, anio=None, defecto=None):
+        """
+        Multiplicador de un sector. Sin región se usa la región por defecto;
+        sin año, el más reciente disponible. Retorna `defecto` si no existe.
+        """
+        codigo = self.codigo_sector(sector)
+        region = self.region_defecto if region is None else region
+        valor = self._valores.get((codigo, plegar_texto(region), anio))
+        return defecto if valor is None else float(valor)
+
+    def multiplicadores_rubros(self, region=None, anio=None, defecto=1.0) -> dict:
+        """Valores para el parámetro `multiplicadores` de calcular_efecto_economico_indirecto."""
+        return {
+            rubro: self.obtener(sector, region, anio, defecto)
+            for rubro, sector in SECTOR_RUBRO.items()
+        }
+
+    def config_sectores(self, df_eed, col_sector="Sector_EED", col_codigo=COLUMNA_CODIGO,
+                        region=None, anio=None, defecto=1.0) -> list:
+        """
+        config_sectores para calcular_desglose_por_sectores con el multiplicador
+        del catálogo en cada sector del EED (se ubica por código si el EED lo
+        trae, si no por nombre). El efecto indirecto queda desactivado.
+        """
+        if col_codigo in df_eed.columns:
+            pares = df_eed[[col_sector, col_codigo]].drop_duplicates(subset=[col_sector])
+            referencias = zip(pares[col_sector].astype(str), pares[col_codigo])
+        else:
+            sectores = df_eed[col_sector].astype(str).unique()
+            referencias = zip(sectores, sectores)
+        return [
+            {
+                "sector": sector,
+                "activar": False,
+                "gasto": 0.0,
+                "multiplicador": self.obtener(referencia, region, anio, defecto),
+            }
+            for sector, referencia in referencias
+        ]
+
+
+# ----------------- CACHÉ POR CONTENIDO -----------------
+def obtener_catalogo(contenido: bytes, nombre: str, hash_archivo: str = None):
+    """Catálogo del archivo; solo se construye si el hash no se ha visto antes."""
+    clave = hash_archivo or hash_contenido(contenido)
+    with _LOCK:
+        catalogo = _CATALOGOS.get(clave)
+        if catalogo is not None:
+            _CATALOGOS.move_to_end(clave)
+            return catalogo
+
+    catalogo = CatalogoMultiplicadores(leer_tabla(contenido, nombre), hash_archivo=clave)
+    with _LOCK:
+        _CATALOGOS[clave] = catalogo
+        while len(_CATALOGOS) > _CATALOGOS_MAX:
+            _CATALOGOS.popitem(last=False)
+    return catalogo
+
+
+def cargar_catalogo(ruta):
+    """
+    Catálogo de un archivo en disco. Si la fecha y el tamaño no cambiaron no se
+    vuelve a leer; si cambiaron se recalcula el hash y solo se reconstruye el
+    índice cuando el contenido es distinto.
+    """
+    ruta = str(ruta)
+    estado = os.stat(ruta)
+    firma = (estado.st_mtime_ns, estado.st_size)
+    with _LOCK:
+        anterior = _ARCHIVOS.get(ruta)
+        if anterior is not None and anterior[:2] == firma and anterior[2] in _CATALOGOS:
+            _CATALOGOS.move_to_end(anterior[2])
+            return _CATALOGOS[anterior[2]]
+
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+    clave = hash_contenido(contenido)
+    catalogo = obtener_catalogo(contenido, ruta, hash_archivo=clave)
+    with _LOCK:
+        _ARCHIVOS[ruta] = (*firma, clave)
+    return catalogo
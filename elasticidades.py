@@ -0,0 +1,179 @@
+"""
+Derivadas parciales y elasticidades exactas del efecto económico.
+
+La cadena calcular_poblacion -> calcular_efecto_economico_indirecto es un
+producto de sumas:
+    P_s = aforo * (n_s / N) * factor * (peso_principal_s * f_s + peso_otros_s * (1 - f_s))
+    P   = P_no_local y/o P_local (según el tipo de población)
+    Indirecto     = P * dias * Σ_r gasto_r
+    Inducido neto = P * dias * Σ_r gasto_r * (m_r - 1)
+    Efecto total  = efecto directo + Indirecto + Inducido neto
+así que cada resultado es lineal en cada parámetro por separado y sus
+derivadas salen en forma cerrada de una sola evaluación (f_s = fracción del
+motivo principal en el segmento s, fija por la encuesta).
+
+Por la misma linealidad, mover un parámetro un ±x % mueve el resultado
+exactamente ±x % * elasticidad: `tornado` no aproxima.
+
+Uso:
+    from elasticidades import calcular_elasticidades, tornado
+    tabla = calcular_elasticidades(indice, df_aforo, stats, params_poblacion, params_efecto,
+                                   efecto_directo=df_eed["V_EED"].sum())
+    tornado(tabla, "Efecto total", variacion=0.10)
+"""
+import numpy as np
+import pandas as pd
+
+from backend import SEG_LOCAL, SEG_NO_LOCAL, SEGMENTOS_TIPO, calcular_efectos_escenarios
+
+OBJETIVOS = ("Población", "Efecto indirecto", "Inducido neto", "Efecto total")
+COLUMNAS = ["parametro", "grupo", "valor", "objetivo", "resultado", "derivada", "elasticidad"]
+
+_SUFIJO = {SEG_NO_LOCAL: "NO LOCALES", SEG_LOCAL: "LOCALES"}
+_CLAVE = {SEG_NO_LOCAL: "no_local", SEG_LOCAL: "local"}
+_CLAVES_MULT = ("alojamiento", "alimentacion", "transporte")
+
+
+def _derivadas_poblacion(indice, df_aforo, params_poblacion):
+    """
+    Población y sus derivadas: (P, [(parámetro, grupo, valor, dP/dθ), ...]).
+    Replica calcular_poblacion con los conteos del índice.
+    """
+    if "Potencial de aforo" not in df_aforo.columns:
+        raise ValueError("El archivo de Aforo necesita la columna 'Potencial de aforo'")
+    tipo = params_poblacion.get("tipo_poblacion", "no_local")
+    categoria = params_poblacion.get("categoria_principal")
+    corregir = bool(params_poblacion.get("activar_factor_correccion")) and \
+        params_poblacion.get("factor_pt_n_sobre_rho") is not None
+    factor = float(params_poblacion["factor_pt_n_sobre_rho"]) if corregir else 1.0
+
+    total = indice.total_encuestados
+    aforo = float(pd.to_numeric(df_aforo["Potencial de aforo"], errors="coerce").fillna(0).sum())
+
+    poblacion = 0.0
+    d_aforo = d_factor = 0.0
+    parametros = []
+    for seg in SEGMENTOS_TIPO.get(tipo, SEGMENTOS_TIPO["ambos"]):
+        peso_p = float(params_poblacion.get(f"peso_principal_{_CLAVE[seg]}", 1.0))
+        peso_o = float(params_poblacion.get(f"peso_otros_{_CLAVE[seg]}", 0.5))
+        total_seg, total_motivo = indice.conteo_principal(seg, categoria) if total else (0, 0)
+        frac = total_motivo / total_seg if total_seg else 0.0
+        # P_s = base * ponderador; base = aforo * proporción * factor
+        base = aforo * (total_seg / total) * factor if total_seg else 0.0
+        ponderador = peso_p * frac + peso_o * (1 - frac)
+        poblacion += base * ponderador
+        d_aforo += (total_seg / total) * factor * ponderador if total_seg else 0.0
+        d_factor += aforo * (total_seg / total) * ponderador if total_seg else 0.0
+        parametros += [
+            (f"Peso categoría principal ({_SUFIJO[seg]})", "Población", peso_p, base * frac),
+            (f"Peso otras categorías ({_SUFIJO[seg]})", "Población", peso_o, base * (1 - frac)),
+        ]
+
+    parametros.append(("Potencial de aforo", "Población", aforo, d_aforo))
+    if corregir:
+        parametros.append(("Factor n/ρ", "Población", factor, d_factor))
+    return poblacion, parametros
+
+
+def calcular_elasticidades(indice, df_aforo, stats, params_poblacion, params_efecto, efecto_directo=0.0):
+    """
+    Derivada y elasticidad de cada objetivo (OBJETIVOS) respecto de cada parámetro.
+
+    Parámetros:
+        indice:           IndiceEncuesta (o armado desde conteos) de la encuesta
+        stats:            estadísticos del grupo (evaluar_distribuciones)
+        params_poblacion: kwargs de calcular_poblacion (sin df_encuesta/df_aforo/indice)
+        params_efecto:    kwargs de calcular_efecto_economico_indirecto (sin stats/pnl)
+        efecto_directo:   suma del EED (entra solo en "Efecto total")
+
+    Retorna un DataFrame largo con COLUMNAS: una fila por parámetro y objetivo.
+    elasticidad = derivada * valor / resultado (NaN si el resultado es 0).
+    """
+    poblacion, param_pob = _derivadas_poblacion(indice, df_aforo, params_poblacion)
+
+    params_efecto = dict(params_efecto)
+    params_efecto.setdefault("multiplicador", 1.0)
+    efectos = calcular_efectos_escenarios(stats, poblacion, **params_efecto)
+    gasto = efectos.gasto
+    mult = efectos.multiplicadores[0]
+    dias = float(efectos.dias[0])
+    suma_gasto = float(gasto.sum())
+    suma_gasto_m = float((gasto * mult).sum())
+
+    resultados = {
+        "Población": poblacion,
+        "Efecto indirecto": float(efectos.indirecto_total[0]),
+        "Inducido neto": float(efectos.inducido_total[0]),
+        "Efecto total": float(efecto_directo) + float(efectos.indirecto_total[0] + efectos.inducido_total[0]),
+    }
+
+    filas = []
+
+    def _agregar(parametro, grupo, valor, derivadas):
+        for objetivo in OBJETIVOS:
+            derivada = float(derivadas.get(objetivo, 0.0))
+            resultado = resultados[objetivo]
+            elasticidad = derivada * valor / resultado if resultado else np.nan
+            filas.append((parametro, grupo, float(valor), objetivo, resultado, derivada, elasticidad))
+
+    # ---- Parámetros de la población: dO/dθ = dP/dθ * dO/dP
+    por_poblacion = {
+        "Población": 1.0,
+        "Efecto indirecto": dias * suma_gasto,
+        "Inducido neto": dias * (suma_gasto_m - suma_gasto),
+        "Efecto total": dias * suma_gasto_m,
+    }
+    for parametro, grupo, valor, d_pob in param_pob:
+        _agregar(parametro, grupo, valor, {o: d_pob * v for o, v in por_poblacion.items()})
+
+    # ---- Días de estadía (o número de eventos en modo local)
+    modo_eventos = params_efecto.get("dias") is None and params_efecto.get("modo_local") \
+        and params_efecto.get("n_eventos") is not None
+    _agregar("Número de eventos" if modo_eventos else "Días de estadía", "Estadía", dias, {
+        "Efecto indirecto": poblacion * suma_gasto,
+        "Inducido neto": poblacion * (suma_gasto_m - suma_gasto),
+        "Efecto total": poblacion * suma_gasto_m,
+    })
+
+    # ---- Gasto y multiplicador de cada rubro
+    base_pd = poblacion * dias
+    for r, rubro in enumerate(efectos.rubros):
+        _agregar(f"Gasto {rubro}", "Gasto", gasto[r], {
+            "Efecto indirecto": base_pd,
+            "Inducido neto": base_pd * (mult[r] - 1),
+            "Efecto total": base_pd * mult[r],
+        })
+
+    # Rubros sin multiplicador propio usan el general: su derivada se suma en él
+    multiplicadores = params_efecto.get("multiplicadores") or {}
+    extras = params_efecto.get("extras") or []
+    propio = [k in multiplicadores for k in _CLAVES_MULT] + ["mult" in ex for ex in extras]
+    for r, rubro in enumerate(efectos.rubros):
+        if propio[r]:
+            _agregar(f"Multiplicador {rubro}", "Multiplicador", mult[r], {
+                "Inducido neto": base_pd * gasto[r], "Efecto total": base_pd * gasto[r],
+            })
+    if not all(propio):
+        d_general = base_pd * float(sum(g for g, p in zip(gasto, propio) if not p))
+        _agregar("Multiplicador general", "Multiplicador", float(params_efecto["multiplicador"]), {
+            "Inducido neto": d_general, "Efecto total": d_general,
+        })
+
+    if efecto_directo:
+        _agregar("Efecto directo (EED)", "Directo", efecto_directo, {"Efecto total": 1.0})
+
+    return pd.DataFrame(filas, columns=COLUMNAS)
+
+
+def tornado(tabla, objetivo="Efecto total", variacion=0.10):
+    """
+    Resultado con cada parámetro movido ±variacion (relativo), de mayor a menor
+    impacto. Columnas: parametro, grupo, elasticidad, resultado, bajo, alto.
+    """
+    df = tabla[(tabla["objetivo"] == objetivo) & (tabla["derivada"] != 0)].copy()
+    delta = df["derivada"] * df["valor"] * variacion
+    df["bajo"] = df["resultado"] - delta
+    df["alto"] = df["resultado"] + delta
+    df["impacto"] = delta.abs()
+    df = df.sort_values("impacto", ascending=False, kind="stable")
+    return df[["parametro", "grupo", "elasticidad", "resultado", "bajo", "alto"]].reset_index(drop=True)
@@ -0,0 +1,318 @@
+"""
+Ingesta incremental de encuestas que llegan por tandas durante un evento.
+
+Cada evento tiene un estado (`EncuestaEnVivo`) con los agregados de
+agregado_encuesta.py: conteos por residencia y motivo, N y sumas por columna
+(medias exactas) y el sketch/histograma de cuantiles para la mediana. Cada
+tanda nueva solo actualiza esos agregados, así que agregar una tanda cuesta
+lo proporcional a la tanda, y población y efectos se recalculan desde los
+agregados sin recorrer las respuestas anteriores.
+
+El estado se guarda en disco (.cache/en_vivo/<evento>.pkl) después de cada
+tanda; al reiniciar, `EncuestaEnVivo.abrir` lo retoma sin releer nada. Si las
+respuestas se acumulan en un CSV que crece, `agregar_desde_archivo` lee solo
+los registros completos añadidos desde la última vez (un campo entre comillas
+puede tener saltos de línea; el encabezado debe ocupar una sola línea).
+
+Uso:
+    vivo = EncuestaEnVivo.abrir("festival_2026")
+    vivo.agregar_desde_archivo("respuestas.csv")   # o vivo.agregar(df_tanda)
+    res_pob = vivo.poblacion(df_aforo, categoria_principal="venir a los eventos religiosos")
+    res_ind, desglose = vivo.efecto(res_pob["Poblacion_estimacion"], col_aloj="gasto_alojamiento", ...)
+
+    python encuesta_en_vivo.py festival_2026 respuestas.csv --aforo "data/Potencial de aforo.xlsx"
+"""
+import argparse
+import io
+import os
+import pickle
+import re
+import sys
+import time
+
+import pandas as pd
+
+from agregado_encuesta import TAM_BLOQUE, AgregadoEncuesta, columnas_por_defecto
+from backend import (
+    COLUMNA_RESIDE,
+    COLUMNA_MOTIVO,
+    calcular_poblacion,
+    calcular_efecto_economico_indirecto,
+    extraer_columnas_validas,
+)
+
+RUTA_EN_VIVO = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "en_vivo")
+VERSION_ESTADO = 1
+
+
+def _nombre_archivo(evento) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(evento)).strip("._") or "evento"
+
+
+def _fin_ultimo_registro(datos: bytes) -> int:
+    """
+    Posición tras el último salto de línea que cierra un registro CSV (0 si no hay).
+
+    `datos` empieza en un límite de registro. Un salto de línea cierra un
+    registro solo si antes hay un número par de comillas: dentro de un campo
+    entre comillas queda impar (las comillas escapadas "" no cambian la paridad).
+    """
+    fin = datos.rfind(b"\n")
+    comillas = datos.count(b'"', 0, fin) if fin >= 0 else 0
+    while fin >= 0:
+        if comillas % 2 == 0:
+            return fin + 1
+        anterior = datos.rfind(b"\n", 0, fin)
+        if anterior >= 0:
+            comillas -= datos.count(b'"', anterior, fin)
+        fin = anterior
+    return 0
+
+
+class EncuestaEnVivo:
+    """
+    Estado incremental de la encuesta de un evento.
+
+    Atributos:
+        evento:   nombre del evento (también nombra el archivo de estado).
+        agregado: AgregadoEncuesta con todas las tandas recibidas (None antes de la primera).
+        tandas:   número de tandas incorporadas.
+        actualizado: fecha (epoch) de la última tanda.
+    """
+
+    def __init__(self, evento, columnas=None, columna_reside=COLUMNA_RESIDE, columna_motivo=COLUMNA_MOTIVO,
+                 directorio=RUTA_EN_VIVO, **kwargs_agregado):
+        self.evento = str(evento)
+        self.columnas = None if columnas is None else list(columnas)
+        self.columna_reside = columna_reside
+        self.columna_motivo = columna_motivo
+        self.directorio = directorio
+        self.kwargs_agregado = kwargs_agregado
+        self.agregado = None
+        self.tandas = 0
+        self.actualizado = None
+        self._archivo = None     # {"ruta", "encabezado", "offset"} del CSV que se sigue
+        self._memo = {}          # resultados derivados de la versión actual (no se guardan)
+
+    # ----------------- PERSISTENCIA -----------------
+    @property
+    def ruta_estado(self) -> str:
+        return os.path.join(self.directorio, f"{_nombre_archivo(self.evento)}.pkl")
+
+    @classmethod
+    def abrir(cls, evento, directorio=RUTA_EN_VIVO, **kwargs):
+        """Retoma el estado guardado del evento o crea uno nuevo si no existe."""
+        vivo = cls(evento, directorio=directorio, **kwargs)
+        try:
+            with open(vivo.ruta_estado, "rb") as f:
+                estado = pickle.load(f)
+        except FileNotFoundError:
+            return vivo
+        if estado.get("version") != VERSION_ESTADO:
+            raise ValueError(f"El estado de '{evento}' es de otra versión; usa reiniciar().")
+        for clave in ("columnas", "columna_reside", "columna_motivo", "kwargs_agregado",
+                      "agregado", "tandas", "actualizado"):
+            setattr(vivo, clave, estado[clave])
+        vivo._archivo = estado["archivo"]
+        return vivo
+
+    def guardar(self):
+        """Escribe el estado de forma atómica (un corte a mitad de escritura no lo corrompe)."""
+        os.makedirs(self.directorio, exist_ok=True)
+        estado = {
+            "version": VERSION_ESTADO,
+            "evento": self.evento,
+            "columnas": self.columnas,
+            "columna_reside": self.columna_reside,
+            "columna_motivo": self.columna_motivo,
+            "kwargs_agregado": self.kwargs_agregado,
+            "agregado": self.agregado,
+            "tandas": self.tandas,
+            "actualizado": self.actualizado,
+            "archivo": self._archivo,
+        }
+        temporal = f"{self.ruta_estado}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, self.ruta_estado)
+
+    def reiniciar(self):
+        """Descarta los agregados y el archivo de estado del evento."""
+        self.agregado = None
+        self.tandas = 0
+        self.actualizado = None
+        self._archivo = None
+        self._memo.clear()
+        try:
+            os.remove(self.ruta_estado)
+        except FileNotFoundError:
+            pass
+
+    # ----------------- TANDAS -----------------
+    @property
+    def filas(self) -> int:
+        return self.agregado.filas if self.agregado is not None else 0
+
+    def _incorporar(self, bloque):
+        if self.agregado is None:
+            if self.columnas is None:
+                self.columnas = columnas_por_defecto(bloque, self.columna_reside, self.columna_motivo)
+            self.agregado = AgregadoEncuesta(
+                self.columnas, self.columna_reside, self.columna_motivo, **self.kwargs_agregado
+            )
+        self.agregado.actualizar(bloque)
+
+    def _cerrar_tanda(self, guardar):
+        self.tandas += 1
+        self.actualizado = time.time()
+        self._memo.clear()
+        if guardar:
+            self.guardar()
+
+    def agregar(self, tanda: pd.DataFrame, guardar=True) -> int:
+        """Incorpora una tanda de respuestas. Retorna el número de filas nuevas."""
+        if not len(tanda):
+            return 0
+        self._incorporar(tanda)
+        self._cerrar_tanda(guardar)
+        return len(tanda)
+
+    def agregar_desde_archivo(self, ruta, guardar=True, tam_bloque=TAM_BLOQUE) -> int:
+        """
+        Incorpora los registros completos que se añadieron a un CSV desde la
+        última lectura; el último se deja para después si todavía no termina
+        (sin salto de línea final o con un campo entre comillas abierto).
+        Si el archivo se reescribió (otro encabezado o tamaño menor) lanza ValueError.
+        """
+        ruta = os.path.abspath(ruta)
+        with open(ruta, "rb") as f:
+            encabezado = f.readline()
+            if not encabezado.endswith(b"\n"):
+                return 0
+            if self._archivo is not None:
+                if (self._archivo["ruta"], self._archivo["encabezado"]) != (ruta, encabezado):
+                    raise ValueError(
+                        f"'{self.evento}' sigue otro archivo o el encabezado cambió; usa reiniciar()."
+                    )
+                if os.fstat(f.fileno()).st_size < self._archivo["offset"]:
+                    raise ValueError("El archivo es más corto que lo ya leído; usa reiniciar().")
+                f.seek(self._archivo["offset"])
+            offset = f.tell()
+            nuevo = f.read()
+
+        corte = _fin_ultimo_registro(nuevo)
+        if self._archivo is None:
+            self._archivo = {"ruta": ruta, "encabezado": encabezado, "offset": offset}
+        if corte == 0:
+            return 0
+
+        filas = 0
+        lector = pd.read_csv(
+            io.BytesIO(encabezado + nuevo[:corte]), chunksize=tam_bloque,
+            dtype={self.columna_reside: str, self.columna_motivo: str}
+        )
+        for bloque in lector:
+            self._incorporar(bloque)
+            filas += len(bloque)
+        self._archivo["offset"] = offset + corte
+        self._cerrar_tanda(guardar)
+        return filas
+
+    # ----------------- RESULTADOS -----------------
+    def _requiere_datos(self):
+        if self.agregado is None:
+            raise ValueError(f"'{self.evento}' todavía no tiene respuestas.")
+
+    def indice(self, armonizar=False):
+        """IndiceEncuesta de todas las tandas (se arma una vez por tanda)."""
+        self._requiere_datos()
+        clave = ("indice", bool(armonizar))
+        if clave not in self._memo:
+            self._memo[clave] = self.agregado.indice(armonizar=armonizar)
+        return self._memo[clave]
+
+    def poblacion(self, df_aforo, categoria_principal=None, armonizar_motivos=False, **params_poblacion):
+        """calcular_poblacion con los conteos acumulados (el resultado no trae 'grupo')."""
+        return calcular_poblacion(
+            None, df_aforo, self.columna_reside, self.columna_motivo, categoria_principal,
+            indice=self.indice(armonizar_motivos), **params_poblacion
+        )
+
+    def resolver_columna(self, columna):
+        """Nombre real de una columna dada por alias de extraer_columnas_validas o por nombre."""
+        if columna is None:
+            return None
+        self._requiere_datos()
+        if "mapeo" not in self._memo:
+            self._memo["mapeo"] = extraer_columnas_validas(pd.DataFrame(columns=self.agregado.columnas))
+        real = self._memo["mapeo"].get(columna, columna)
+        return real if real in self.agregado.columnas else None
+
+    def estadisticos(self, tipo_poblacion="no_local", columnas=None, criterio="auto"):
+        """Mismo formato que evaluar_distribuciones; se calcula una vez por tanda."""
+        self._requiere_datos()
+        columnas = tuple(self.agregado.columnas if columnas is None else columnas)
+        clave = ("estadisticos", tipo_poblacion, columnas, criterio)
+        if clave not in self._memo:
+            self._memo[clave] = self.agregado.estadisticos(tipo_poblacion, columnas, criterio)
+        return self._memo[clave]
+
+    def efecto(self, pnl, tipo_poblacion="no_local", col_aloj=None, col_alim=None, col_trans=None,
+               col_dias=None, extras=None, **params_efecto):
+        """
+        calcular_efecto_economico_indirecto con los estadísticos acumulados.
+        Las columnas aceptan alias ("gasto_alojamiento", ...) como en lote.py;
+        las que no existen cuentan como 0.
+        """
+        cols = {
+            "col_aloj": self.resolver_columna(col_aloj),
+            "col_alim": self.resolver_columna(col_alim),
+            "col_trans": self.resolver_columna(col_trans),
+            "col_dias": self.resolver_columna(col_dias),
+        }
+        extras = [{**ex, "col": self.resolver_columna(ex.get("col"))} for ex in extras or []]
+        usadas = [c for c in list(cols.values()) + [ex["col"] for ex in extras] if c]
+        stats = self.estadisticos(tipo_poblacion, list(dict.fromkeys(usadas)))
+        return calcular_efecto_economico_indirecto(
+            stats=stats, pnl=pnl, extras=extras, modo_local=(tipo_poblacion != "no_local"),
+            **cols, **params_efecto
+        )
+
+
+# ----------------- LÍNEA DE COMANDOS -----------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incorpora las respuestas nuevas de un CSV al estado de un evento.")
+    parser.add_argument("evento", help="Nombre del evento (identifica el estado guardado)")
+    parser.add_argument("csv", help="CSV de respuestas que va creciendo")
+    parser.add_argument("--aforo", help="Archivo de Potencial de aforo para imprimir la población estimada")
+    parser.add_argument("--categoria", help="Categoría de motivo principal (por defecto, la más frecuente)")
+    parser.add_argument("--vigilar", type=float, default=None,
+                        help="Segundos entre lecturas; sin este argumento se lee una sola vez")
+    parser.add_argument("--reiniciar", action="store_true", help="Descarta el estado guardado antes de leer")
+    args = parser.parse_args(argv)
+
+    vivo = EncuestaEnVivo.abrir(args.evento)
+    if args.reiniciar:
+        vivo.reiniciar()
+    df_aforo = None
+    if args.aforo:
+        from ingesta import leer_tabla
+        with open(args.aforo, "rb") as f:
+            df_aforo = leer_tabla(f.read(), os.path.basename(args.aforo))
+
+    while True:
+        t0 = time.perf_counter()
+        nuevas = vivo.agregar_desde_archivo(args.csv)
+        linea = f"{args.evento}: +{nuevas} filas ({vivo.filas} en total, {time.perf_counter() - t0:.2f} s)"
+        if df_aforo is not None and vivo.filas:
+            res_pob = vivo.poblacion(df_aforo, categoria_principal=args.categoria)
+            linea += f" | población estimada {res_pob.get('Poblacion_estimacion', 0):,.0f}"
+        print(linea, flush=True)
+        if args.vigilar is None:
+            return 0
+        time.sleep(args.vigilar)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Formato columnar (Parquet) para los archivos de entrada.
+
+Convierte los libros Encuesta / EED / Potencial de aforo a Parquet tipado,
+guardando las columnas de residencia y motivo como categóricas (codificación
+por diccionario en Arrow). Leer el Parquet toma milisegundos frente al parseo
+del XML de un .xlsx.
+
+Uso por línea de comandos (crea un .parquet junto a cada .xlsx):
+    python formato_columnar.py data/
+    python formato_columnar.py data/Evento_2/Encuesta.xlsx
+"""
+import argparse
+import io
+import os
+import sys
+
+import pandas as pd
+
+from backend import COLUMNA_RESIDE, COLUMNA_MOTIVO
+
+COLUMNAS_CATEGORICAS = [COLUMNA_RESIDE, COLUMNA_MOTIVO]
+
+
+def _tipar(df: pd.DataFrame, columnas_categoricas=None) -> pd.DataFrame:
+    """
+    Ajusta los tipos para que el DataFrame sea serializable y compacto:
+      - residencia/motivo -> category (diccionario en Parquet).
+      - columnas object con tipos mezclados -> texto (los nulos se conservan).
+    """
+    columnas_categoricas = COLUMNAS_CATEGORICAS if columnas_categoricas is None else columnas_categoricas
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if col in columnas_categoricas:
+            df[col] = serie.astype("category")
+        elif serie.dtype == object:
+            no_nulos = serie.dropna()
+            if not no_nulos.map(type).eq(str).all():
+                df[col] = serie.where(serie.isna(), serie.astype(str))
+    # Parquet exige nombres de columna de texto
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def convertir_a_parquet(ruta_entrada, ruta_salida=None, columnas_categoricas=None) -> str:
+    """
+    Convierte un .xlsx/.csv a Parquet. Por defecto escribe el archivo
+    "sidecar" junto al original (misma ruta con extensión .parquet).
+    Retorna la ruta escrita.
+    """
+    ruta_salida = ruta_salida or ruta_sidecar(ruta_entrada)
+    if str(ruta_entrada).lower().endswith(".csv"):
+        df = pd.read_csv(ruta_entrada)
+    else:
+        df = pd.read_excel(ruta_entrada)
+    _tipar(df, columnas_categoricas).to_parquet(ruta_salida, engine="pyarrow", index=False)
+    return ruta_salida
+
+
+def ruta_sidecar(ruta) -> str:
+    return os.path.splitext(str(ruta))[0] + ".parquet"
+
+
+def leer_parquet(origen) -> pd.DataFrame:
+    """Lee un Parquet desde una ruta o desde bytes."""
+    if isinstance(origen, (bytes, bytearray)):
+        origen = io.BytesIO(origen)
+    return pd.read_parquet(origen, engine="pyarrow")
+
+
+def leer_con_sidecar(ruta) -> pd.DataFrame:
+    """
+    Lee un archivo de entrada priorizando su sidecar Parquet.
+    Si el sidecar no existe o es más viejo que el original, se regenera.
+    """
+    ruta = str(ruta)
+    if ruta.lower().endswith(".parquet"):
+        return leer_parquet(ruta)
+
+    sidecar = ruta_sidecar(ruta)
+    if not os.path.exists(sidecar) or os.path.getmtime(sidecar) < os.path.getmtime(ruta):
+        convertir_a_parquet(ruta, sidecar)
+    return leer_parquet(sidecar)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convierte los libros de entrada a Parquet.")
+    parser.add_argument("rutas", nargs="+", help="Archivos .xlsx/.csv o carpetas de eventos")
+    args = parser.parse_args(argv)
+
+    archivos = []
+    for ruta in args.rutas:
+        if os.path.isdir(ruta):
+            for raiz, _, nombres in os.walk(ruta):
+                archivos += [os.path.join(raiz, n) for n in sorted(nombres) if n.lower().endswith(".xlsx")]
+        else:
+            archivos.append(ruta)
+
+    for archivo in archivos:
+        try:
+            print(f"{archivo} -> {convertir_a_parquet(archivo)}")
+        except Exception as e:
+            print(f"{archivo}: ERROR {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
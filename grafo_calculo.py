@@ -0,0 +1,236 @@
+"""
+Grafo de etapas memoizadas para el pipeline de la app.
+
+Cada cálculo de la app (índice de la encuesta, población, estadísticos,
+efectos, desglose sectorial...) se ejecuta como una etapa con nombre. La clave
+de una etapa es un hash tipo Merkle de:
+  - el nombre de la etapa y la función que la calcula,
+  - sus parámetros (números, textos, listas, diccionarios, DataFrames...),
+  - la clave de cada etapa de la que depende (argumentos de tipo Nodo).
+
+Si la clave ya está en el grafo el resultado se reutiliza sin llamar a la
+función; así un cambio en un widget solo recalcula las etapas que dependen de
+él. Las fuentes (archivos leídos) entran con la clave que ya traen, el hash de
+su contenido.
+
+Uso:
+    grafo = GrafoCalculo()
+    ronda = grafo.ronda()                      # una por rerun de la app
+    encuesta = ronda.fuente("Encuesta", df_encuesta, clave=hash_encuesta)
+    indice = ronda.etapa("Índice", IndiceEncuesta, encuesta, col_reside, col_motivo)
+    poblacion = ronda.etapa("Población", calcular_poblacion, encuesta, aforo, ..., indice=indice)
+    poblacion.valor["Poblacion_estimacion"]
+    ronda.tabla()                              # qué se reutilizó y qué se calculó
+
+Los resultados se comparten entre reruns: no deben modificarse en el sitio.
+"""
+import hashlib
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+REUTILIZADA = "reutilizada"
+CALCULADA = "calculada"
+
+
+class Nodo:
+    """Resultado de una etapa (o fuente) junto con su clave."""
+    __slots__ = ("etapa", "valor", "clave")
+
+    def __init__(self, etapa, valor, clave):
+        self.etapa = etapa
+        self.valor = valor
+        self.clave = clave
+
+    def __repr__(self):
+        return f"Nodo({self.etapa!r}, {self.clave[:10]})"
+
+
+def _huella(valor, h):
+    """Agrega al hash `h` una representación estable de `valor`."""
+    if isinstance(valor, Nodo):
+        h.update(b"N" + valor.clave.encode())
+    elif valor is None or isinstance(valor, (bool, int, float, str, bytes, np.generic)):
+        h.update(f"{type(valor).__name__}:{valor!r};".encode())
+    elif isinstance(valor, (list, tuple)):
+        h.update(f"L{len(valor)}[".encode())
+        for v in valor:
+            _huella(v, h)
+        h.update(b"]")
+    elif isinstance(valor, dict):
+        h.update(f"D{len(valor)}{{".encode())
+        for k in sorted(valor, key=repr):
+            _huella(k, h)
+            _huella(valor[k], h)
+        h.update(b"}")
+    elif isinstance(valor, np.ndarray):
+        h.update(f"A{valor.dtype.str}{valor.shape}".encode())
+        h.update(np.ascontiguousarray(valor).tobytes() if valor.dtype != object else pickle.dumps(valor))
+    elif isinstance(valor, (pd.DataFrame, pd.Series)):
+        h.update(f"P{type(valor).__name__}{valor.shape}".encode())
+        if isinstance(valor, pd.DataFrame):
+            _huella(list(map(str, valor.columns)), h)
+        try:
+            h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+        except TypeError:
+            # Celdas no hashables (listas, dicts): se usa su serialización
+            h.update(pickle.dumps(valor))
+    else:
+        try:
+            h.update(b"O" + pickle.dumps(valor, protocol=4))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            raise TypeError(
+                f"No se puede calcular la clave de un parámetro {type(valor).__name__}; "
+                "pásalo como fuente (ronda.fuente) con una clave propia."
+            ) from e
+
+
+def _nombre_funcion(funcion) -> str:
+    return f"{getattr(funcion, '__module__', '')}.{getattr(funcion, '__qualname__', repr(funcion))}"
+
+
+def _desenvolver(valor):
+    return valor.valor if isinstance(valor, Nodo) else valor
+
+
+def _tamano(valor, vistos=None) -> int:
+    """
+    Bytes aproximados de un resultado, con la misma medida que CacheIngesta
+    (memory_usage deep) para los DataFrames que retiene, p. ej. el de un IndiceEncuesta.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamano(k, vistos) + _tamano(v, vistos) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(_tamano(v, vistos) for v in valor)
+    atributos = getattr(valor, "__dict__", None)
+    if atributos is not None:
+        return sys.getsizeof(valor) + _tamano(atributos, vistos)
+    return sys.getsizeof(valor)
+
+
+class GrafoCalculo:
+    """
+    Resultados memoizados por clave de etapa, con desalojo LRU.
+
+    Límites:
+        max_bytes:    memoria aproximada de los resultados (ver `_tamano`); cuenta
+                      también los DataFrames de entrada que un resultado retiene.
+        max_entradas: número máximo de resultados.
+
+    Es seguro compartirlo entre sesiones: cada rerun usa su propia `Ronda`
+    para registrar qué etapas se reutilizaron.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 ** 2, max_entradas=128):
+        self.max_bytes = int(max_bytes)
+        self.max_entradas = max_entradas
+        self._resultados = OrderedDict()  # clave -> (valor, bytes)
+        self._bytes_total = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def ronda(self):
+        return Ronda(self)
+
+    def _buscar(self, clave):
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                self.aciertos += 1
+                return True, self._resultados[clave][0]
+            self.fallos += 1
+            return False, None
+
+    def _guardar(self, clave, valor):
+        # Se mide fuera del lock: memory_usage(deep) recorre las columnas de texto
+        tam = _tamano(valor)
+        with self._lock:
+            anterior = self._resultados.pop(clave, None)
+            if anterior is not None:
+                self._bytes_total -= anterior[1]
+            self._resultados[clave] = (valor, tam)
+            self._bytes_total += tam
+            # Nunca se desaloja el resultado recién guardado (el último del OrderedDict)
+            while len(self._resultados) > 1 and (
+                self._bytes_total > self.max_bytes or len(self._resultados) > self.max_entradas
+            ):
+                self._bytes_total -= self._resultados.popitem(last=False)[1][1]
+
+    def resumen(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._resultados),
+                "MB": round(self._bytes_total / 1024 ** 2, 2),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+            }
+
+    def limpiar(self):
+        with self._lock:
+            self._resultados.clear()
+            self._bytes_total = 0
+
+
+class Ronda:
+    """Ejecución de las etapas de un rerun, con su registro de aciertos y fallos."""
+
+    def __init__(self, grafo):
+        self.grafo = grafo
+        self.registro = []
+
+    def fuente(self, nombre, valor, clave, reutilizada=None):
+        """
+        Entrada externa (archivo ya leído) con su propia clave, p. ej. el hash
+        del contenido. `reutilizada` indica si la lectura salió de caché.
+        """
+        self.registro.append({
+            "etapa": nombre,
+            "estado": "fuente" if reutilizada is None else (REUTILIZADA if reutilizada else CALCULADA),
+            "segundos": 0.0,
+            "clave": str(clave)[:10],
+        })
+        return Nodo(nombre, valor, f"fuente:{nombre}:{clave}")
+
+    def etapa(self, nombre, funcion, *args, **kwargs):
+        """
+        Ejecuta `funcion(*args, **kwargs)` o reutiliza su resultado. Los argumentos
+        de tipo Nodo se reemplazan por su valor y aportan su clave.
+        """
+        h = hashlib.sha256()
+        _huella((nombre, _nombre_funcion(funcion)), h)
+        _huella(list(args), h)
+        _huella(kwargs, h)
+        clave = h.hexdigest()
+
+        t0 = time.perf_counter()
+        encontrado, valor = self.grafo._buscar(clave)
+        if not encontrado:
+            valor = funcion(*map(_desenvolver, args), **{k: _desenvolver(v) for k, v in kwargs.items()})
+            self.grafo._guardar(clave, valor)
+        self.registro.append({
+            "etapa": nombre,
+            "estado": REUTILIZADA if encontrado else CALCULADA,
+            "segundos": time.perf_counter() - t0,
+            "clave": clave[:10],
+        })
+        return Nodo(nombre, valor, clave)
+
+    def tabla(self) -> pd.DataFrame:
+        """Registro de la ronda: etapa, estado (reutilizada/calculada/fuente), segundos y clave."""
+        return pd.DataFrame(self.registro, columns=["etapa", "estado", "segundos", "clave"])
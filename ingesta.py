@@ -0,0 +1,253 @@
+"""
+Capa de ingesta para los archivos de entrada (Encuesta, Potencial de aforo, EED).
+
+Cada archivo se identifica por el hash SHA-256 de sus bytes. El DataFrame
+parseado se guarda una sola vez en una caché acotada (por memoria ocupada y
+por antigüedad) que comparten todos los reruns y todas las sesiones de la app,
+así que `pd.read_excel` solo se ejecuta cuando llega un contenido nuevo.
+
+Los DataFrames devueltos por la caché son compartidos: tratarlos como de solo
+lectura (las funciones de backend.py filtran, nunca modifican in-place).
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+
+# Códigos de error de Excel: en modo values_only llegan como texto; pandas los lee como NaN
+_ERRORES_EXCEL = {"#N/A", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#NULL!"}
+
+
+def hash_contenido(contenido: bytes) -> str:
+    """Hash SHA-256 (hex) de los bytes de un archivo."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class ArchivoLocal(io.BytesIO):
+    """
+    Archivo en disco con la interfaz de un archivo subido en Streamlit
+    (name, file_id, getvalue), para usar archivos locales donde la app espera una subida.
+    """
+
+    def __init__(self, ruta):
+        with open(ruta, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(ruta)
+        self.file_id = f"local:{os.path.abspath(ruta)}:{os.stat(ruta).st_mtime_ns}"
+
+
+def leer_tabla(contenido: bytes, nombre: str) -> pd.DataFrame:
+    """
+    Parsea los bytes de un archivo según su extensión (.xlsx, .parquet o .csv).
+    """
+    if nombre.lower().endswith(".xlsx"):
+        return pd.read_excel(io.BytesIO(contenido))
+    if nombre.lower().endswith(".parquet"):
+        return pd.read_parquet(io.BytesIO(contenido), engine="pyarrow")
+    return pd.read_csv(io.BytesIO(contenido))
+
+
+def columnas_necesarias(encabezados) -> list:
+    """
+    Columnas de la Encuesta que usa el cálculo: residencia, motivo y las que
+    resuelve `extraer_columnas_validas` sobre los encabezados.
+    """
+    from backend import COLUMNA_RESIDE, COLUMNA_MOTIVO, extraer_columnas_validas
+
+    mapeo = extraer_columnas_validas(pd.DataFrame(columns=list(encabezados)))
+    necesarias = []
+    for col in [COLUMNA_RESIDE, COLUMNA_MOTIVO, *mapeo.values()]:
+        if col is not None and col not in necesarias:
+            necesarias.append(col)
+    return necesarias
+
+
+def _convertir_celda(valor):
+    # Misma conversión que el lector openpyxl de pandas
+    if valor is None:
+        return ""
+    if type(valor) is float:
+        entero = int(valor)
+        return entero if entero == valor else valor
+    if type(valor) is str and valor in _ERRORES_EXCEL:
+        return np.nan
+    return valor
+
+
+def leer_excel_selectivo(contenido: bytes, columnas=None) -> pd.DataFrame:
+    """
+    Lee la primera hoja de un .xlsx cargando solo `columnas`.
+
+    Recorre el libro con openpyxl en modo read-only y convierte únicamente las
+    celdas de las columnas pedidas; el resto de cada fila se descarta sin
+    procesar. Si `columnas` es None se usan `columnas_necesarias(encabezados)`.
+    El resultado coincide con `pd.read_excel(...)[columnas]` (mismos nombres de
+    columna, tipos y filas).
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True, keep_links=False)
+    try:
+        hoja = libro.worksheets[0]
+        hoja.reset_dimensions()
+        filas = hoja.iter_rows(values_only=True)
+
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return pd.DataFrame()
+
+        # Nombres tal como los deja pandas (Unnamed: i, duplicados con sufijo .1, ...)
+        fila_encabezado = [_convertir_celda(v) for v in encabezado]
+        while fila_encabezado and fila_encabezado[-1] == "":
+            fila_encabezado.pop()
+        nombres = TextParser([fila_encabezado], header=0).read().columns.tolist()
+
+        if columnas is None:
+            columnas = columnas_necesarias(nombres)
+        posiciones = [i for i, nombre in enumerate(nombres) if nombre in set(columnas)]
+        nombres_sel = [nombres[i] for i in posiciones]
+
+        datos = []
+        ultima_con_datos = -1
+        ancho = len(encabezado)
+        for fila in filas:
+            # Una fila cuenta si tiene algún valor en cualquier columna (como en pandas)
+            if fila.count(None) != len(fila):
+                ultima_con_datos = len(datos)
+            largo = len(fila)
+            datos.append([_convertir_celda(fila[i]) if i < largo else "" for i in posiciones])
+            ancho = max(ancho, largo)
+        datos = datos[: ultima_con_datos + 1]
+    finally:
+        libro.close()
+
+    if not datos:
+        return pd.DataFrame(columns=nombres_sel)
+    return TextParser(datos, names=nombres_sel, header=None, skip_blank_lines=False).read()
+
+
+def leer_tabla_selectiva(contenido: bytes, nombre: str, columnas=None) -> pd.DataFrame:
+    """
+    Variante de `leer_tabla` que carga solo las columnas necesarias de la Encuesta.
+    """
+    if nombre.lower().endswith(".xlsx"):
+        return leer_excel_selectivo(contenido, columnas)
+    if nombre.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        encabezados = pq.read_schema(io.BytesIO(contenido)).names
+        columnas = columnas or columnas_necesarias(encabezados)
+        return pd.read_parquet(io.BytesIO(contenido), engine="pyarrow", columns=columnas)
+
+    encabezados = pd.read_csv(io.BytesIO(contenido), nrows=0).columns
+    columnas = columnas or columnas_necesarias(encabezados)
+    return pd.read_csv(io.BytesIO(contenido), usecols=lambda c: c in set(columnas))
+
+
+class CacheIngesta:
+    """
+    Caché LRU de DataFrames parseados, indexada por hash de contenido.
+
+    Límites:
+        max_bytes:    memoria total aproximada (memory_usage deep) de los DataFrames.
+        max_edad_s:   segundos que una entrada puede vivir sin ser usada.
+        max_entradas: número máximo de archivos en caché.
+
+    Es segura entre hilos (Streamlit atiende cada sesión en un hilo propio).
+    """
+
+    def __init__(self, max_bytes=512 * 1024 ** 2, max_edad_s=3600, max_entradas=32):
+        self.max_bytes = int(max_bytes)
+        self.max_edad_s = float(max_edad_s)
+        self.max_entradas = int(max_entradas)
+
+        self._entradas = OrderedDict()  # clave -> (df, bytes, ultimo_uso)
+        self._bytes_total = 0
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    # ----------------- API PRINCIPAL -----------------
+    def obtener(self, contenido: bytes, nombre: str, hash_archivo: str = None, lector=None):
+        """
+        Devuelve (df, info) para el archivo.
+
+        `hash_archivo` permite reutilizar un hash ya calculado (p. ej. por
+        sesión) y evitar recorrer los bytes en cada rerun.
+        `lector(contenido, nombre)` permite cambiar el parser (por defecto leer_tabla).
+        info = {"hash", "acierto", "bytes", "segundos"}.
+        """
+        clave = hash_archivo or hash_contenido(contenido)
+        lector = lector or leer_tabla
+        # El lector forma parte de la clave: el mismo archivo leído distinto es otra entrada
+        clave_cache = (clave, getattr(lector, "__qualname__", repr(lector)))
+
+        with self._lock:
+            self._purgar_vencidas()
+            entrada = self._entradas.get(clave_cache)
+            if entrada is not None:
+                df, tam, _ = entrada
+                self._entradas[clave_cache] = (df, tam, time.monotonic())
+                self._entradas.move_to_end(clave_cache)
+                self.aciertos += 1
+                return df, {"hash": clave, "acierto": True, "bytes": tam, "segundos": 0.0}
+
+        # Parseo fuera del lock para no bloquear a otras sesiones
+        t0 = time.perf_counter()
+        df = lector(contenido, nombre)
+        segundos = time.perf_counter() - t0
+        tam = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self.fallos += 1
+            anterior = self._entradas.pop(clave_cache, None)
+            if anterior is not None:
+                self._bytes_total -= anterior[1]
+            self._entradas[clave_cache] = (df, tam, time.monotonic())
+            self._bytes_total += tam
+            self._desalojar_por_tamano()
+
+        return df, {"hash": clave, "acierto": False, "bytes": tam, "segundos": segundos}
+
+    def resumen(self) -> dict:
+        """Contadores para mostrar en la UI."""
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "MB en caché": round(self._bytes_total / 1024 ** 2, 2),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+            }
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes_total = 0
+
+    # ----------------- AUXILIARES (requieren el lock) -----------------
+    def _purgar_vencidas(self):
+        ahora = time.monotonic()
+        for clave in [k for k, (_, _, uso) in self._entradas.items() if ahora - uso > self.max_edad_s]:
+            self._quitar(clave)
+
+    def _desalojar_por_tamano(self):
+        # Nunca se desaloja la entrada recién insertada (la última del OrderedDict)
+        while len(self._entradas) > 1 and (
+            self._bytes_total > self.max_bytes or len(self._entradas) > self.max_entradas
+        ):
+            self._quitar(next(iter(self._entradas)))
+
+    def _quitar(self, clave):
+        _, tam, _ = self._entradas.pop(clave)
+        self._bytes_total -= tam
+        self.desalojos += 1
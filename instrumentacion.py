@@ -0,0 +1,226 @@
+"""
+Instrumentación opcional de las funciones de cálculo (tiempo, filas y memoria).
+
+Las funciones decoradas con `@instrumentar` registran, mientras la
+instrumentación está activa, una traza por llamada con:
+  - el tiempo de pared,
+  - las filas procesadas (según el argumento que indique el decorador),
+  - el pico de memoria asignada durante la llamada (tracemalloc), si se pide.
+
+Desactivada (lo normal) el envoltorio solo consulta una variable del módulo y
+llama a la función original. Las trazas se guardan en memoria (las últimas
+MAX_TRAZAS) y se exportan como líneas JSON.
+
+tracemalloc mide todo el proceso: con varias sesiones de la app calculando a
+la vez, el pico de una llamada puede incluir memoria de otra. Por eso se
+cuentan sus usos (cada sesión que lo pidió y cada llamada que mide) y solo se
+detiene cuando lo suelta el último.
+
+Cada quien activa y desactiva con su propio `sesion`: la instrumentación sigue
+activa mientras alguna sesión la tenga pedida.
+
+Uso:
+    import instrumentacion
+    instrumentacion.activar(memoria=True)
+    calcular_poblacion(...)                    # cualquier función decorada
+    instrumentacion.trazas()                   # [{"funcion", "segundos", "filas", "pico_mb", ...}]
+    instrumentacion.exportar_jsonl("trazas.jsonl")
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+MAX_TRAZAS = 2000
+
+_ACTIVA = False
+_MEMORIA = False
+_SESIONES = {}               # sesion -> mide memoria (bool)
+_USOS_TRACEMALLOC = 0        # sesiones con memoria + llamadas midiendo en este momento
+_TRACEMALLOC_PROPIO = False  # True si lo arrancó este módulo (si no, nunca se detiene)
+_TRAZAS = deque(maxlen=MAX_TRAZAS)
+_LOCK = threading.Lock()
+_LOCK_MEMORIA = threading.Lock()
+_LOCAL = threading.local()  # pila de llamadas instrumentadas en curso (por hilo)
+SESION_LOCAL = "local"      # quien activa sin indicar sesión (scripts, benchmarks)
+
+
+# ----------------- ACTIVACIÓN -----------------
+
+def _retener_tracemalloc():
+    global _USOS_TRACEMALLOC, _TRACEMALLOC_PROPIO
+    with _LOCK_MEMORIA:
+        if _USOS_TRACEMALLOC == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _TRACEMALLOC_PROPIO = True
+        _USOS_TRACEMALLOC += 1
+
+
+def _liberar_tracemalloc():
+    global _USOS_TRACEMALLOC, _TRACEMALLOC_PROPIO
+    with _LOCK_MEMORIA:
+        _USOS_TRACEMALLOC -= 1
+        if _USOS_TRACEMALLOC == 0 and _TRACEMALLOC_PROPIO:
+            tracemalloc.stop()
+            _TRACEMALLOC_PROPIO = False
+
+
+def _actualizar_estado():
+    global _ACTIVA, _MEMORIA
+    _ACTIVA = bool(_SESIONES)
+    _MEMORIA = any(_SESIONES.values())
+
+
+def activar(memoria=False, sesion=SESION_LOCAL):
+    """
+    Empieza a registrar trazas para `sesion`; con memoria=True mide además el pico
+    con tracemalloc (más lento). Volver a llamarla cambia la opción de memoria.
+    """
+    memoria = bool(memoria)
+    with _LOCK:
+        anterior = _SESIONES.get(sesion, False)
+        _SESIONES[sesion] = memoria
+        _actualizar_estado()
+    if memoria and not anterior:
+        _retener_tracemalloc()
+    elif anterior and not memoria:
+        _liberar_tracemalloc()
+
+
+def desactivar(sesion=SESION_LOCAL):
+    """Suelta lo que pidió `sesion`; sigue activa si otra sesión la tiene pedida."""
+    with _LOCK:
+        if sesion not in _SESIONES:
+            return
+        memoria = _SESIONES.pop(sesion)
+        _actualizar_estado()
+    if memoria:
+        _liberar_tracemalloc()
+
+
+def activa(sesion=None) -> bool:
+    """True si alguna sesión la tiene activa (o, con `sesion`, si esa sesión la pidió)."""
+    return _ACTIVA if sesion is None else sesion in _SESIONES
+
+
+def mide_memoria(sesion=None) -> bool:
+    if sesion is None:
+        return _ACTIVA and _MEMORIA
+    return _SESIONES.get(sesion, False)
+
+
+# ----------------- DECORADOR -----------------
+
+def _contar_filas(filas, firma, args, kwargs):
+    """Filas procesadas: len() del argumento llamado `filas`, o filas(argumentos) si es una función."""
+    if filas is None:
+        return None
+    try:
+        argumentos = firma.bind(*args, **kwargs).arguments
+        if callable(filas):
+            return int(filas(argumentos))
+        valor = argumentos.get(filas)
+        return None if valor is None else len(valor)
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+def _inicio_memoria(pila):
+    """Marca el inicio de una medición de memoria. Retorna el marco de la llamada."""
+    # La llamada retiene tracemalloc: si la sesión lo suelta a mitad, no se detiene
+    _retener_tracemalloc()
+    actual, pico_previo = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    marco = {"base": actual, "pico_previo": pico_previo, "pico_hijos": 0}
+    pila.append(marco)
+    return marco
+
+
+def _fin_memoria(pila, marco) -> float:
+    """Pico (MB) de la llamada sobre su memoria inicial; conserva el pico para la llamada externa."""
+    pico = max(tracemalloc.get_traced_memory()[1], marco["pico_hijos"])
+    pila.pop()
+    if pila:
+        # reset_peak() borró el pico que llevaba la llamada externa: se le devuelve
+        pila[-1]["pico_hijos"] = max(pila[-1]["pico_hijos"], marco["pico_previo"], pico)
+    _liberar_tracemalloc()
+    return max(pico - marco["base"], 0) / 1024 ** 2
+
+
+def instrumentar(etapa=None, filas=None):
+    """
+    Decorador: registra una traza por llamada cuando la instrumentación está activa.
+
+    `etapa` es el nombre de la traza (por defecto el de la función) y `filas`
+    el nombre del argumento cuyo len() son las filas procesadas, o una función
+    que recibe los argumentos ligados (dict) y retorna el número de filas.
+    """
+    def decorador(funcion):
+        nombre = etapa or funcion.__name__
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        def envoltorio(*args, **kwargs):
+            if not _ACTIVA:
+                return funcion(*args, **kwargs)
+
+            pila = getattr(_LOCAL, "pila", None)
+            if pila is None:
+                pila = _LOCAL.pila = []
+            traza = {
+                "funcion": nombre,
+                "inicio": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "nivel": len(pila),
+                "filas": _contar_filas(filas, firma, args, kwargs),
+            }
+            marco = _inicio_memoria(pila) if _MEMORIA else None
+            if marco is None:
+                pila.append(None)
+            t0 = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                traza["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                traza["segundos"] = time.perf_counter() - t0
+                if marco is not None:
+                    traza["pico_mb"] = _fin_memoria(pila, marco)
+                else:
+                    pila.pop()
+                    traza["pico_mb"] = None
+                with _LOCK:
+                    _TRAZAS.append(traza)
+
+        return envoltorio
+    return decorador
+
+
+# ----------------- TRAZAS -----------------
+
+def trazas() -> list:
+    """Copia de las trazas registradas (de la más antigua a la más reciente)."""
+    with _LOCK:
+        return list(_TRAZAS)
+
+
+def limpiar():
+    with _LOCK:
+        _TRAZAS.clear()
+
+
+def a_jsonl(registros=None) -> str:
+    """Trazas como líneas JSON (una por llamada)."""
+    registros = trazas() if registros is None else registros
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros)
+
+
+def exportar_jsonl(ruta, registros=None) -> int:
+    """Agrega las trazas a `ruta` (JSON lines). Retorna cuántas se escribieron."""
+    registros = trazas() if registros is None else registros
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(a_jsonl(registros))
+    return len(registros)
@@ -0,0 +1,213 @@
+"""
+Motor insumo-producto (Leontief) a partir del archivo de multiplicadores.
+
+Acepta dos formatos de archivo:
+  - Matriz de coeficientes técnicos: columna C_Sector (y opcionalmente el
+    nombre del sector) más una columna por código de sector con a_ij.
+  - Vector de multiplicadores (como data/Multiplicadores.xlsx): C_Sector,
+    Sectores y una columna "Multiplicador ...". Se interpreta como una matriz
+    diagonal con a_ii = 1 - 1/m_i, de modo que (I - A)^-1 reproduce
+    exactamente el multiplicador de cada sector.
+
+La factorización LU dispersa de (I - A) se calcula una sola vez por contenido
+de archivo (hash SHA-256) y se reutiliza para propagar cualquier número de
+vectores de demanda: producción = (I - A)^-1 · demanda.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from backend import codigo_sector
+from ingesta import hash_contenido, leer_tabla
+
+COLUMNA_CODIGO = "C_Sector"
+
+# Motores ya factorizados, por hash de archivo
+_MOTORES = OrderedDict()
+_MOTORES_MAX = 8
+_MOTORES_LOCK = threading.Lock()
+
+
+class MotorLeontief:
+    """
+    Matriz de coeficientes técnicos A con la factorización LU de (I - A) en caché.
+
+    Atributos:
+        codigos: códigos de sector (orden de filas/columnas de A).
+        nombres: nombre de cada sector (o el código como texto si no viene).
+        A:       matriz dispersa (CSC) de coeficientes técnicos.
+        hash_archivo: hash del archivo de origen (None si se construyó en memoria).
+    """
+
+    def __init__(self, codigos, nombres, A, hash_archivo=None):
+        from scipy import sparse
+        from scipy.sparse.linalg import splu
+
+        self.codigos = list(codigos)
+        self.nombres = list(nombres)
+        self.A = sparse.csc_matrix(A, dtype=float)
+        self.hash_archivo = hash_archivo
+
+        n = len(self.codigos)
+        if self.A.shape != (n, n):
+            raise ValueError(f"La matriz de coeficientes debe ser {n}x{n}; llegó {self.A.shape}.")
+        self._posicion = {c: i for i, c in enumerate(self.codigos)}
+        try:
+            self._lu = splu((sparse.identity(n, format="csc") - self.A).tocsc())
+        except RuntimeError as e:
+            raise ValueError(f"(I - A) no es invertible: {e}") from e
+
+    @property
+    def n(self):
+        return len(self.codigos)
+
+    # ----------------- CONSTRUCCIÓN -----------------
+    @classmethod
+    def desde_tabla(cls, df, hash_archivo=None):
+        """Construye el motor desde un DataFrame en formato matriz o vector."""
+        if COLUMNA_CODIGO not in df.columns:
+            raise ValueError(f"El archivo de multiplicadores debe tener la columna '{COLUMNA_CODIGO}'.")
+        df = df.dropna(subset=[COLUMNA_CODIGO])
+        codigos = [codigo_sector(c) for c in df[COLUMNA_CODIGO]]
+        if len(set(codigos)) != len(codigos):
+            raise ValueError(f"Hay códigos repetidos en '{COLUMNA_CODIGO}'.")
+
+        col_nombre = next((c for c in df.columns if str(c).strip().lower() in ("sectores", "sector")), None)
+        nombres = df[col_nombre].astype(str).tolist() if col_nombre else [str(c) for c in codigos]
+
+        # Formato matriz: una columna por código de sector
+        por_codigo = {codigo_sector(c): c for c in df.columns if c not in (COLUMNA_CODIGO, col_nombre)}
+        if codigos and all(c in por_codigo for c in codigos):
+            A = df[[por_codigo[c] for c in codigos]].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+            return cls(codigos, nombres, A.to_numpy(dtype=float), hash_archivo)
+
+        # Formato vector: multiplicador por sector -> A diagonal
+        col_mult = next((c for c in df.columns if "multiplicador" in str(c).lower()), None)
+        if col_mult is None:
+            raise ValueError(
+                "No se reconoce el formato: se esperaba una columna por código de sector "
+                "o una columna 'Multiplicador ...'."
+            )
+        m = pd.to_numeric(df[col_mult], errors="coerce").fillna(1.0).to_numpy(dtype=float)
+        if (m <= 0).any():
+            raise ValueError("Los multiplicadores deben ser positivos.")
+        from scipy import sparse
+        return cls(codigos, nombres, sparse.diags(1.0 - 1.0 / m, format="csc"), hash_archivo)
+
+    # ----------------- PROPAGACIÓN -----------------
+    def vector_demanda(self, codigos, valores):
+        """
+        Suma `valores` en la posición de cada código de sector.
+
+        Retorna (vector de tamaño n, lista de códigos que no están en la matriz).
+        """
+        demanda = np.zeros(self.n)
+        sin_match = []
+        for codigo, valor in zip(codigos, valores):
+            i = self._posicion.get(codigo_sector(codigo))
+            if i is None:
+                sin_match.append(codigo)
+            elif pd.notna(valor):
+                demanda[i] += float(valor)
+        return demanda, sin_match
+
+    def propagar(self, demanda):
+        """
+        Producción total (I - A)^-1 · demanda.
+
+        `demanda` puede ser un vector (n,) o una matriz (n, k) con un escenario
+        por columna: todos se resuelven contra la misma factorización.
+        """
+        demanda = np.asarray(demanda, dtype=float)
+        if demanda.shape[0] != self.n:
+            raise ValueError(f"La demanda debe tener {self.n} filas; llegó {demanda.shape[0]}.")
+        return self._lu.solve(np.ascontiguousarray(demanda))
+
+    def multiplicadores(self):
+        """Multiplicador de producción por sector: sumas por columna de (I - A)^-1."""
+        return self._lu.solve(np.ones(self.n), trans="T")
+
+
+# ----------------- CACHÉ POR CONTENIDO -----------------
+def obtener_motor(contenido: bytes, nombre: str, hash_archivo: str = None):
+    """
+    Devuelve el MotorLeontief del archivo. Solo se lee y factoriza cuando el
+    contenido (hash) no se ha visto antes.
+    """
+    clave = hash_archivo or hash_contenido(contenido)
+    with _MOTORES_LOCK:
+        motor = _MOTORES.get(clave)
+        if motor is not None:
+            _MOTORES.move_to_end(clave)
+            return motor
+
+    motor = MotorLeontief.desde_tabla(leer_tabla(contenido, nombre), hash_archivo=clave)
+    with _MOTORES_LOCK:
+        _MOTORES[clave] = motor
+        while len(_MOTORES) > _MOTORES_MAX:
+            _MOTORES.popitem(last=False)
+    return motor
+
+
+def cargar_motor(ruta):
+    """obtener_motor para un archivo en disco."""
+    with open(ruta, "rb") as f:
+        return obtener_motor(f.read(), str(ruta))
+
+
+# ----------------- INTEGRACIÓN CON EL DESGLOSE SECTORIAL -----------------
+def propagar_desglose(motor, df_eed, df_sectorial, col_codigo=COLUMNA_CODIGO, col_sector="Sector_EED"):
+    """
+    Propaga por la matriz los vectores de demanda del desglose sectorial.
+
+    Las demandas salen de `calcular_desglose_por_sectores`: 'Efecto directo'
+    y 'Efecto indirecto' por sector, ubicados en la matriz con el código
+    `col_codigo` del EED. Ambos vectores se resuelven juntos (dos escenarios).
+
+    Retorna:
+      - DataFrame por sector de la matriz (con fila Total):
+          ['C_Sector','Sector','Demanda directa','Demanda indirecta',
+           'Producción total','Efecto inducido neto']
+      - meta: {"hash_archivo", "sectores_sin_codigo", "codigos_sin_match"}
+    """
+    if col_codigo not in df_eed.columns:
+        raise ValueError(f"El EED debe tener la columna '{col_codigo}' para ubicar los sectores en la matriz.")
+
+    # Nombre de sector del desglose -> código (primer código visto para ese nombre)
+    pares = df_eed[[col_sector, col_codigo]].dropna(subset=[col_codigo])
+    codigo_por_sector = dict(zip(pares[col_sector].astype(str)[::-1], pares[col_codigo][::-1]))
+
+    filas = df_sectorial[df_sectorial["Sector"] != "Total"]
+    nombres = filas["Sector"].astype(str).tolist()
+    sin_codigo = [s for s in nombres if s not in codigo_por_sector]
+    con_codigo = [s in codigo_por_sector for s in nombres]
+    codigos = [codigo_por_sector[s] for s in nombres if s in codigo_por_sector]
+
+    directa, sin_match = motor.vector_demanda(codigos, filas["Efecto directo"][con_codigo])
+    indirecta, _ = motor.vector_demanda(codigos, filas["Efecto indirecto"][con_codigo])
+    produccion = motor.propagar(np.column_stack([directa, indirecta])).sum(axis=1)
+
+    df_res = pd.DataFrame({
+        "C_Sector": motor.codigos,
+        "Sector": motor.nombres,
+        "Demanda directa": directa,
+        "Demanda indirecta": indirecta,
+        "Producción total": produccion,
+    })
+    df_res["Efecto inducido neto"] = df_res["Producción total"] - df_res["Demanda directa"] - df_res["Demanda indirecta"]
+
+    fila_total = pd.DataFrame({
+        "C_Sector": [None],
+        "Sector": ["Total"],
+        **{c: [df_res[c].sum()] for c in df_res.columns[2:]},
+    })
+    df_res = pd.concat([df_res, fila_total], ignore_index=True)
+
+    meta = {
+        "hash_archivo": motor.hash_archivo,
+        "sectores_sin_codigo": sin_codigo,
+        "codigos_sin_match": sin_match,
+    }
+    return df_res, meta
@@ -0,0 +1,383 @@
+"""
+Ejecución por lotes (sin Streamlit) de varios eventos.
+
+Cada carpeta de evento contiene sus archivos de Encuesta, Potencial de aforo y
+EED (.xlsx, .parquet o .csv). El runner busca esas carpetas, ejecuta el
+pipeline completo de backend.py con los parámetros de un archivo JSON y
+reparte los eventos entre procesos. El resultado es una tabla consolidada con
+una fila por evento; si un evento falla queda registrado con su error y el
+resto continúa.
+
+Uso:
+    python lote.py data/ --parametros parametros_lote.json --salida resultados.csv
+    python lote.py data/ --almacen            # reutiliza resultados ya calculados
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backend import (
+    COLUMNA_RESIDE,
+    COLUMNA_MOTIVO,
+    IndiceEncuesta,
+    leer_motivos_conocidos,
+    guardar_motivos_conocidos,
+    hash_motivos_conocidos,
+    extraer_columnas_validas,
+    detectar_categorias_motivo,
+    calcular_poblacion,
+    evaluar_distribuciones,
+    calcular_efecto_economico_indirecto,
+    calcular_desglose_por_sectores,
+)
+from ingesta import hash_contenido, leer_tabla
+from almacen_resultados import MODULOS_CALCULO, RUTA_ALMACEN, AlmacenResultados
+
+# Nombre base (sin extensión, en minúsculas) de cada archivo de un evento
+ARCHIVOS_EVENTO = {
+    "encuesta": "encuesta",
+    "aforo": "potencial de aforo",
+    "eed": "eed",
+}
+EXTENSIONES = (".parquet", ".xlsx", ".csv")  # en orden de preferencia (sidecar al día primero)
+
+# Parámetros por defecto: los mismos valores iniciales que la app
+PARAMETROS_DEFECTO = {
+    "poblacion": {
+        "columna_reside": COLUMNA_RESIDE,
+        "columna_motivo": COLUMNA_MOTIVO,
+        "categoria_principal": ["venir a los eventos religiosos"],
+        "peso_principal_no_local": 1.0,
+        "peso_otros_no_local": 0.5,
+        "peso_principal_local": 1.0,
+        "peso_otros_local": 0.5,
+        "activar_factor_correccion": False,
+        "factor_pt_n_sobre_rho": None,
+        "tipo_poblacion": "no_local",
+        "armonizar_motivos": False,
+        # Diccionario de motivos compartido entre eventos (JSON); None = cada evento por separado
+        "ruta_motivos": None,
+    },
+    "efecto": {
+        "multiplicador": 1.0,
+        "multiplicadores": {"alojamiento": 1.0, "alimentacion": 1.0, "transporte": 1.0},
+        "col_aloj": "gasto_alojamiento",
+        "col_alim": "gasto_alimentacion",
+        "col_trans": "gasto_transporte",
+        "col_dias": "dias_estadia",
+        "extras": [],
+        "n_eventos": None,
+    },
+    "sectores": {
+        "col_sector": "Sector_EED",
+        "col_valor": "V_EED",
+        "dias_usado": None,
+        "config_sectores": [],
+    },
+    "eventos": {},
+}
+
+
+# ----------------- DESCUBRIMIENTO -----------------
+def _archivos_de(carpeta):
+    """Devuelve {"encuesta": ruta, "aforo": ruta, "eed": ruta} o None si falta alguno."""
+    try:
+        nombres = os.listdir(carpeta)
+    except OSError:
+        return None
+    encontrados = {}
+    for clave, base in ARCHIVOS_EVENTO.items():
+        candidatos = [
+            os.path.join(carpeta, n)
+            for ext in EXTENSIONES for n in nombres if n.lower() == base + ext
+        ]
+        if not candidatos:
+            continue
+        # El Parquet es el sidecar de formato_columnar: se ignora si el original es más nuevo
+        if candidatos[0].lower().endswith(".parquet") and len(candidatos) > 1:
+            if any(os.path.getmtime(c) > os.path.getmtime(candidatos[0]) for c in candidatos[1:]):
+                candidatos.pop(0)
+        encontrados[clave] = candidatos[0]
+    return encontrados if len(encontrados) == len(ARCHIVOS_EVENTO) else None
+
+
+def descubrir_eventos(raices):
+    """Recorre las carpetas raíz y devuelve [(nombre_evento, carpeta, archivos)]."""
+    eventos = []
+    for raiz in raices:
+        for carpeta, subcarpetas, _ in os.walk(raiz):
+            subcarpetas.sort()
+            archivos = _archivos_de(carpeta)
+            if archivos:
+                nombre = os.path.relpath(carpeta, os.path.dirname(os.path.abspath(raiz)))
+                eventos.append((nombre, carpeta, archivos))
+    return eventos
+
+
+# ----------------- PARÁMETROS -----------------
+def cargar_parametros(ruta=None):
+    """Combina el JSON del usuario con los valores por defecto (por sección)."""
+    parametros = json.loads(json.dumps(PARAMETROS_DEFECTO))
+    if ruta:
+        with open(ruta, encoding="utf-8") as f:
+            usuario = json.load(f)
+        for seccion, valores in usuario.items():
+            if isinstance(valores, dict) and seccion in parametros:
+                parametros[seccion].update(valores)
+            else:
+                parametros[seccion] = valores
+    return parametros
+
+
+def _parametros_evento(parametros, nombre):
+    """Aplica las sobrescrituras de `eventos[nombre]` (por nombre completo o de carpeta)."""
+    propios = parametros.get("eventos", {})
+    extra = propios.get(nombre) or propios.get(os.path.basename(nombre)) or {}
+    resultado = {}
+    for seccion in ("poblacion", "efecto", "sectores"):
+        resultado[seccion] = {**parametros[seccion], **extra.get(seccion, {})}
+    return resultado
+
+
+# ----------------- PIPELINE POR EVENTO -----------------
+def _leer_bytes(archivos):
+    """{"encuesta": bytes, "aforo": bytes, "eed": bytes} de los archivos del evento."""
+    contenidos = {}
+    for clave, ruta in archivos.items():
+        with open(ruta, "rb") as f:
+            contenidos[clave] = f.read()
+    return contenidos
+
+
+def _usa_motivos_conocidos(p_pob):
+    return bool(p_pob.get("armonizar_motivos")) and bool(p_pob.get("ruta_motivos"))
+
+
+def _calcular_evento(p, contenidos, archivos, observaciones, motivos_conocidos=None):
+    """
+    Pipeline completo con los parámetros del evento. Retorna (valores de la
+    fila, resultados para el almacén). Con `motivos_conocidos` la armonización
+    parte de ese diccionario; el ampliado va en resultados["motivos_conocidos"].
+    """
+    p_pob, p_ef, p_sec = dict(p["poblacion"]), dict(p["efecto"]), dict(p["sectores"])
+    p_pob.pop("ruta_motivos", None)
+    # modo_local y n_eventos se derivan del tipo de población y de la sección "efecto"
+    for params in (p_ef, p_sec):
+        params.pop("modo_local", None)
+    p_sec.pop("n_eventos", None)
+
+    df_encuesta, df_aforo, df_eed = (
+        leer_tabla(contenidos[clave], os.path.basename(archivos[clave])) for clave in ("encuesta", "aforo", "eed")
+    )
+
+    # Población
+    indice = IndiceEncuesta(
+        df_encuesta, p_pob["columna_reside"], p_pob["columna_motivo"],
+        armonizar=bool(p_pob.get("armonizar_motivos")), motivos_conocidos=motivos_conocidos
+    )
+    cat = p_pob.get("categoria_principal")
+    if isinstance(cat, list):
+        # Lista de preferencias: la primera presente; si ninguna, la más frecuente (como la app)
+        disponibles = detectar_categorias_motivo(df_encuesta, indice=indice).index.tolist()
+        cat = next((c for c in cat if c in disponibles), disponibles[0] if disponibles else None)
+    p_pob["categoria_principal"] = cat
+    res_pob = calcular_poblacion(df_encuesta, df_aforo, indice=indice, **p_pob)
+    if "grupo" not in res_pob:
+        raise ValueError("La encuesta no tiene respuestas válidas de residencia")
+
+    # Columnas: alias de extraer_columnas_validas o nombre real
+    mapeo = extraer_columnas_validas(df_encuesta)
+
+    def _resolver(col, rubro=None):
+        real = mapeo.get(col, col)
+        if real is None or real not in df_encuesta.columns:
+            if rubro:
+                observaciones.append(f"ATENCIÓN: columna de {rubro} '{col}' no encontrada (el rubro queda en 0)")
+            else:
+                observaciones.append(f"columna '{col}' no encontrada (se usa 0)")
+            return None
+        return real
+
+    rubros = {"col_aloj": "alojamiento", "col_alim": "alimentación", "col_trans": "transporte", "col_dias": "días"}
+    for clave, rubro in rubros.items():
+        p_ef[clave] = _resolver(p_ef[clave], rubro)
+    p_ef["extras"] = [{**ex, "col": _resolver(ex.get("col"))} for ex in p_ef.get("extras") or []]
+
+    columnas = [p_ef[c] for c in ("col_aloj", "col_alim", "col_trans", "col_dias")]
+    columnas += [ex["col"] for ex in p_ef["extras"]]
+    columnas = list(dict.fromkeys(c for c in columnas if c))
+    # Columnas no encontradas (None, ya anotadas): calcular_efecto_economico_indirecto las cuenta como 0
+    stats = evaluar_distribuciones(res_pob.filas_grupo(columnas), columnas)
+
+    modo_local = p_pob["tipo_poblacion"] != "no_local"
+    res_ind, desglose = calcular_efecto_economico_indirecto(
+        stats=stats, pnl=res_pob["Poblacion_estimacion"], modo_local=modo_local, **p_ef
+    )
+
+    # Sectores
+    dias_sec = p_sec.pop("dias_usado", None)
+    df_sec, meta = calcular_desglose_por_sectores(
+        df_eed=df_eed,
+        pnl=res_pob["Poblacion_estimacion"],
+        dias_usado=res_ind["Días de estadía (valor usado)"] if dias_sec is None else dias_sec,
+        n_eventos=p_ef.get("n_eventos"),
+        modo_local=modo_local,
+        **p_sec
+    )
+
+    directo_total = pd.to_numeric(df_eed[p_sec.get("col_valor", "V_EED")], errors="coerce").sum()
+    valores = {
+        "tipo_poblacion": res_pob["tipo"],
+        "categoria_principal": res_pob["categoria_principal"],
+        "encuestados": res_pob["total_encuestados"],
+        "total_grupo": res_pob["total_grupo"],
+        "Poblacion_estimacion": res_pob["Poblacion_estimacion"],
+        "PNL": res_pob.get("PNL", res_pob["Poblacion_estimacion"] if res_pob["tipo"] == "no_local" else np.nan),
+        "PL": res_pob.get("PL", res_pob["Poblacion_estimacion"] if res_pob["tipo"] == "local" else np.nan),
+        "Días de estadía (valor usado)": res_ind["Días de estadía (valor usado)"],
+        "Efecto directo total": float(directo_total),
+        "Efecto Indirecto Total": res_ind["Efecto Indirecto Total"],
+        "Efecto Inducido Neto Total": res_ind["Efecto Inducido Neto Total"],
+        "Efecto económico total": (
+            res_ind["Efecto Indirecto Total"] + res_ind["Efecto Inducido Neto Total"] + float(directo_total)
+        ),
+        "Efecto económico total (sectores)": meta["total_efecto_economico"],
+    }
+    resultados = {
+        "poblacion": res_pob,
+        "estadisticos": pd.DataFrame(stats).T,
+        "desglose": desglose,
+        "sectores": df_sec,
+        "fila": valores,
+        "observaciones": list(observaciones),
+        "motivos_conocidos": indice.motivos_conocidos if motivos_conocidos is not None else None,
+    }
+    return valores, resultados
+
+
+def procesar_evento(nombre, archivos, parametros, ruta_almacen=None):
+    """
+    Ejecuta el pipeline completo para un evento. Nunca lanza excepción:
+    los errores se devuelven en la fila ("estado" = "error").
+
+    Con `ruta_almacen` busca primero el resultado en el almacén SQLite (por
+    hash de los archivos y parámetros del evento) y guarda los que calcula.
+    """
+    t0 = time.perf_counter()
+    fila = {"evento": nombre, "estado": "ok", "error": "", "observaciones": ""}
+    observaciones = []
+    try:
+        p = _parametros_evento(parametros, nombre)
+        contenidos = _leer_bytes(archivos)
+        motivos_conocidos = None
+        if _usa_motivos_conocidos(p["poblacion"]):
+            motivos_conocidos = leer_motivos_conocidos(p["poblacion"]["ruta_motivos"])
+        resultados = None
+        if ruta_almacen:
+            almacen = AlmacenResultados(ruta_almacen, modulos=MODULOS_CALCULO + ("lote.py",))
+            entradas = {clave: hash_contenido(c) for clave, c in contenidos.items()}
+            # El diccionario de motivos también es una entrada: cambia las categorías
+            entradas["motivos"] = hash_motivos_conocidos(motivos_conocidos)
+            # Del diccionario cuenta el contenido (arriba), no la ruta desde la que se leyó
+            p_clave = {**p, "poblacion": {k: v for k, v in p["poblacion"].items() if k != "ruta_motivos"}}
+            resultados = almacen.obtener(entradas, p_clave)
+            if resultados is not None:
+                fila.update(resultados["fila"])
+                observaciones = resultados["observaciones"]
+                fila["almacen"] = "acierto"
+            else:
+                valores, resultados = _calcular_evento(p, contenidos, archivos, observaciones, motivos_conocidos)
+                fila.update(valores)
+                almacen.guardar(entradas, p_clave, resultados, etiqueta=nombre)
+                fila["almacen"] = "calculado"
+        else:
+            valores, resultados = _calcular_evento(p, contenidos, archivos, observaciones, motivos_conocidos)
+            fila.update(valores)
+        # También con acierto: los eventos siguientes deben ver el mismo diccionario que sin almacén
+        if motivos_conocidos is not None and resultados["motivos_conocidos"] != motivos_conocidos:
+            guardar_motivos_conocidos(p["poblacion"]["ruta_motivos"], resultados["motivos_conocidos"])
+    except Exception as e:
+        fila["estado"] = "error"
+        fila["error"] = f"{type(e).__name__}: {e}"
+        fila["traza"] = traceback.format_exc(limit=3)
+    fila["observaciones"] = "; ".join(observaciones)
+    fila["segundos"] = round(time.perf_counter() - t0, 3)
+    return fila
+
+
+# ----------------- EJECUCIÓN -----------------
+def ejecutar_lote(raices, parametros, n_procesos=None, ruta_almacen=None):
+    """
+    Procesa todos los eventos encontrados bajo `raices` y devuelve el DataFrame consolidado.
+    n_procesos=1 ejecuta en serie (útil para depurar). Con `ruta_almacen` los
+    eventos ya calculados con los mismos archivos y parámetros salen del almacén.
+    """
+    eventos = descubrir_eventos(raices)
+    if not eventos:
+        return pd.DataFrame(columns=["evento", "estado", "error"])
+
+    n_procesos = min(n_procesos or os.cpu_count() or 1, len(eventos))
+    if any(_usa_motivos_conocidos(_parametros_evento(parametros, nombre)["poblacion"]) for nombre, _, _ in eventos):
+        # El diccionario de motivos crece evento a evento: en serie y en orden, para que sea reproducible
+        n_procesos = 1
+    filas = []
+    if n_procesos == 1:
+        filas = [procesar_evento(nombre, archivos, parametros, ruta_almacen) for nombre, _, archivos in eventos]
+    else:
+        with ProcessPoolExecutor(max_workers=n_procesos) as pool:
+            futuros = {
+                pool.submit(procesar_evento, nombre, archivos, parametros, ruta_almacen): nombre
+                for nombre, _, archivos in eventos
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    filas.append(futuro.result())
+                except Exception as e:  # p. ej. el proceso murió
+                    filas.append({"evento": futuros[futuro], "estado": "error", "error": f"{type(e).__name__}: {e}"})
+
+    orden = {nombre: i for i, (nombre, _, _) in enumerate(eventos)}
+    filas.sort(key=lambda f: orden.get(f["evento"], len(orden)))
+    return pd.DataFrame(filas)
+
+
+def guardar_resultados(df, ruta):
+    ruta = str(ruta)
+    if ruta.lower().endswith(".xlsx"):
+        df.to_excel(ruta, index=False)
+    elif ruta.lower().endswith(".parquet"):
+        df.to_parquet(ruta, index=False)
+    else:
+        df.to_csv(ruta, index=False, encoding="utf-8-sig")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta el cálculo de efectos económicos para varios eventos.")
+    parser.add_argument("raices", nargs="+", help="Carpetas donde buscar eventos (p. ej. data/)")
+    parser.add_argument("--parametros", help="Archivo JSON de parámetros (ver parametros_lote.json)")
+    parser.add_argument("--salida", default="resultados_lote.csv", help="Tabla consolidada (.csv, .xlsx o .parquet)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, núcleos)")
+    parser.add_argument(
+        "--almacen", nargs="?", const=RUTA_ALMACEN, default=None, metavar="RUTA",
+        help="Reutiliza y guarda resultados en un almacén SQLite (por defecto .cache/resultados.sqlite)"
+    )
+    args = parser.parse_args(argv)
+
+    df = ejecutar_lote(args.raices, cargar_parametros(args.parametros), args.procesos, args.almacen)
+    guardar_resultados(df.drop(columns=["traza"], errors="ignore"), args.salida)
+
+    errores = df[df["estado"] != "ok"] if "estado" in df else df.iloc[0:0]
+    print(f"{len(df)} eventos procesados, {len(errores)} con error -> {args.salida}")
+    for _, fila in errores.iterrows():
+        print(f"  {fila['evento']}: {fila['error']}", file=sys.stderr)
+    return 1 if len(errores) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
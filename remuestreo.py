@@ -0,0 +1,349 @@
+"""
+Intervalos de confianza por remuestreo (bootstrap) de encuestados.
+
+Replica la cadena calcular_poblacion -> evaluar_distribuciones ->
+calcular_efecto_economico_indirecto -> calcular_desglose_por_sectores
+remuestreando filas de la encuesta con reemplazo. Cada bloque de réplicas
+trabaja sobre una matriz de índices (réplicas x encuestados), la reduce a
+pesos por encuestado y calcula conteos, medias y medianas de todas las
+réplicas del bloque con operaciones vectorizadas (las medianas salen de sumas
+acumuladas sobre valores preordenados); los bloques se reparten en un pool
+de procesos.
+
+Supuestos (documentados para el informe):
+  - El aforo, el EED, los multiplicadores y la configuración de sectores son fijos.
+  - La sugerencia Promedio/Mediana de cada columna se toma de la muestra completa
+    (no se repite la prueba de Shapiro en cada réplica).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backend import (
+    COLUMNA_RESIDE,
+    COLUMNA_MOTIVO,
+    SEG_LOCAL,
+    SEG_NO_LOCAL,
+    IndiceEncuesta,
+    calcular_poblacion,
+    evaluar_distribuciones,
+    calcular_efecto_economico_indirecto,
+    calcular_desglose_por_sectores,
+)
+
+# Datos compartidos por los procesos del pool (se cargan una vez por proceso)
+_DATOS = None
+
+
+def _preparar_datos(params_poblacion, params_efecto, indice, df_aforo, stats, sectores_base):
+    """Arma los arrays que necesita cada réplica (todo numérico, sin DataFrames)."""
+    tipo = params_poblacion.get("tipo_poblacion", "no_local")
+    grupo = {"no_local": [SEG_NO_LOCAL], "local": [SEG_LOCAL]}.get(tipo, [SEG_NO_LOCAL, SEG_LOCAL])
+
+    # Categoría principal: código fijo si viene dada; -1 => la más frecuente en cada réplica
+    cat = params_poblacion.get("categoria_principal")
+    if cat is None:
+        codigo_principal = -1
+    else:
+        codigo_principal = indice._codigo_categoria.get(cat, -2)  # -2 => no existe (total_motivo = 0)
+
+    # Rubros: (nombre, columna, multiplicador) en el mismo orden que el desglose
+    m_general = float(params_efecto.get("multiplicador", 1.0))
+    mults = params_efecto.get("multiplicadores") or {}
+    rubros = [
+        ("Alojamiento", params_efecto["col_aloj"], float(mults.get("alojamiento", m_general))),
+        ("Alimentación", params_efecto["col_alim"], float(mults.get("alimentacion", m_general))),
+        ("Transporte", params_efecto["col_trans"], float(mults.get("transporte", m_general))),
+    ]
+    for ex in params_efecto.get("extras") or []:
+        col = ex.get("col")
+        rubros.append((
+            str(ex.get("name", "Sector extra")).strip(),
+            col if col in stats else None,
+            float(ex.get("mult", m_general)),
+        ))
+
+    en_grupo = np.isin(indice.segmento, grupo)
+
+    def _ordenados(col):
+        # Filas del grupo con dato numérico, ordenadas por valor (para medianas por pesos)
+        if col is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        x = pd.to_numeric(indice.df[col], errors="coerce").to_numpy(dtype=float)
+        filas = np.flatnonzero(en_grupo & ~np.isnan(x))
+        orden = filas[np.argsort(x[filas], kind="stable")]
+        return orden, x[orden]
+
+    def _usa_media(col):
+        return col is not None and stats[col]["sugerencia"] == "Promedio"
+
+    columnas = [col for _, col, _ in rubros]
+    col_dias = params_efecto["col_dias"]
+    n_eventos = params_efecto.get("n_eventos")
+    dias_fijos = float(n_eventos) if (params_efecto.get("modo_local") and n_eventos is not None) else None
+
+    potencial = pd.to_numeric(df_aforo["Potencial de aforo"], errors="coerce").fillna(0).sum()
+
+    return {
+        "segmento": indice.segmento,
+        "motivo": indice.motivo_codigo,
+        "k": len(indice.categorias),
+        "grupo": np.array(grupo),
+        "codigo_principal": codigo_principal,
+        "potencial": float(potencial),
+        "pesos": {
+            SEG_NO_LOCAL: (float(params_poblacion.get("peso_principal_no_local", 1.0)),
+                           float(params_poblacion.get("peso_otros_no_local", 0.5))),
+            SEG_LOCAL: (float(params_poblacion.get("peso_principal_local", 1.0)),
+                        float(params_poblacion.get("peso_otros_local", 0.5))),
+        },
+        "factor": (
+            float(params_poblacion["factor_pt_n_sobre_rho"])
+            if params_poblacion.get("activar_factor_correccion") and params_poblacion.get("factor_pt_n_sobre_rho") is not None
+            else 1.0
+        ),
+        "valores": [(*_ordenados(c), _usa_media(c)) for c in columnas],
+        "mult_rubros": np.array([m for _, _, m in rubros]),
+        "dias": (*_ordenados(col_dias), _usa_media(col_dias)),
+        "dias_fijos": dias_fijos,
+        "sectores": sectores_base,
+    }
+
+
+def _inicializar(datos):
+    global _DATOS
+    _DATOS = datos
+
+
+def _estadistico(pesos, orden, x_ordenado, usa_media):
+    """
+    Media o mediana de una columna en cada réplica a partir de los pesos
+    (veces que se sorteó cada encuestado). `orden` son las filas válidas del
+    grupo ordenadas por valor, así la mediana sale de una suma acumulada sin
+    reordenar en cada réplica. NaN (-> 0) con menos de 3 datos, como en
+    evaluar_distribuciones.
+    """
+    w = pesos[:, orden]
+    n = w.sum(axis=1)
+    if len(orden) == 0:
+        return np.zeros(len(pesos))
+    with np.errstate(all="ignore"):
+        if usa_media:
+            val = (w @ x_ordenado) / n
+        else:
+            acumulado = np.cumsum(w, axis=1)
+            # Posiciones (base 0) de los dos centrales en la muestra expandida y ordenada
+            i_bajo = (acumulado <= ((n - 1) // 2)[:, None]).sum(axis=1)
+            i_alto = (acumulado <= (n // 2)[:, None]).sum(axis=1)
+            tope = len(orden) - 1
+            val = (x_ordenado[np.minimum(i_bajo, tope)] + x_ordenado[np.minimum(i_alto, tope)]) / 2
+    val = np.where(n < 3, np.nan, val)
+    return np.nan_to_num(val, nan=0.0)
+
+
+def _bloque(semilla, n_replicas):
+    """Calcula un bloque de réplicas. Devuelve arrays (réplicas x ...)."""
+    d = _DATOS
+    rng = np.random.default_rng(semilla)
+    n = len(d["segmento"])
+    idx = rng.integers(0, n, size=(n_replicas, n))
+
+    # Veces que cada encuestado aparece en cada réplica (réplicas x encuestados)
+    pesos = np.bincount(
+        (np.arange(n_replicas)[:, None] * n + idx).ravel(), minlength=n_replicas * n
+    ).reshape(n_replicas, n)
+    del idx
+
+    # ---- Población: conteos por réplica, segmento y motivo
+    k = max(d["k"], 1)
+    celda = d["segmento"].astype(np.int64) * k + d["motivo"]
+    conteos = np.zeros((n_replicas, 3 * k))
+    for c in np.unique(celda):
+        conteos[:, c] = pesos[:, celda == c].sum(axis=1)
+    conteos = conteos.reshape(n_replicas, 3, k)
+    total_seg = conteos.sum(axis=2)
+    total_encuestados = total_seg[:, SEG_LOCAL] + total_seg[:, SEG_NO_LOCAL]
+
+    poblacion = np.zeros(n_replicas)
+    for s in d["grupo"]:
+        if d["codigo_principal"] == -1:
+            total_motivo = conteos[:, s, :].max(axis=1)
+        elif d["codigo_principal"] < 0:
+            total_motivo = np.zeros(n_replicas)
+        else:
+            total_motivo = conteos[:, s, d["codigo_principal"]]
+        with np.errstate(all="ignore"):
+            frac_p = np.where(total_seg[:, s] > 0, total_motivo / total_seg[:, s], 0.0)
+            prop = np.where(total_encuestados > 0, total_seg[:, s] / total_encuestados, 0.0)
+        peso_p, peso_o = d["pesos"][s]
+        poblacion += d["potencial"] * prop * d["factor"] * (peso_p * frac_p + peso_o * (1 - frac_p))
+
+    # ---- Estadísticos del grupo por réplica
+    if d["dias_fijos"] is not None:
+        dias = np.full(n_replicas, d["dias_fijos"])
+    else:
+        dias = _estadistico(pesos, *d["dias"])
+
+    valores = np.column_stack(
+        [_estadistico(pesos, *col) for col in d["valores"]]
+    ) if d["valores"] else np.zeros((n_replicas, 0))
+
+    indirecto = poblacion[:, None] * valores * dias[:, None]
+    inducido = indirecto * d["mult_rubros"][None, :] - indirecto
+
+    # ---- Sectores (EED fijo; el indirecto escala con población y días)
+    sectores = d["sectores"]
+    if sectores is not None:
+        dias_sec = dias if sectores["dias"] is None else np.full(n_replicas, sectores["dias"])
+        ind_sec = (poblacion * dias_sec)[:, None] * sectores["gasto_activo"][None, :]
+        total_sec = sectores["directo"][None, :] * sectores["mult"][None, :] + ind_sec * sectores["mult"][None, :]
+    else:
+        total_sec = np.zeros((n_replicas, 0))
+
+    return poblacion, indirecto, inducido, total_sec
+
+
+def _intervalo(x, nivel):
+    alfa = (1 - nivel) / 2
+    return np.nanpercentile(x, [100 * alfa, 100 * (1 - alfa)], axis=0)
+
+
+def bootstrap_efecto_economico(
+    df_encuesta,
+    df_aforo,
+    params_poblacion,
+    params_efecto,
+    df_eed=None,
+    params_sectores=None,
+    n_replicas=10000,
+    nivel=0.95,
+    semilla=None,
+    n_procesos=None,
+    tam_bloque=250
+):
+    """
+    Intervalos de confianza percentil para PNL, el efecto por rubro y los sectores.
+
+    Parámetros:
+        params_poblacion: kwargs de calcular_poblacion (sin df_encuesta/df_aforo).
+        params_efecto:    kwargs de calcular_efecto_economico_indirecto (sin stats/pnl).
+        params_sectores:  kwargs de calcular_desglose_por_sectores (sin df_eed/pnl);
+                          si 'dias_usado' es None se usan los días de cada réplica.
+        n_procesos:       procesos del pool (None = núcleos disponibles, 1 = sin pool).
+
+    Retorna dict con:
+        "poblacion": {"estimacion", "inferior", "superior"}
+        "rubros":    DataFrame por rubro (Indirecto / Inducido neto con sus límites)
+        "sectores":  DataFrame por sector del 'Efecto económico total' con sus límites
+        "n_replicas", "nivel"
+    """
+    params_poblacion = dict(params_poblacion)
+    params_poblacion.setdefault("columna_reside", COLUMNA_RESIDE)
+    params_poblacion.setdefault("columna_motivo", COLUMNA_MOTIVO)
+    params_poblacion.setdefault("categoria_principal", None)
+    indice = IndiceEncuesta(
+        df_encuesta, params_poblacion["columna_reside"], params_poblacion["columna_motivo"],
+        armonizar=bool(params_poblacion.get("armonizar_motivos")),
+        motivos_conocidos=params_poblacion.get("motivos_conocidos")
+    )
+
+    # ---- Estimación puntual con el pipeline real
+    res_pob = calcular_poblacion(df_encuesta, df_aforo, indice=indice, **params_poblacion)
+    columnas = [params_efecto[c] for c in ("col_aloj", "col_alim", "col_trans", "col_dias")]
+    columnas += [ex.get("col") for ex in params_efecto.get("extras") or [] if ex.get("col") in df_encuesta.columns]
+    columnas = list(dict.fromkeys(columnas))
+    stats = evaluar_distribuciones(res_pob.filas_grupo(columnas), columnas)
+    res_ind, desglose = calcular_efecto_economico_indirecto(
+        stats=stats, pnl=res_pob["Poblacion_estimacion"], **params_efecto
+    )
+
+    sectores_base = None
+    df_sec = None
+    if df_eed is not None:
+        params_sectores = dict(params_sectores or {})
+        dias_sec = params_sectores.pop("dias_usado", None)
+        df_sec, meta = calcular_desglose_por_sectores(
+            df_eed=df_eed,
+            pnl=res_pob["Poblacion_estimacion"],
+            dias_usado=res_ind["Días de estadía (valor usado)"] if dias_sec is None else dias_sec,
+            **params_sectores
+        )
+        if params_sectores.get("modo_local") and params_sectores.get("n_eventos") is not None:
+            dias_sec = float(params_sectores["n_eventos"])
+        filas = df_sec[df_sec["Sector"] != "Total"]
+        cfg = meta["config_aplicada"]
+        nombres = filas["Sector"].astype(str).tolist()
+        sectores_base = {
+            "nombres": nombres,
+            "directo": filas["Efecto directo"].fillna(0.0).to_numpy(dtype=float),
+            "mult": np.array([cfg[s]["multiplicador_sector"] for s in nombres]),
+            "gasto_activo": np.array([cfg[s]["gasto_sector"] if cfg[s]["usar_indirecto"] else 0.0 for s in nombres]),
+            "dias": None if dias_sec is None else float(dias_sec),
+        }
+
+    datos = _preparar_datos(params_poblacion, params_efecto, indice, df_aforo, stats, sectores_base)
+
+    # ---- Réplicas por bloques (semillas independientes del número de procesos)
+    tamanos = [tam_bloque] * (n_replicas // tam_bloque)
+    if n_replicas % tam_bloque:
+        tamanos.append(n_replicas % tam_bloque)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+
+    n_procesos = n_procesos or os.cpu_count() or 1
+    if n_procesos == 1 or len(tamanos) == 1:
+        _inicializar(datos)
+        partes = [_bloque(s, t) for s, t in zip(semillas, tamanos)]
+    else:
+        # "spawn", como el pool de Shapiro en backend.py: el servidor de Streamlit tiene hilos
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_procesos, mp_context=contexto,
+                                 initializer=_inicializar, initargs=(datos,)) as pool:
+            partes = list(pool.map(_bloque, semillas, tamanos))
+
+    poblacion = np.concatenate([p[0] for p in partes])
+    indirecto = np.concatenate([p[1] for p in partes])
+    inducido = np.concatenate([p[2] for p in partes])
+    total_sec = np.concatenate([p[3] for p in partes])
+
+    # ---- Intervalos
+    pob_inf, pob_sup = _intervalo(poblacion, nivel)
+
+    nombres_rubros = [fila["Rubro"] for fila in desglose[:-1]]
+    ind_total = indirecto.sum(axis=1, keepdims=True)
+    inc_total = inducido.sum(axis=1, keepdims=True)
+    ind_lim = _intervalo(np.hstack([indirecto, ind_total]), nivel)
+    inc_lim = _intervalo(np.hstack([inducido, inc_total]), nivel)
+    df_rubros = pd.DataFrame({
+        "Rubro": nombres_rubros + ["Total"],
+        "Indirecto": [fila["Indirecto"] for fila in desglose],
+        "Indirecto inf": ind_lim[0],
+        "Indirecto sup": ind_lim[1],
+        "Inducido neto": [fila["Inducido neto"] for fila in desglose],
+        "Inducido neto inf": inc_lim[0],
+        "Inducido neto sup": inc_lim[1],
+    })
+
+    df_sectores = None
+    if sectores_base is not None:
+        sec_lim = _intervalo(np.hstack([total_sec, total_sec.sum(axis=1, keepdims=True)]), nivel)
+        df_sectores = pd.DataFrame({
+            "Sector": sectores_base["nombres"] + ["Total"],
+            "Efecto económico total": df_sec["Efecto económico total"].to_numpy(dtype=float),
+            "Efecto económico total inf": sec_lim[0],
+            "Efecto económico total sup": sec_lim[1],
+        })
+
+    return {
+        "poblacion": {
+            "estimacion": float(res_pob["Poblacion_estimacion"]),
+            "inferior": float(pob_inf),
+            "superior": float(pob_sup),
+        },
+        "rubros": df_rubros,
+        "sectores": df_sectores,
+        "n_replicas": int(n_replicas),
+        "nivel": float(nivel),
+    }